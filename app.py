@@ -1,14 +1,27 @@
 # Sichere Flask-Webanwendung für Bitpanda Portfolio
 import os
+import json
 import secrets
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, Response, abort, g, render_template, request, jsonify, session, redirect, url_for, flash, send_file, stream_with_context
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from flask_cors import CORS
 from werkzeug.middleware.proxy_fix import ProxyFix
-from database import SecureUserDatabase
-from bitpanda_api import BitpandaAPI
+from database import SecureUserDatabase, security_logging
+from password_hasher import PasswordHasherOverloaded
+from bitpanda_api import BitpandaAPI, ticker_cache
+from rate_limiter import RateLimitExceeded, SQLiteGCRALimiter, create_rate_limiter
+from portfolio_cache import PortfolioCache, portfolio_delta
+from portfolio_scheduler import PortfolioRefreshScheduler
+from portfolio_history import PortfolioHistoryStore, TOTAL_SERIES
+from user_cache import UserCache
+from maintenance import MaintenanceScheduler
+from metrics import metrics
+from profiling import RequestProfiler
+from session_tokens import RevocationList, SessionTokenManager
 
 # Logging-Konfiguration
 logging.basicConfig(level=logging.INFO)
@@ -42,19 +55,71 @@ def add_security_headers(response):
     response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
     return response
 
+# Latenz je Route (Histogramm, abrufbar unter /metrics)
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_duration_seconds', 'Dauer von HTTP-Anfragen je Route', ('route', 'method', 'status')
+)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route, request.method, response.status_code)
+    return response
+
+# Profiling einzelner Anfragen: Header X-Profile-Token = ADMIN_TOKEN oder
+# Stichprobe jeder N-ten Anfrage (PROFILE_SAMPLE_RATE, 0 = aus)
+profiler = RequestProfiler(
+    directory=os.environ.get('PROFILE_DIR', 'profiles'),
+    max_files=int(os.environ.get('PROFILE_MAX_FILES', '50')),
+    sample_rate=int(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    admin_token=os.environ.get('ADMIN_TOKEN') or None
+)
+
+@app.before_request
+def start_profiling():
+    if profiler.wants(request.path, request.headers.get('X-Profile-Token')):
+        profile = profiler.start()
+        if profile is not None:
+            g.profile = (profile, time.perf_counter())
+
+@app.after_request
+def finish_profiling(response):
+    name = _finish_profile()
+    if name:
+        response.headers['X-Profile-Name'] = name
+    return response
+
+@app.teardown_request
+def abort_profiling(error=None):
+    # Fallback, falls after_request wegen einer Ausnahme nicht lief
+    _finish_profile()
+
+def _finish_profile():
+    active = g.pop('profile', None)
+    if active is None:
+        return None
+    profile, start = active
+    return profiler.finish(profile, f"{request.method} {request.path}", time.perf_counter() - start)
+
 # Proxy-Fix für Docker
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
 # CORS-Konfiguration
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
 
-# Rate Limiting - Temporär deaktiviert für Debugging
-# limiter = Limiter(
-#     app=app,
-#     key_func=get_remote_address,
-#     default_limits=["200 per day", "50 per hour"],
-#     storage_uri="memory://"
-# )
+# Rate Limiting für Registrierungen je IP (Logins: db.login_limiter);
+# Backend über LOGIN_RATE_LIMIT_BACKEND (memory oder sqlite für mehrere Worker)
+register_limiter = create_rate_limiter(
+    'register',
+    int(os.environ.get('REGISTER_RATE_LIMIT', '5')),
+    float(os.environ.get('REGISTER_RATE_WINDOW', '3600'))
+)
 
 # Login Manager
 login_manager = LoginManager()
@@ -64,27 +129,94 @@ login_manager.login_message = 'Bitte melden Sie sich an, um auf diese Seite zuzu
 
 # Datenbank-Initialisierung
 db = SecureUserDatabase()
-bitpanda_api = BitpandaAPI()
+# Ein Portfolio-Abruf belegt je Endpunkt plus Ticker einen Fetch-Thread und eine
+# Verbindung; der Pool muss alle Request-Threads und den Refresh-Scheduler
+# gleichzeitig bedienen, sonst warten Anfragen in der Executor-Queue
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', '8'))
+PORTFOLIO_REFRESH_WORKERS = int(os.environ.get('PORTFOLIO_REFRESH_WORKERS', '4'))
+BITPANDA_FETCH_WORKERS = int(os.environ.get(
+    'BITPANDA_FETCH_WORKERS',
+    str((GUNICORN_THREADS + PORTFOLIO_REFRESH_WORKERS) * (len(BitpandaAPI.PORTFOLIO_ENDPOINTS) + 1))
+))
+bitpanda_api = BitpandaAPI(max_workers=BITPANDA_FETCH_WORKERS, pool_size=BITPANDA_FETCH_WORKERS)
+portfolio_cache = PortfolioCache(
+    fresh_ttl=float(os.environ.get('PORTFOLIO_CACHE_TTL', '30')),
+    stale_ttl=float(os.environ.get('PORTFOLIO_CACHE_STALE_TTL', '300')),
+    max_bytes=int(os.environ.get('PORTFOLIO_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+)
+# Cache für load_user: spart pro Anfrage DB-Abfrage und Entschlüsselung
+user_cache = UserCache(
+    ttl=float(os.environ.get('USER_CACHE_TTL', '60')),
+    max_entries=int(os.environ.get('USER_CACHE_MAX_ENTRIES', '10000'))
+)
+
+# Sitzungsmodus: 'db' (Sessions-Tabelle) oder 'token' (signierte Tokens, Prüfung
+# ohne Datenbank; SESSION_TOKEN_SECRET muss bei mehreren Workern identisch sein)
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db').lower()
+session_tokens = SessionTokenManager(
+    os.environ.get('SESSION_TOKEN_SECRET', app.secret_key).encode(),
+    RevocationList(db.get_db_connection, refresh_interval=float(os.environ.get('SESSION_REVOCATION_REFRESH', '5')))
+) if SESSION_MODE == 'token' else None
+
+# Historie echter Portfolios (Demo-Daten sind zufällig und werden nicht gespeichert)
+portfolio_history = PortfolioHistoryStore(
+    db_path=os.environ.get('HISTORY_DATABASE_PATH', 'portfolio_history.db'),
+    min_interval=float(os.environ.get('HISTORY_MIN_INTERVAL', '60'))
+)
+portfolio_cache.add_listener(
+    lambda user_id, data, version: None if data.get('is_demo') else portfolio_history.record(user_id, data)
+)
+# SSE-Streams belegen je einen Worker-Thread für bis zu SSE_MAX_DURATION Sekunden;
+# höchstens SSE_MAX_STREAMS je Prozess, damit Login und /health Threads frei behalten
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', str(max(1, GUNICORN_THREADS // 2))))
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+portfolio_scheduler = PortfolioRefreshScheduler(
+    portfolio_cache,
+    lambda api_key: _fetch_portfolio(api_key),
+    refresh_interval=float(os.environ.get('PORTFOLIO_REFRESH_INTERVAL', '60')),
+    max_rate=float(os.environ.get('PORTFOLIO_REFRESH_RATE', '2')),
+    active_window=float(os.environ.get('PORTFOLIO_ACTIVE_WINDOW', '900')),
+    max_workers=PORTFOLIO_REFRESH_WORKERS,
+    is_active=db.is_user_active
+)
 
 @login_manager.user_loader
 def load_user(user_id):
+    session_id = session.get('session_id')
+    
+    # Token-Modus: Signatur, Ablauf und Sperrliste rein lokal prüfen
+    if session_tokens is not None:
+        claims = session_tokens.verify(session.get('session_token'))
+        if claims is None or claims['user_id'] != str(user_id):
+            return None
+        session_id = claims['session_id']
+    
+    # Zuerst im prozessinternen Cache nachsehen
+    user = user_cache.get(user_id, session_id)
+    if user is not None:
+        return user
+    
     # Versuche zuerst über user_id zu laden (Standard Flask-Login)
     try:
         user_data = db.get_user_by_id(user_id)
         if user_data:
             logger.info(f"User geladen über ID: {user_id}")
-            return User(user_data['user_id'], user_data['username'], user_data['api_key'])
+            user = User(user_data['user_id'], user_data['username'], user_data['api_key'])
+            user_cache.put(user_id, session_id, user)
+            return user
     except Exception as e:
         logger.error(f"Fehler beim Laden des Users über ID {user_id}: {e}")
     
-    # Fallback: Versuche über Session-ID (falls vorhanden)
-    session_id = session.get('session_id')
-    if session_id:
+    # Fallback: Versuche über Session-ID (falls vorhanden, nicht im Token-Modus)
+    if session_id and session_tokens is None:
         try:
             user_data = db.get_user_by_session(session_id)
             if user_data:
                 logger.info(f"User geladen über Session: {session_id}")
-                return User(user_data['user_id'], user_data['username'], user_data['api_key'])
+                user = User(user_data['user_id'], user_data['username'], user_data['api_key'])
+                user_cache.put(user_id, session_id, user)
+                return user
         except Exception as e:
             logger.error(f"Fehler beim Laden des Users über Session {session_id}: {e}")
     
@@ -93,7 +225,7 @@ def load_user(user_id):
 
 # Session-Bereinigung
 def cleanup_sessions():
-    db.cleanup_old_sessions()
+    return db.cleanup_old_sessions()
 
 # Hilfsfunktionen für Input-Validierung
 def validate_username(username):
@@ -113,6 +245,12 @@ def validate_password(password):
 def validate_api_key(api_key):
     return api_key and len(api_key) >= 10 and api_key.replace('-', '').isalnum()
 
+def _overloaded_response(error):
+    """503 mit Retry-After, wenn das Passwort-Hashing ausgelastet ist"""
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 # Routen
 @app.route('/')
 def index():
@@ -154,6 +292,12 @@ def login():
             
             # Session-ID in Flask-Session speichern
             session['session_id'] = auth_result['session_id']
+            if session_tokens is not None:
+                session['session_token'] = session_tokens.issue(
+                    auth_result['user_id'],
+                    auth_result['session_id'],
+                    datetime.fromisoformat(auth_result['expires_at']).timestamp()
+                )
             
             logger.info(f"Erfolgreiche Anmeldung: {username} von {ip_address}")
             
@@ -163,6 +307,16 @@ def login():
                 flash('Erfolgreich angemeldet!', 'success')
                 return redirect(url_for('dashboard'))
                 
+        except RateLimitExceeded as e:
+            if request.is_json:
+                response = jsonify({'error': str(e), 'retry_after': round(e.retry_after)})
+                response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+                return response, 429
+            flash(str(e), 'error')
+        except PasswordHasherOverloaded as e:
+            if request.is_json:
+                return _overloaded_response(e)
+            flash(str(e), 'error')
         except ValueError as e:
             logger.warning(f"Login-Fehler: {e}")
             if request.is_json:
@@ -197,6 +351,15 @@ def register():
             if api_key and not validate_api_key(api_key):
                 return jsonify({'error': 'Ungültiger API-Schlüssel'}), 400
             
+            # Jeder gültige Registrierungsversuch zählt (verhindert Massenregistrierung)
+            ip_address = request.environ.get('REMOTE_ADDR', 'unbekannt')
+            retry_after = register_limiter.hit(ip_address)
+            if retry_after:
+                logger.warning(f"Registrierungs-Rate-Limit erreicht für IP: {ip_address}")
+                response = jsonify({'error': 'Zu viele Registrierungen. Bitte warten Sie.', 'retry_after': round(retry_after)})
+                response.headers['Retry-After'] = str(max(1, round(retry_after)))
+                return response, 429
+            
             # Demo-Modus wenn kein API-Key angegeben
             is_demo = not api_key
             if is_demo:
@@ -212,6 +375,10 @@ def register():
                 flash(f'Benutzer erfolgreich erstellt! Sie können sich jetzt anmelden. {"Demo-Modus aktiviert." if is_demo else ""}', 'success')
                 return redirect(url_for('login'))
                 
+        except PasswordHasherOverloaded as e:
+            if request.is_json:
+                return _overloaded_response(e)
+            flash(str(e), 'error')
         except ValueError as e:
             logger.warning(f"Registrierungsfehler: {e}")
             if request.is_json:
@@ -249,127 +416,284 @@ def get_user_info():
         'user_id': current_user.id
     })
 
+def _generate_demo_portfolio():
+    """Erzeugt Demo-Portfolio-Daten mit Random-Werten"""
+    import random
+    
+    # Zufällige Crypto-Preise generieren (basierend auf realistischen Bereichen)
+    btc_price = random.uniform(25000, 35000)
+    eth_price = random.uniform(1400, 1800)
+    ada_price = random.uniform(0.80, 1.20)
+    sol_price = random.uniform(45, 75)
+    
+    # Zufällige Mengen
+    btc_amount = random.uniform(0.1, 0.5)
+    eth_amount = random.uniform(1.5, 3.0)
+    ada_amount = random.uniform(800, 1500)
+    sol_amount = random.uniform(10, 25)
+    
+    # Werte berechnen
+    btc_value = btc_price * btc_amount
+    eth_value = eth_price * eth_amount
+    ada_value = ada_price * ada_amount
+    sol_value = sol_price * sol_amount
+    
+    # Zufällige 24h Änderungen (-10% bis +15%)
+    btc_change_pct = random.uniform(-10, 15)
+    eth_change_pct = random.uniform(-10, 15)
+    ada_change_pct = random.uniform(-10, 15)
+    sol_change_pct = random.uniform(-10, 15)
+    
+    # Absolute Änderungen berechnen
+    btc_change = btc_value * (btc_change_pct / 100)
+    eth_change = eth_value * (eth_change_pct / 100)
+    ada_change = ada_value * (ada_change_pct / 100)
+    sol_change = sol_value * (sol_change_pct / 100)
+    
+    # Fiat-Wallets mit zufälligen Werten
+    eur_balance = random.uniform(500, 3000)
+    usd_balance = random.uniform(1000, 4000)
+    
+    # Gesamtwerte berechnen
+    crypto_total = btc_value + eth_value + ada_value + sol_value
+    fiat_total_eur = eur_balance + (usd_balance * 0.85)  # USD zu EUR
+    total_value = crypto_total + fiat_total_eur
+    total_change = btc_change + eth_change + ada_change + sol_change
+    total_change_pct = (total_change / total_value) * 100 if total_value > 0 else 0
+    
+    demo_portfolio = {
+        'total_value': round(total_value, 2),
+        'total_change_24h': round(total_change, 2),
+        'total_change_24h_percentage': round(total_change_pct, 2),
+        'crypto_total_value': round(crypto_total, 2),
+        'fiat_total_value': round(fiat_total_eur, 2),
+        'assets': [
+            {
+                'name': 'Bitcoin',
+                'symbol': 'BTC',
+                'amount': round(btc_amount, 4),
+                'current_price': round(btc_price, 2),
+                'value': round(btc_value, 2),
+                'change_24h': round(btc_change, 2),
+                'change_24h_percentage': round(btc_change_pct, 2),
+                'logo_url': '/static/crypto-logos/btc.png'
+            },
+            {
+                'name': 'Ethereum',
+                'symbol': 'ETH', 
+                'amount': round(eth_amount, 4),
+                'current_price': round(eth_price, 2),
+                'value': round(eth_value, 2),
+                'change_24h': round(eth_change, 2),
+                'change_24h_percentage': round(eth_change_pct, 2),
+                'logo_url': '/static/crypto-logos/eth.png'
+            },
+            {
+                'name': 'Cardano',
+                'symbol': 'ADA',
+                'amount': round(ada_amount, 2),
+                'current_price': round(ada_price, 4),
+                'value': round(ada_value, 2),
+                'change_24h': round(ada_change, 2),
+                'change_24h_percentage': round(ada_change_pct, 2),
+                'logo_url': '/static/crypto-logos/ada.png'
+            },
+            {
+                'name': 'Solana',
+                'symbol': 'SOL',
+                'amount': round(sol_amount, 4),
+                'current_price': round(sol_price, 2),
+                'value': round(sol_value, 2),
+                'change_24h': round(sol_change, 2),
+                'change_24h_percentage': round(sol_change_pct, 2),
+                'logo_url': '/static/crypto-logos/sol.png'
+            }
+        ],
+        'fiat_wallets': [
+            {
+                'symbol': 'EUR',
+                'balance': round(eur_balance, 2),
+                'name': 'Euro'
+            },
+            {
+                'symbol': 'USD', 
+                'balance': round(usd_balance, 2),
+                'name': 'US-Dollar'
+            }
+        ],
+        'last_update': datetime.now().isoformat(),
+        'is_demo': True
+    }
+    return demo_portfolio
+
+def _fetch_portfolio(api_key):
+    """Lädt ein Portfolio - Demo-Daten oder echte API-Daten"""
+    if api_key == 'DEMO_MODE':
+        return _generate_demo_portfolio()
+    portfolio_data = bitpanda_api.get_portfolio(api_key)
+    portfolio_data['is_demo'] = False
+    return portfolio_data
+
 @app.route('/api/portfolio')
 @login_required
 def get_portfolio():
-    try:        # Demo-Modus Daten mit Random-Werten
+    try:
+        # Demo-Modus Daten mit Random-Werten
         if current_user.api_key == 'DEMO_MODE':
-            import random
-            
-            # Zufällige Crypto-Preise generieren (basierend auf realistischen Bereichen)
-            btc_price = random.uniform(25000, 35000)
-            eth_price = random.uniform(1400, 1800)
-            ada_price = random.uniform(0.80, 1.20)
-            sol_price = random.uniform(45, 75)
-            
-            # Zufällige Mengen
-            btc_amount = random.uniform(0.1, 0.5)
-            eth_amount = random.uniform(1.5, 3.0)
-            ada_amount = random.uniform(800, 1500)
-            sol_amount = random.uniform(10, 25)
-            
-            # Werte berechnen
-            btc_value = btc_price * btc_amount
-            eth_value = eth_price * eth_amount
-            ada_value = ada_price * ada_amount
-            sol_value = sol_price * sol_amount
-            
-            # Zufällige 24h Änderungen (-10% bis +15%)
-            btc_change_pct = random.uniform(-10, 15)
-            eth_change_pct = random.uniform(-10, 15)
-            ada_change_pct = random.uniform(-10, 15)
-            sol_change_pct = random.uniform(-10, 15)
-            
-            # Absolute Änderungen berechnen
-            btc_change = btc_value * (btc_change_pct / 100)
-            eth_change = eth_value * (eth_change_pct / 100)
-            ada_change = ada_value * (ada_change_pct / 100)
-            sol_change = sol_value * (sol_change_pct / 100)
-            
-            # Fiat-Wallets mit zufälligen Werten
-            eur_balance = random.uniform(500, 3000)
-            usd_balance = random.uniform(1000, 4000)
-            
-            # Gesamtwerte berechnen
-            crypto_total = btc_value + eth_value + ada_value + sol_value
-            fiat_total_eur = eur_balance + (usd_balance * 0.85)  # USD zu EUR
-            total_value = crypto_total + fiat_total_eur
-            total_change = btc_change + eth_change + ada_change + sol_change
-            total_change_pct = (total_change / total_value) * 100 if total_value > 0 else 0
-            
-            demo_portfolio = {
-                'total_value': round(total_value, 2),
-                'total_change_24h': round(total_change, 2),
-                'total_change_24h_percentage': round(total_change_pct, 2),
-                'crypto_total_value': round(crypto_total, 2),
-                'fiat_total_value': round(fiat_total_eur, 2),
-                'assets': [
-                    {
-                        'name': 'Bitcoin',
-                        'symbol': 'BTC',
-                        'amount': round(btc_amount, 4),
-                        'current_price': round(btc_price, 2),
-                        'value': round(btc_value, 2),
-                        'change_24h': round(btc_change, 2),
-                        'change_24h_percentage': round(btc_change_pct, 2),
-                        'logo_url': '/static/crypto-logos/btc.png'
-                    },
-                    {
-                        'name': 'Ethereum',
-                        'symbol': 'ETH', 
-                        'amount': round(eth_amount, 4),
-                        'current_price': round(eth_price, 2),
-                        'value': round(eth_value, 2),
-                        'change_24h': round(eth_change, 2),
-                        'change_24h_percentage': round(eth_change_pct, 2),
-                        'logo_url': '/static/crypto-logos/eth.png'
-                    },
-                    {
-                        'name': 'Cardano',
-                        'symbol': 'ADA',
-                        'amount': round(ada_amount, 2),
-                        'current_price': round(ada_price, 4),
-                        'value': round(ada_value, 2),
-                        'change_24h': round(ada_change, 2),
-                        'change_24h_percentage': round(ada_change_pct, 2),
-                        'logo_url': '/static/crypto-logos/ada.png'
-                    },
-                    {
-                        'name': 'Solana',
-                        'symbol': 'SOL',
-                        'amount': round(sol_amount, 4),
-                        'current_price': round(sol_price, 2),
-                        'value': round(sol_value, 2),
-                        'change_24h': round(sol_change, 2),
-                        'change_24h_percentage': round(sol_change_pct, 2),
-                        'logo_url': '/static/crypto-logos/sol.png'
-                    }
-                ],
-                'fiat_wallets': [
-                    {
-                        'symbol': 'EUR',
-                        'balance': round(eur_balance, 2),
-                        'name': 'Euro'
-                    },
-                    {
-                        'symbol': 'USD', 
-                        'balance': round(usd_balance, 2),
-                        'name': 'US-Dollar'
-                    }
-                ],
-                'last_update': datetime.now().isoformat(),
-                'is_demo': True
-            }
-            return jsonify(demo_portfolio)
+            return jsonify(_generate_demo_portfolio())
+        
+        # Echte API-Daten - bevorzugt der Snapshot des Hintergrund-Schedulers
+        api_key = current_user.api_key
+        snapshot = portfolio_cache.peek_versioned(current_user.id) if portfolio_scheduler.running else None
         
-        # Echte API-Daten
-        portfolio_data = bitpanda_api.get_portfolio(current_user.api_key)
-        portfolio_data['is_demo'] = False
-        return jsonify(portfolio_data)
+        if snapshot and snapshot[1] < portfolio_scheduler.max_snapshot_age:
+            portfolio_data, cache_age, version = snapshot
+            cache_status = 'snapshot'
+            if portfolio_scheduler.running:
+                portfolio_scheduler.touch(current_user.id, api_key)
+        else:
+            # Fallback: aus dem Cache, bei veralteten Daten Aktualisierung im Hintergrund.
+            # Erst danach einplanen, sonst lädt der Scheduler denselben Benutzer sofort erneut.
+            try:
+                portfolio_data, cache_age, cache_status = portfolio_cache.get(
+                    current_user.id, lambda: _fetch_portfolio(api_key)
+                )
+            finally:
+                if portfolio_scheduler.running:
+                    portfolio_scheduler.touch(current_user.id, api_key, loaded=True)
+            current = portfolio_cache.peek_versioned(current_user.id)
+            version = current[2] if current and current[0] is portfolio_data else None
+        
+        # Version = Inhalts-Digest, daher in allen Gunicorn-Workern gleichbedeutend
+        etag = version
+        since = request.args.get('since')
+        
+        # Nichts geändert: 304 ohne Body
+        if etag and (request.if_none_match.contains(etag) or since == version):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        
+        # Delta seit einer bekannten Version, falls diese noch im Cache liegt
+        base_data = portfolio_cache.get_version(current_user.id, since) if etag and since else None
+        if base_data is not None:
+            response = jsonify({
+                'delta': True,
+                'base_version': since,
+                'version': version,
+                'patch': portfolio_delta(base_data, portfolio_data),
+                'cache_age': round(cache_age, 1),
+                'cache_status': cache_status
+            })
+        else:
+            response = jsonify(dict(portfolio_data, is_demo=False, version=version,
+                                    cache_age=round(cache_age, 1), cache_status=cache_status))
+        if etag:
+            response.set_etag(etag)
+        response.headers['Age'] = str(int(cache_age))
+        return response
+    except RateLimitExceeded as e:
+        # Upstream-Budget erschöpft - sofort antworten statt den Worker zu blockieren
+        logger.warning(f"Portfolio-Abruf für {current_user.username} gedrosselt: {e}")
+        response = jsonify({'error': 'Zu viele Anfragen an Bitpanda. Bitte später erneut versuchen.',
+                            'retry_after': round(e.retry_after, 1)})
+        response.headers['Retry-After'] = str(max(1, int(e.retry_after + 0.999)))
+        return response, 429
     except Exception as e:
         logger.error(f"Portfolio-Abruf-Fehler für {current_user.username}: {e}")
         return jsonify({'error': 'Fehler beim Abrufen des Portfolios'}), 500
 
+@app.route('/api/portfolio/stream')
+@login_required
+def portfolio_stream():
+    """Server-Sent Events: sendet ein Portfolio nur bei inhaltlicher Änderung"""
+    user_id = current_user.id
+    api_key = current_user.api_key
+    heartbeat = float(os.environ.get('SSE_HEARTBEAT_INTERVAL', '15'))
+    max_duration = float(os.environ.get('SSE_MAX_DURATION', '600'))
+    
+    # Alle Stream-Plätze belegt: Client wechselt auf Polling von /api/portfolio
+    if not sse_slots.acquire(blocking=False):
+        logger.warning(f"SSE-Limit erreicht ({SSE_MAX_STREAMS} Streams), User {user_id} nutzt Polling")
+        response = jsonify({'error': 'Zu viele Live-Verbindungen', 'fallback': 'poll'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    # Wiederaufnahme nach Verbindungsabbruch über Last-Event-ID
+    last_version = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or None
+    
+    def generate():
+        version = last_version
+        deadline = datetime.now() + timedelta(seconds=max_duration)
+        yield 'retry: 5000\n\n'
+        
+        # Ohne vorhandenen Snapshot einmal synchron laden
+        if portfolio_cache.peek(user_id) is None:
+            try:
+                portfolio_cache.get(user_id, lambda: _fetch_portfolio(api_key))
+            except Exception as e:
+                logger.error(f"Portfolio-Stream-Fehler für User {user_id}: {e}")
+                yield f'event: error\ndata: {json.dumps({"error": "Fehler beim Abrufen des Portfolios"})}\n\n'
+        
+        # Begrenzte Laufzeit: der Browser verbindet sich mit Last-Event-ID neu und gibt den Worker frei
+        while datetime.now() < deadline:
+            if portfolio_scheduler.running:
+                portfolio_scheduler.touch(user_id, api_key)
+            
+            change = portfolio_cache.wait_for_change(user_id, version, timeout=heartbeat)
+            if change is None:
+                yield ': heartbeat\n\n'
+                if not portfolio_scheduler.running:
+                    # Ohne Scheduler veraltete Daten über den Cache im Hintergrund aktualisieren
+                    try:
+                        portfolio_cache.get(user_id, lambda: _fetch_portfolio(api_key))
+                    except Exception as e:
+                        logger.warning(f"Portfolio-Stream-Aktualisierung für User {user_id} fehlgeschlagen: {e}")
+                continue
+            
+            portfolio_data, cache_age, version = change
+            payload = dict(portfolio_data, cache_age=round(cache_age, 1), version=version)
+            yield f'id: {version}\nevent: portfolio\ndata: {json.dumps(payload, default=str)}\n\n'
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Platz erst freigeben, wenn der Server die Antwort schließt (auch bei Abbruch)
+    response.call_on_close(sse_slots.release)
+    return response
+
+def _parse_history_time(value, default):
+    """Zeitangabe als Unix-Zeitstempel oder ISO-8601"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/api/portfolio/history')
+@login_required
+def get_portfolio_history():
+    try:
+        now = datetime.now().timestamp()
+        end = _parse_history_time(request.args.get('to'), now)
+        start = _parse_history_time(request.args.get('from'), end - 24 * 3600)
+        resolution = request.args.get('resolution', type=float)
+        asset = request.args.get('asset')
+        if start >= end:
+            return jsonify({'error': 'Ungültiger Zeitraum'}), 400
+        
+        history = portfolio_history.query(current_user.id, start, end, resolution,
+                                          series=asset.upper() if asset else TOTAL_SERIES)
+        return jsonify(history)
+    except ValueError:
+        return jsonify({'error': 'Ungültige Zeitangabe'}), 400
+    except Exception as e:
+        logger.error(f"Historien-Abruf-Fehler für {current_user.username}: {e}")
+        return jsonify({'error': 'Fehler beim Abrufen der Portfolio-Historie'}), 500
+
 @app.route('/api/users')
 @login_required
 def list_users():
@@ -388,7 +712,20 @@ def delete_user(username):
         if username == current_user.username:
             return jsonify({'error': 'Sie können sich nicht selbst löschen'}), 400
         
+        user_id = db.get_user_id(username)
         success = db.delete_user(username)
+        if user_id is not None:
+            if session_tokens is not None:
+                session_tokens.revoke_user(user_id)
+            portfolio_history.delete_user(user_id)
+            portfolio_scheduler.forget(user_id)
+            portfolio_cache.invalidate(user_id)
+        # Nur dieser Worker wird sofort bereinigt. Andere Worker liefern den
+        # gecachten User noch bis zu USER_CACHE_TTL aus; ihr Scheduler prüft vor
+        # jedem Abruf is_user_active und hört für gelöschte Benutzer auf.
+        for cached_id in user_cache.invalidate_user(user_id=user_id, username=username):
+            portfolio_scheduler.forget(int(cached_id))
+            portfolio_cache.invalidate(int(cached_id))
         if success:
             logger.info(f"Benutzer gelöscht: {username} (durch {current_user.username})")
             return jsonify({'success': True, 'message': f'Benutzer {username} wurde gelöscht'})
@@ -403,9 +740,14 @@ def delete_user(username):
 @login_required
 def logout():
     session_id = session.get('session_id')
-    if session_id:
+    if session_tokens is not None:
+        session_tokens.revoke(session.get('session_token'))
+    elif session_id:
         db.logout_user(session_id)
     
+    user_cache.invalidate_session(current_user.id, session_id)
+    db.forget_api_key(current_user.id)
+    portfolio_scheduler.forget(current_user.id)
     logout_user()
     session.clear()
     flash('Sie wurden erfolgreich abgemeldet.', 'info')
@@ -416,9 +758,14 @@ def logout():
 def switch_user():
     # Aktuellen Benutzer abmelden
     session_id = session.get('session_id')
-    if session_id:
+    if session_tokens is not None:
+        session_tokens.revoke(session.get('session_token'))
+    elif session_id:
         db.logout_user(session_id)
     
+    user_cache.invalidate_session(current_user.id, session_id)
+    db.forget_api_key(current_user.id)
+    portfolio_scheduler.forget(current_user.id)
     logout_user()
     session.clear()
     return redirect(url_for('login'))
@@ -440,6 +787,83 @@ def api_health_check():
     """API Health Check für Load Balancer"""
     return health_check()
 
+def _cache_metrics():
+    """Trefferquoten und Größen der prozessinternen Caches"""
+    portfolio = portfolio_cache.stats()
+    portfolio_total = portfolio['hits'] + portfolio['stale_hits'] + portfolio['misses']
+    ticker = ticker_cache.stats()
+    ticker_total = ticker['hits'] + ticker['misses']
+    return {
+        ('portfolio',): (portfolio['hits'] + portfolio['stale_hits']) / portfolio_total if portfolio_total else 0.0,
+        ('ticker',): ticker['hits'] / ticker_total if ticker_total else 0.0,
+        ('user',): user_cache.stats()['hit_ratio'],
+        ('api_key',): db.key_cache.stats()['hit_ratio']
+    }
+
+def _pool_metrics():
+    if db.pool is None:
+        return {}
+    stats = db.pool.stats()
+    return {(state,): stats[state] for state in ('in_use', 'idle', 'max_size', 'created', 'reused', 'discarded')}
+
+metrics.gauge_callback('cache_hit_ratio', 'Trefferquote der prozessinternen Caches', _cache_metrics, ('cache',))
+metrics.gauge_callback('db_pool_connections', 'Zustand des SQLite-Verbindungspools', _pool_metrics, ('state',))
+metrics.gauge_callback(
+    'portfolio_cache_bytes', 'Geschätzte Größe des Portfolio-Caches',
+    lambda: {(): portfolio_cache.stats()['bytes']}
+)
+
+# Mehrere Worker: jeder schreibt Snapshots nach METRICS_DIR, /metrics fasst alle
+# zusammen. Ohne METRICS_DIR zeigt /metrics nur den antwortenden Worker.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '10'))
+
+def _is_direct_loopback():
+    """Anfrage direkt über Loopback, nicht über einen Proxy (ProxyFix ersetzt REMOTE_ADDR)"""
+    peer = request.environ.get('werkzeug.proxy_fix.orig', {}).get('REMOTE_ADDR') or request.remote_addr
+    return peer in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metriken im Prometheus-Textformat (mit METRICS_TOKEN, ohne Token nur lokal)"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        if not secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Nicht autorisiert'}), 401
+    elif not _is_direct_loopback():
+        return jsonify({'error': 'Metriken ohne METRICS_TOKEN nur lokal abrufbar'}), 403
+    return Response(metrics.render(METRICS_DIR), mimetype='text/plain; version=0.0.4')
+
+def _require_admin():
+    """Admin-Endpunkte nur mit gültigem ADMIN_TOKEN (ohne Konfiguration: 404)"""
+    if not profiler.admin_token:
+        abort(404)
+    token = request.headers.get('X-Admin-Token')
+    if token is None and request.headers.get('Authorization', '').startswith('Bearer '):
+        token = request.headers['Authorization'][len('Bearer '):]
+    if not profiler.is_admin(token):
+        abort(403)
+
+@app.route('/admin/profiles')
+def list_profiles():
+    """Liste der gespeicherten Profile"""
+    _require_admin()
+    return jsonify({'profiles': profiler.list_profiles(), 'stats': profiler.stats()})
+
+@app.route('/admin/profiles/<name>')
+def download_profile(name):
+    """Profil herunterladen (.prof) oder mit ?format=text als pstats-Auszug"""
+    _require_admin()
+    if request.args.get('format') == 'text':
+        text = profiler.render_text(name, sort=request.args.get('sort', 'cumulative'))
+        if text is None:
+            abort(404)
+        return Response(text, mimetype='text/plain')
+    path = profiler.path_for(name)
+    if path is None:
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
 # Security Headers Middleware
 @app.before_request
 def security_headers():
@@ -455,26 +879,45 @@ def security_headers():
         logger.warning(f"Blockierter Pfad-Zugriff von {request.environ.get('REMOTE_ADDR', 'unbekannt')}: {request.path}")
         return jsonify({'error': 'Not Found'}), 404
 
-# Session-Bereinigung bei Start und regelmäßig
-from threading import Timer
-
-def periodic_cleanup():
-    """Regelmäßige Bereinigung alter Sessions und Login-Versuche"""
-    try:
-        cleanup_sessions()
-        
-        # Alte Login-Versuche löschen (älter als 24 Stunden)
-        with db.get_db_connection() as conn:
-            cutoff_time = (datetime.now() - timedelta(hours=24)).isoformat()
-            conn.execute('DELETE FROM login_attempts WHERE timestamp < ?', (cutoff_time,))
-            conn.commit()
-        
-        logger.info("Regelmäßige Bereinigung abgeschlossen")
-    except Exception as e:
-        logger.error(f"Fehler bei regelmäßiger Bereinigung: {e}")
-    
-    # Nächste Bereinigung in 1 Stunde planen
-    Timer(3600.0, periodic_cleanup).start()
+# Regelmäßige Wartung: ein Thread, aktiv nur im Prozess mit dem Leader-Lock
+# (flock neben users.db), Löschungen in kleinen Transaktionen
+maintenance = MaintenanceScheduler(
+    lock_path=os.environ.get(
+        'MAINTENANCE_LOCK_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(db.db_path)), 'maintenance.lock')
+    ),
+    jitter=float(os.environ.get('MAINTENANCE_JITTER', '0.1')),
+    leader_retry=float(os.environ.get('MAINTENANCE_LEADER_RETRY', '60'))
+)
+MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', '3600'))
+maintenance.add_task('sessions', cleanup_sessions, MAINTENANCE_INTERVAL)
+# Alte Login-Versuche löschen (älter als 24 Stunden)
+maintenance.add_task('login_attempts', db.cleanup_login_attempts, MAINTENANCE_INTERVAL)
+# Gemeinsame Rate-Limit-Zustände (sqlite-Backend): vollständig erholte IPs entfernen,
+# sonst wächst rate_limits.db um eine Zeile je IP
+shared_limiters = [limiter for limiter in (db.login_limiter, register_limiter)
+                   if isinstance(limiter, SQLiteGCRALimiter)]
+if shared_limiters:
+    maintenance.add_task(
+        'rate_limits',
+        lambda: sum(limiter.purge_expired() for limiter in shared_limiters),
+        MAINTENANCE_INTERVAL
+    )
+# Portfolio-Historie nur begrenzt aufbewahren (HISTORY_RETENTION_DAYS=0: unbegrenzt)
+HISTORY_RETENTION_DAYS = float(os.environ.get('HISTORY_RETENTION_DAYS', '365'))
+if HISTORY_RETENTION_DAYS > 0:
+    maintenance.add_task(
+        'portfolio_history',
+        lambda: portfolio_history.purge_older_than(HISTORY_RETENTION_DAYS),
+        MAINTENANCE_INTERVAL
+    )
+if session_tokens is not None:
+    # Abgelaufene Einträge der Token-Sperrliste entfernen
+    maintenance.add_task(
+        'session_revocations',
+        lambda: session_tokens.revocations.purge_expired(max_token_age=24 * 3600),
+        MAINTENANCE_INTERVAL
+    )
 
 # Fehlerbehandlung
 @app.errorhandler(404)
@@ -490,13 +933,26 @@ def internal_error(error):
 def ratelimit_handler(error):
     return render_template('error.html', error_code=429, error_message='Zu viele Anfragen. Bitte warten Sie.'), 429
 
+def start_maintenance():
+    """Bereinigung kurz nach dem Start und stündlich (Gunicorn: in jedem Worker, aktiv nur beim Leader)"""
+    maintenance.start()
+
+def start_worker_services():
+    """Hintergrunddienste je Worker-Prozess (Gunicorn: nach dem fork)"""
+    # Logging in den Hintergrund-Thread; im Master bleibt es synchron
+    if security_logging:
+        security_logging.start()
+    # Portfolios aktiver Benutzer im Hintergrund aktualisieren
+    if os.environ.get('PORTFOLIO_REFRESH_ENABLED', 'true').lower() == 'true':
+        portfolio_scheduler.start()
+    if METRICS_DIR:
+        metrics.start_flusher(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
 if __name__ == '__main__':
-    # Session-Bereinigung bei Start
-    cleanup_sessions()
-    
-    # Starte regelmäßige Bereinigung
-    periodic_cleanup()
+    # Entwicklungsserver; für den Produktionsbetrieb: gunicorn -c gunicorn.conf.py wsgi:app
+    start_maintenance()
+    start_worker_services()
     
-    # Produktionsserver - WICHTIG: host='0.0.0.0' für Docker
-    logger.info("Starte Bitpanda Portfolio auf 0.0.0.0:5000...")
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    port = int(os.environ.get('PORT', '5000'))
+    logger.info(f"Starte Bitpanda Portfolio auf 0.0.0.0:{port}...")
+    app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
@@ -0,0 +1,210 @@
+# Asynchroner Audit-Log-Writer (login_attempts, security.log)
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class _Flush:
+    """Markierung in der Queue: bisherigen Stapel sofort schreiben"""
+    __slots__ = ('done', 'stop')
+
+    def __init__(self, stop: bool = False):
+        self.done = threading.Event()
+        self.stop = stop
+
+class AuditWriter:
+    """Schreibt Audit-Ereignisse gesammelt in SQLite.
+
+    Ereignisse (SQL, Parameter) landen in einer begrenzten Queue; ein
+    Hintergrund-Thread schreibt sie spätestens nach `flush_interval` Sekunden
+    bzw. ab `batch_size` Ereignissen per executemany mit einem Commit.
+
+    Ist die Queue voll, wartet der Aufrufer höchstens `put_timeout` Sekunden
+    und schreibt sein Ereignis dann selbst synchron (Gegendruck statt
+    Datenverlust). Der Thread startet beim ersten Ereignis und nach einem
+    fork() im Kindprozess neu; beim Beenden des Prozesses wird geleert.
+    """
+    def __init__(self, connection_factory, flush_interval: float = 1.0, batch_size: int = 500,
+                 max_queue: int = 10000, put_timeout: float = 0.05, name: str = 'audit-writer'):
+        self.connection_factory = connection_factory
+        self.name = name
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.sync_writes = 0
+        self.errors = 0
+        atexit.register(self.close)
+
+    def submit(self, sql: str, params: Tuple):
+        """Reiht ein Ereignis ein (blockiert nur bei voller Queue kurz)"""
+        if self._closed:
+            self._write([(sql, params)])
+            return
+        self._ensure_started()
+        try:
+            self._queue.put((sql, params), timeout=self.put_timeout)
+        except queue.Full:
+            self.sync_writes += 1
+            self._write([(sql, params)])
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wartet, bis alle bisher eingereihten Ereignisse geschrieben sind"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Schreibt ausstehende Ereignisse und beendet den Thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread if self._pid == os.getpid() else None
+        if thread is not None and thread.is_alive():
+            marker = _Flush(stop=True)
+            self._queue.put(marker)
+            marker.done.wait(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Kindprozess: Einträge der Eltern-Queue schreibt der Elternprozess
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while not isinstance(item, _Flush):
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    item = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    item = None
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    item = None
+                    break
+            if batch:
+                self._write(batch)
+            if isinstance(item, _Flush):
+                item.done.set()
+                if item.stop:
+                    return
+
+    def _write(self, events: List[Tuple[str, Tuple]]):
+        # Gleiche Anweisungen zusammenfassen: ein executemany je SQL, ein Commit
+        grouped: Dict[str, List[Tuple]] = {}
+        for sql, params in events:
+            grouped.setdefault(sql, []).append(params)
+        try:
+            with self.connection_factory() as conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+                conn.commit()
+            with self._lock:
+                self.written += len(events)
+                self.batches += 1
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.error(f"{self.name}: Ereignisse konnten nicht geschrieben werden ({len(events)}): {e}")
+
+    def stats(self) -> Dict:
+        """Zähler des Writers"""
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'batches': self.batches,
+                'sync_writes': self.sync_writes,
+                'errors': self.errors
+            }
+
+class SecurityLogging:
+    """Root-Logging in security.log und auf die Konsole.
+
+    Bis start() schreiben Aufrufer synchron in die Handler. start() schaltet
+    den laufenden Prozess auf QueueHandler/QueueListener um (Datei-I/O im
+    Hintergrund). Gunicorn ruft start() erst im Worker nach dem fork auf; der
+    Master mit preload_app startet so keinen Thread, dessen Locks in die
+    Worker kopiert würden, und Einträge vor dem Start gehen nicht verloren.
+    """
+    def __init__(self, handlers: List[logging.Handler]):
+        self.handlers = handlers
+        self._lock = threading.Lock()
+        self._listener = None
+        self._pid = None
+
+    def start(self):
+        """Schaltet auf den Hintergrund-Thread um (idempotent je Prozess)"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+            root = logging.getLogger()
+            if self._listener is None:
+                log_queue = queue.Queue(-1)
+                self._listener = QueueListener(log_queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                # Handler-Liste in einem Schritt ersetzen, damit kein Eintrag fehlt oder doppelt erscheint
+                root.handlers = [h for h in root.handlers if h not in self.handlers] + [QueueHandler(log_queue)]
+                atexit.register(self.stop)
+            else:
+                # Vor einem fork() gestartet: der Thread existiert im Kindprozess nicht
+                self._listener._thread = None
+                self._listener.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Schreibt ausstehende Einträge und beendet den Thread"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid() and self._listener._thread:
+                self._listener.stop()
+
+def setup_security_logging(log_file: str = 'security.log', level: int = logging.INFO,
+                           fmt: str = '%(asctime)s - %(levelname)s - %(message)s'):
+    """Root-Logging wie logging.basicConfig mit FileHandler und StreamHandler.
+
+    Zunächst synchron; SecurityLogging.start() verlagert das Schreiben in einen
+    Hintergrund-Thread. Ist das Root-Logging bereits konfiguriert, bleibt es
+    unverändert und das Ergebnis ist None.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = logging.Formatter(fmt)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(level)
+    return SecurityLogging(handlers)
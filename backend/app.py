@@ -43,8 +43,8 @@ if API_KEY and not DEMO_MODE:
 else:
     logger.info("DEMO-MODUS AKTIV: Es wird mit Beispieldaten gearbeitet!")
 
-# Bitpanda API-Basis-URL
-BASE_URL = "https://api.bitpanda.com/v1"
+# Bitpanda API-Basis-URL (für Tests auf den lokalen Stub umstellbar)
+BASE_URL = os.getenv("BITPANDA_API_BASE_URL", "https://api.bitpanda.com/v1").rstrip("/")
 
 # Header für die API-Anfragen mit dem API-Schlüssel
 headers = {
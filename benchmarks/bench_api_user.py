@@ -0,0 +1,74 @@
+# Benchmark: Anfragen pro Sekunde auf /api/user mit und ohne API-Schlüssel-Cache
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_api_user.py --seconds 5
+#
+# Jede Konfiguration läuft in einem eigenen Prozess (die App liest ihre
+# Einstellungen beim Import) mit temporärer Datenbank über den Flask-Testclient.
+# Der User-Cache vor load_user wird abgeschaltet, damit jede Anfrage
+# get_user_by_id inklusive Entschlüsselung durchläuft; die letzte Zeile zeigt
+# zum Vergleich die Standardkonfiguration mit beiden Caches.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PASSWORD = "Benchmark123"
+# Echtes Format eines API-Schlüssels, damit Fernet mit realistischer Länge arbeitet
+API_KEY = "a1b2c3d4e5" * 8
+
+CONFIGURATIONS = (
+    ("ohne Schlüssel-Cache", {"USER_CACHE_TTL": "0", "API_KEY_CACHE_TTL": "0"}),
+    ("mit Schlüssel-Cache", {"USER_CACHE_TTL": "0", "API_KEY_CACHE_TTL": "300"}),
+    ("User- und Schlüssel-Cache", {"USER_CACHE_TTL": "60", "API_KEY_CACHE_TTL": "300"}),
+)
+
+
+def child(seconds):
+    """Misst im aktuellen Prozess; Ergebnis als JSON auf stdout"""
+    from app import app, db
+
+    db.create_user("benchuser", PASSWORD, API_KEY)
+    client = app.test_client()
+    response = client.post("/login", json={"username": "benchuser", "password": PASSWORD})
+    assert response.status_code == 200, response.get_data(as_text=True)
+
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        assert client.get("/api/user").status_code == 200
+        count += 1
+    print(json.dumps({"rps": count / seconds, "key_cache": db.key_cache.stats()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anfragen pro Sekunde auf /api/user mit und ohne Schlüssel-Cache")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.seconds)
+        return
+
+    print(f"{'Konfiguration':<28}{'Anfragen/s':>12}{'Trefferquote':>14}")
+    for label, settings in CONFIGURATIONS:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = dict(os.environ, PORTFOLIO_REFRESH_ENABLED="false", **settings)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--seconds", str(args.seconds)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<28}{result['rps']:>12.0f}{result['key_cache']['hit_ratio']:>14.2%}")
+
+
+if __name__ == "__main__":
+    main()
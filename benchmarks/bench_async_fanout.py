@@ -0,0 +1,54 @@
+# Benchmark: Portfolios vieler API-Schlüssel in einem Event-Loop laden
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_async_fanout.py --keys 200 --latency 0.1
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitpanda_api import BitpandaAPI
+from bitpanda_api_async import AsyncBitpandaAPI
+from bitpanda_stub import BitpandaStub, parse_latency, start_stub_server
+
+
+async def run_async(base_url, api_keys):
+    async with AsyncBitpandaAPI(ticker_cache=None, rate_limiter=None, base_url=base_url) as api:
+        start = time.perf_counter()
+        results = await api.get_portfolios(api_keys)
+        elapsed = time.perf_counter() - start
+    errors = [r for r in results.values() if isinstance(r, Exception)]
+    return elapsed, results, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asynchroner Fan-out über viele API-Schlüssel")
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = start_stub_server(BitpandaStub(latencies={"default": parse_latency(f"fixed:{args.latency}")}))
+    base_url = server.base_url
+    api_keys = [f"benchmark-key-{i:05d}" for i in range(args.keys)]
+
+    elapsed, results, errors = asyncio.run(run_async(base_url, api_keys))
+    print(f"async: {args.keys} Portfolios in {elapsed:.2f}s ({args.keys / elapsed:.0f}/s), Fehler: {len(errors)}")
+
+    # Gleiches Ergebnis wie der synchrone Client (bis auf den Zeitstempel)
+    sync_api = BitpandaAPI(ticker_cache=None, rate_limiter=None, base_url=base_url)
+    expected = sync_api.get_portfolio(api_keys[0])
+    actual = results[api_keys[0]]
+    expected.pop("last_updated")
+    actual.pop("last_updated")
+    print("Ergebnis identisch mit BitpandaAPI:", expected == actual)
+    sync_api.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Benchmark: Abfragezeiten auf login_attempts/sessions vor und nach den Index-Migrationen
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_db_indexes.py --rows 2000000
+#
+# Legt eine temporäre Datenbank mit Schema-Version 1 (ohne Indizes) an, füllt
+# sie mit Login-Versuchen und Sessions, misst die Abfragen aus
+# cleanup_old_sessions und cleanup_login_attempts, migriert auf
+# die neueste Version und misst erneut.
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from migrations import LATEST_VERSION, apply_migrations, get_schema_version
+
+
+def seed(conn, rows, sessions):
+    now = datetime.now()
+    ips = [f"10.{a}.{b}.{c}" for a in range(4) for b in range(50) for c in range(50)]
+
+    def attempts():
+        for _ in range(rows):
+            ts = now - timedelta(seconds=random.randint(0, 7 * 24 * 3600))
+            yield (random.choice(ips), "user", random.random() < 0.3, ts.isoformat())
+
+    conn.executemany(
+        "INSERT INTO login_attempts (ip_address, username, success, timestamp) VALUES (?, ?, ?, ?)",
+        attempts()
+    )
+    conn.execute("INSERT INTO users (username, password_hash, api_key_encrypted) VALUES ('user', 'x', x'00')")
+    conn.executemany(
+        "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, 1, ?)",
+        ((f"s{i}", (now + timedelta(hours=random.randint(-72, 24))).isoformat()) for i in range(sessions))
+    )
+    conn.commit()
+
+
+def timed(conn, sql, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run_queries(conn, repeat):
+    now = datetime.now()
+    queries = {
+        # Stündliche Bereinigung: seit dem letzten Lauf ist nur ein kleiner Teil abgelaufen
+        "login_attempts_purge": (
+            "SELECT COUNT(*) FROM login_attempts WHERE timestamp < ?",
+            ((now - timedelta(days=7) + timedelta(hours=1)).isoformat(),),
+        ),
+        "expired_sessions": (
+            "SELECT COUNT(*) FROM sessions WHERE expires_at < ?",
+            ((now - timedelta(hours=71)).isoformat(),),
+        ),
+    }
+    results = {}
+    for name, (sql, params) in queries.items():
+        plan = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        results[name] = (timed(conn, sql, params, repeat), plan[-1][-1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Abfragezeiten vor und nach den Index-Migrationen")
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--sessions", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        conn = sqlite3.connect(os.path.join(workdir, "bench.db"))
+        conn.execute("PRAGMA journal_mode=WAL")
+        apply_migrations(conn, target_version=1)
+
+        start = time.perf_counter()
+        seed(conn, args.rows, args.sessions)
+        print(f"{args.rows} Login-Versuche und {args.sessions} Sessions in {time.perf_counter() - start:.1f}s angelegt")
+
+        before = run_queries(conn, args.repeat)
+        start = time.perf_counter()
+        apply_migrations(conn)
+        print(f"Migration auf Version {get_schema_version(conn)} (Ziel {LATEST_VERSION}) in {time.perf_counter() - start:.1f}s")
+        after = run_queries(conn, args.repeat)
+        conn.close()
+
+    print(f"\n{'Abfrage':<28}{'vorher':>12}{'nachher':>12}  Plan nachher")
+    for name in before:
+        print(f"{name:<28}{before[name][0]:>10.2f}ms{after[name][0]:>10.2f}ms  {after[name][1]}")
+
+
+if __name__ == "__main__":
+    main()
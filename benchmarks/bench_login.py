@@ -0,0 +1,91 @@
+# Microbenchmark: Logins pro Sekunde mit und ohne SQLite-Verbindungspool
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_login.py --seconds 5 --threads 4
+#
+# Die Datenbank und der Verschlüsselungsschlüssel werden in einem temporären
+# Verzeichnis angelegt. Gemessen werden:
+#   - login:         vollständiger authenticate_user inkl. Passwortprüfung (PBKDF2)
+#   - login_unknown: fehlgeschlagener Login für unbekannten Benutzer (reiner DB-Pfad)
+#   - get_user_by_id
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from database import SecureUserDatabase
+
+PASSWORD = "Benchmark123"
+
+
+def run_for(seconds, threads, operation):
+    """Führt operation(i) in mehreren Threads für eine feste Zeit aus"""
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        i = 0
+        while time.perf_counter() < deadline:
+            operation(index * 1_000_000 + i)
+            i += 1
+        counts[index] = i
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def bench(db, seconds, threads):
+    user_id = db.get_user_by_id(1)['user_id']
+
+    def login(i):
+        # Jede Anmeldung von einer anderen IP, damit das Rate Limiting nicht greift
+        result = db.authenticate_user("benchuser", PASSWORD, f"10.{i % 250}.{i // 250 % 250}.{i % 7}", "bench")
+        db.logout_user(result['session_id'])
+
+    def login_unknown(i):
+        try:
+            db.authenticate_user("unknownuser", PASSWORD, f"10.{i % 250}.{i // 250 % 250}.{i % 7}", "bench")
+        except ValueError:
+            pass
+
+    return {
+        "login": run_for(seconds, threads, login),
+        "login_unknown": run_for(seconds, threads, login_unknown),
+        "get_user_by_id": run_for(seconds, threads, lambda i: db.get_user_by_id(user_id)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logins pro Sekunde mit und ohne Verbindungspool")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    results = {}
+    for label, pool_size in (("ohne Pool", 0), ("mit Pool", 8)):
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            db = SecureUserDatabase(os.path.join(workdir, "bench.db"), pool_size=pool_size)
+            db.create_user("benchuser", PASSWORD, "DEMO_MODE")
+            results[label] = bench(db, args.seconds, args.threads)
+            if db.pool:
+                db.pool.close_all()
+            os.chdir(PROJECT_DIR)
+
+    print(f"{'Operation':<18}" + "".join(f"{label:>14}" for label in results))
+    for operation in next(iter(results.values())):
+        print(f"{operation:<18}" + "".join(f"{r[operation]:>12.0f}/s" for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Benchmark: Latenz von /api/user während eines Login-Ansturms
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_login_storm.py --seconds 5 --storm-threads 8
+#
+# Jede Konfiguration läuft in einem eigenen Prozess mit temporärer Datenbank
+# über den Flask-Testclient. Gemessen wird p50/p99 von /api/user zuerst
+# ohne Last und dann, während `storm-threads` Threads ununterbrochen
+# /login aufrufen:
+#   inline: PBKDF2 im Request-Thread (PASSWORD_HASH_WORKERS=0)
+#   pool:   PBKDF2 im Prozess-Pool (PASSWORD_HASH_WORKERS=--workers)
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PASSWORD = "Benchmark123"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def child(seconds, storm_threads, poll_threads):
+    """Misst im aktuellen Prozess; Ergebnis als JSON auf stdout"""
+    from app import app, db
+
+    db.create_user("benchuser", PASSWORD, "DEMO_MODE")
+
+    def poll(duration):
+        latencies = []
+        threads = []
+
+        def worker():
+            client = app.test_client()
+            response = client.post("/login", json={"username": "benchuser", "password": PASSWORD})
+            assert response.status_code == 200, response.get_data(as_text=True)
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                client.get("/api/user")
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        for _ in range(poll_threads):
+            threads.append(threading.Thread(target=worker))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies
+
+    baseline = poll(seconds)
+
+    stop = threading.Event()
+    logins = [0, 0]
+
+    def storm(index):
+        client = app.test_client()
+        i = 0
+        while not stop.is_set():
+            # Wechselnde IP-Adressen, damit das Login-Rate-Limit nicht greift
+            response = client.post("/login", json={"username": "benchuser", "password": PASSWORD},
+                                   environ_base={"REMOTE_ADDR": f"10.0.{index}.{i % 250}"})
+            logins[0 if response.status_code == 200 else 1] += 1
+            i += 1
+
+    stormers = [threading.Thread(target=storm, args=(n,)) for n in range(storm_threads)]
+    storm_start = time.perf_counter()
+    for thread in stormers:
+        thread.start()
+    loaded = poll(seconds)
+    stop.set()
+    for thread in stormers:
+        thread.join()
+    # Tatsächliche Dauer: laufende Logins werden nach Ablauf noch abgeschlossen
+    storm_elapsed = time.perf_counter() - storm_start
+
+    print(json.dumps({
+        "baseline_p50": percentile(baseline, 0.5),
+        "baseline_p99": percentile(baseline, 0.99),
+        "storm_p50": percentile(loaded, 0.5),
+        "storm_p99": percentile(loaded, 0.99),
+        "logins_per_s": logins[0] / storm_elapsed,
+        "logins_rejected": logins[1],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p99-Latenz von /api/user während eines Login-Ansturms")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--storm-threads", type=int, default=8)
+    parser.add_argument("--poll-threads", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Hash-Prozesse im Pool-Modus")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.seconds, args.storm_threads, args.poll_threads)
+        return
+
+    configurations = (
+        ("inline", {"PASSWORD_HASH_WORKERS": "0"}),
+        ("pool", {"PASSWORD_HASH_WORKERS": str(args.workers)}),
+    )
+    print(f"{'Modus':<8}{'p50 ms':>10}{'p99 ms':>10}{'p50 Last':>10}{'p99 Last':>10}{'Logins/s':>10}{'503':>6}")
+    for label, settings in configurations:
+        with tempfile.TemporaryDirectory() as workdir:
+            # User-Cache aus, damit /api/user den üblichen Pfad über die Datenbank nimmt
+            env = dict(os.environ, PORTFOLIO_REFRESH_ENABLED="false", USER_CACHE_TTL="0", **settings)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--seconds", str(args.seconds),
+                 "--storm-threads", str(args.storm_threads), "--poll-threads", str(args.poll_threads)],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(output.strip().splitlines()[-1])
+        print(f"{label:<8}{r['baseline_p50']:>10.1f}{r['baseline_p99']:>10.1f}{r['storm_p50']:>10.1f}"
+              f"{r['storm_p99']:>10.1f}{r['logins_per_s']:>10.1f}{r['logins_rejected']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark: sequenzieller vs. paralleler Portfolio-Abruf gegen den lokalen Bitpanda-Stub (bitpanda_stub.py),
+# dazu Verbindungspool- und Executor-Größe bei mehreren gleichzeitigen Aufrufern
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/bench_portfolio_fetch.py --latency 0.15 --runs 20
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitpanda_api import BitpandaAPI
+from bitpanda_stub import BitpandaStub, parse_latency, start_stub_server
+
+def measure(api, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        api.get_portfolio("benchmark-key")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_concurrent(api, runs, threads):
+    """Mehrere Flask-ähnliche Threads rufen gleichzeitig get_portfolio auf"""
+    def timed_call(_):
+        start = time.perf_counter()
+        api.get_portfolio("benchmark-key")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(timed_call, range(runs * threads)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequenzieller vs. paralleler Portfolio-Abruf")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stub-Latenz pro Anfrage in Sekunden")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=16, help="Parallele Aufrufer im Pool-Vergleich")
+    args = parser.parse_args()
+
+    server = start_stub_server(BitpandaStub(wallets=2, latencies={"default": parse_latency(f"fixed:{args.latency}")}))
+    base_url = server.base_url
+
+    print(f"Stub-Latenz: {args.latency * 1000:.0f} ms, Durchläufe: {args.runs}")
+    print(f"{'Modus':<14}{'Median':>12}{'p95':>12}")
+    for label, concurrent in (("sequenziell", False), ("parallel", True)):
+        # Ohne Ticker-Cache, damit jeder Durchlauf alle drei Endpunkte abfragt
+        api = BitpandaAPI(concurrent=concurrent, ticker_cache=None, rate_limiter=None, base_url=base_url)
+        timings = sorted(measure(api, args.runs))
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{label:<14}{statistics.median(timings) * 1000:>10.1f}ms{p95 * 1000:>10.1f}ms")
+        api.close()
+
+    # Verbindungspool unter Last: zu kleiner Pool verwirft Verbindungen, passender Pool nutzt sie wieder
+    # (Executor groß genug für alle Aufrufer, damit nur die Pool-Größe variiert)
+    sized = args.threads * (len(BitpandaAPI.PORTFOLIO_ENDPOINTS) + 1)
+    print(f"\n{args.threads} parallele Aufrufer")
+    print(f"{'Pool-Größe':<14}{'Median':>12}{'p95':>12}{'neu':>8}{'wiederverw.':>13}")
+    for pool_size in (1, sized):
+        api = BitpandaAPI(ticker_cache=None, rate_limiter=None, max_workers=sized, pool_size=pool_size,
+                          base_url=base_url)
+        timings = sorted(measure_concurrent(api, args.runs, args.threads))
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        stats = api.pool_stats()
+        print(f"{pool_size:<14}{statistics.median(timings) * 1000:>10.1f}ms{p95 * 1000:>10.1f}ms"
+              f"{stats['connections_created']:>8}{stats['connections_reused']:>13}")
+        api.close()
+
+    # Executor unter Last: jeder Aufruf belegt drei Fetch-Threads (Ticker + zwei Endpunkte);
+    # mit 16 Threads stauen sich die Aufgaben, mit Aufrufer x 3 laufen alle gleichzeitig
+    print(f"\n{args.threads} parallele Aufrufer")
+    print(f"{'Fetch-Threads':<14}{'Median':>12}{'p95':>12}")
+    for max_workers in (16, sized):
+        api = BitpandaAPI(ticker_cache=None, rate_limiter=None, max_workers=max_workers,
+                          pool_size=sized, base_url=base_url)
+        timings = sorted(measure_concurrent(api, args.runs, args.threads))
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{max_workers:<14}{statistics.median(timings) * 1000:>10.1f}ms{p95 * 1000:>10.1f}ms")
+        api.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Lasttest: Anfragen pro Sekunde auf /api/portfolio (Demo-Modus) je Servermodus
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/load_test.py --seconds 10 --concurrency 32
+#   python benchmarks/load_test.py --modes gunicorn --workers 4 --threads 8
+#   python benchmarks/load_test.py --stub --stub-latency lognormal:0.08:0.5
+#
+# Für jeden Modus wird ein Server in einem temporären Arbeitsverzeichnis
+# gestartet, ein Demo-Benutzer registriert und angemeldet; danach rufen
+# `concurrency` Threads für eine feste Zeit /api/portfolio ab.
+#   dev:      python app.py (Flask-Entwicklungsserver, threaded)
+#   gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+# Mit --stub nutzt der Benutzer statt des Demo-Modus einen API-Schlüssel, und
+# alle Bitpanda-Anfragen gehen an den lokalen Stub (bitpanda_stub.py).
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from bitpanda_stub import BitpandaStub, parse_latency, start_stub_server
+
+PASSWORD = "Lasttest123"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, workdir, workers, threads, extra_env):
+    env = dict(
+        os.environ,
+        **extra_env,
+        PORT=str(port),
+        SECRET_KEY="load-test",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        PORTFOLIO_REFRESH_ENABLED="false",
+        HISTORY_DATABASE_PATH=os.path.join(workdir, "history.db"),
+    )
+    if mode == "dev":
+        command = [sys.executable, os.path.join(PROJECT_DIR, "app.py")]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(PROJECT_DIR, "gunicorn.conf.py"),
+                   "--pythonpath", PROJECT_DIR, "--access-logfile", "/dev/null", "wsgi:app"]
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server im Modus {mode} ist nicht gestartet")
+
+
+def login(base_url, username, api_key=""):
+    http = requests.Session()
+    response = http.post(f"{base_url}/register",
+                         json={"username": username, "password": PASSWORD, "api_key": api_key})
+    response.raise_for_status()
+    response = http.post(f"{base_url}/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return http
+
+
+def run_load(base_url, http, seconds, concurrency):
+    """Ruft /api/portfolio parallel ab; liefert (Anfragen/s, Latenzen in ms, Fehler)"""
+    cookies = http.cookies.get_dict()
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        client = requests.Session()
+        client.cookies.update(cookies)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = client.get(f"{base_url}/api/portfolio", timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                latencies[index].append((time.perf_counter() - start) * 1000)
+            else:
+                errors[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    merged = sorted(value for values in latencies for value in values)
+    return len(merged) / seconds, merged, sum(errors)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest für /api/portfolio (Demo-Modus) je Servermodus")
+    parser.add_argument("--modes", nargs="+", choices=("dev", "gunicorn"), default=["dev", "gunicorn"])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="Gunicorn-Worker")
+    parser.add_argument("--threads", type=int, default=8, help="Threads je Gunicorn-Worker")
+    parser.add_argument("--stub", action="store_true", help="Echter Abrufpfad gegen den lokalen Bitpanda-Stub")
+    parser.add_argument("--stub-latency", default="uniform:0.05:0.15", help="Latenzverteilung des Stubs")
+    args = parser.parse_args()
+
+    extra_env = {}
+    stub_server = None
+    if args.stub:
+        stub_server = start_stub_server(BitpandaStub(latencies={"default": parse_latency(args.stub_latency)}))
+        extra_env["BITPANDA_API_BASE_URL"] = stub_server.base_url
+
+    print(f"{'Modus':<10}{'Anfragen/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'Fehler':>8}")
+    for mode in args.modes:
+        with tempfile.TemporaryDirectory() as workdir:
+            port = free_port()
+            process = start_server(mode, port, workdir, args.workers, args.threads, extra_env)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                http = login(base_url, f"lasttest{mode}", "lasttest-key-0001" if args.stub else "")
+                rps, latencies, errors = run_load(base_url, http, args.seconds, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+        print(f"{mode:<10}{rps:>12.0f}{percentile(latencies, 0.5):>10.1f}"
+              f"{percentile(latencies, 0.99):>10.1f}{errors:>8}")
+
+    if stub_server is not None:
+        print(f"Stub: {stub_server.stub.stats()['responses']}")
+        stub_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# Benchmark-Suite: Laufzeiten der wichtigsten Hot Paths als JSON, mit Baseline-Vergleich
+#
+# Aufruf (im Projektverzeichnis):
+#   python benchmarks/run_benchmarks.py --output baseline.json
+#   python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.2
+#
+# Die Messungen laufen in einem eigenen Prozess mit temporärer Datenbank im
+# Arbeitsverzeichnis (die App liest ihre Einstellungen beim Import):
+#   process_portfolio[n]        BitpandaAPI._process_portfolio_data mit n synthetischen Wallets
+#   authenticate_user           Login inkl. PBKDF2, Rate Limit und Session-Anlage
+#   get_user_by_id[cached|cold] Benutzer laden inkl. Entschlüsselung (mit/ohne Schlüssel-Cache)
+#   load_user[cached|cold]      Flask-Login-Callback (mit/ohne User-Cache)
+#   api_portfolio_demo          GET /api/portfolio im Demo-Modus über den Flask-Testclient
+#   cleanup_old_sessions[n]     Löschen von n/2 abgelaufenen aus n Sessions
+#
+# Mit --compare wird jeder Median mit der Baseline verglichen; ist einer um
+# mehr als --threshold (Anteil) langsamer, endet das Skript mit Exit-Code 1.
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PASSWORD = "Benchmark123"
+API_KEY = "a1b2c3d4e5" * 8
+SYMBOLS = ("BTC", "ETH", "ADA", "SOL", "XRP", "DOT", "LTC", "BEST")
+
+
+def measure(func, rounds, number=1, setup=None):
+    """Führt func `number`-mal je Runde aus; Zeit pro Aufruf in Millisekunden"""
+    timings = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number * 1000)
+    timings.sort()
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": timings[0],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def synthetic_portfolio(wallets):
+    """Rohdaten im Format der Bitpanda-Antworten (etwa jede fünfte Wallet leer)"""
+    asset_wallets = [
+        {"attributes": {
+            "cryptocoin_symbol": SYMBOLS[i % len(SYMBOLS)],
+            "balance": "0.00000000" if i % 5 == 0 else f"{random.uniform(0.001, 100):.8f}",
+        }}
+        for i in range(wallets)
+    ]
+    fiat_wallets = [
+        {"attributes": {"fiat_symbol": symbol, "balance": f"{random.uniform(10, 5000):.2f}"}}
+        for symbol in ("EUR", "USD", "CHF", "GBP")
+    ]
+    ticker = {symbol: random.uniform(0.1, 50000) for symbol in SYMBOLS}
+    return {"asset_wallets": {"data": asset_wallets}, "fiat_wallets": {"data": fiat_wallets}}, ticker
+
+
+def child(quick):
+    """Misst im aktuellen Prozess; Ergebnis als JSON auf stdout"""
+    from flask import session
+
+    from app import app, db, load_user, user_cache
+    from bitpanda_api import BitpandaAPI
+
+    results = {}
+
+    # Portfolio-Verarbeitung: reine CPU-Arbeit, daher mehrere Aufrufe je Runde bei kleinen Listen
+    api = BitpandaAPI(concurrent=False)
+    sizes = (10, 100, 1000, 10000) if quick else (10, 100, 1000, 10000, 100000)
+    for size in sizes:
+        raw_data, ticker = synthetic_portfolio(size)
+        number = max(1, 10000 // size)
+        results[f"process_portfolio[{size}]"] = measure(
+            lambda: api._process_portfolio_data(raw_data, ticker), rounds=5 if quick else 15, number=number
+        )
+    api.close()
+
+    db.create_user("benchuser", PASSWORD, API_KEY)
+    db.create_user("demouser", PASSWORD, "DEMO_MODE")
+    user_id = db.get_user_id("benchuser")
+
+    # Erfolgreiche Logins geben ihre Rate-Limit-Einheit zurück, eine IP genügt
+    results["authenticate_user"] = measure(
+        lambda: db.authenticate_user("benchuser", PASSWORD, "10.0.0.1", "benchmark"),
+        rounds=3 if quick else 10
+    )
+
+    results["get_user_by_id[cached]"] = measure(lambda: db.get_user_by_id(user_id), rounds=20, number=200)
+    results["get_user_by_id[cold]"] = measure(
+        lambda: db.get_user_by_id(user_id), rounds=200, setup=lambda: db.forget_api_key(user_id)
+    )
+
+    auth = db.authenticate_user("benchuser", PASSWORD, "10.0.0.1", "benchmark")
+    with app.test_request_context():
+        session["session_id"] = auth["session_id"]
+        load_user(user_id)
+        results["load_user[cached]"] = measure(lambda: load_user(user_id), rounds=20, number=500)
+        results["load_user[cold]"] = measure(
+            lambda: load_user(user_id), rounds=200,
+            setup=lambda: (user_cache.invalidate_session(user_id, auth["session_id"]), db.forget_api_key(user_id))
+        )
+
+    client = app.test_client()
+    response = client.post("/login", json={"username": "demouser", "password": PASSWORD})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    results["api_portfolio_demo"] = measure(
+        lambda: client.get("/api/portfolio"), rounds=20 if quick else 50, number=20
+    )
+
+    # Bereinigung: vor jeder Runde n Sessions anlegen, davon die Hälfte abgelaufen
+    demo_id = db.get_user_id("demouser")
+    for size in ((20000,) if quick else (20000, 200000)):
+        def seed(size=size):
+            now = datetime.now()
+            with db.get_db_connection() as conn:
+                conn.execute("DELETE FROM sessions")
+                conn.executemany(
+                    "INSERT INTO sessions (id, user_id, expires_at) VALUES (?, ?, ?)",
+                    ((f"bench{i}", demo_id, (now + timedelta(hours=-1 if i % 2 else 1)).isoformat())
+                     for i in range(size))
+                )
+                conn.commit()
+        results[f"cleanup_old_sessions[{size}]"] = measure(db.cleanup_old_sessions, rounds=3, setup=seed)
+
+    print(json.dumps(results))
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Tabelle Baseline vs. aktuell; liefert die Namen der Regressionen"""
+    regressions = []
+    print(f"{'Benchmark':<32}{'Baseline ms':>14}{'Aktuell ms':>14}{'Änderung':>10}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<32}{'-':>14}{current['median_ms']:>14.3f}{'neu':>10}")
+            continue
+        change = current["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<32}{before['median_ms']:>14.3f}{current['median_ms']:>14.3f}{change:>+10.1%}{flag}")
+    for name in baseline:
+        if name not in results:
+            print(f"{name:<32}{baseline[name]['median_ms']:>14.3f}{'-':>14}{'entfallen':>10}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark-Suite der Hot Paths mit JSON-Ausgabe und Baseline-Vergleich")
+    parser.add_argument("--output", help="Ergebnis als JSON speichern")
+    parser.add_argument("--compare", metavar="BASELINE", help="Mit einer gespeicherten JSON-Baseline vergleichen")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Erlaubte Verlangsamung des Medians (Anteil)")
+    parser.add_argument("--quick", action="store_true", help="Weniger Runden und kleinere Datenmengen")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.quick)
+        return
+
+    command = [sys.executable, os.path.abspath(__file__), "--child"] + (["--quick"] if args.quick else [])
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PORTFOLIO_REFRESH_ENABLED="false")
+        output = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} Regression(en) über {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        return
+
+    print(f"{'Benchmark':<32}{'Median ms':>12}{'Min ms':>12}{'p95 ms':>12}")
+    for name, result in results.items():
+        print(f"{name:<32}{result['median_ms']:>12.3f}{result['min_ms']:>12.3f}{result['p95_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,166 @@
 # Bitpanda API-Client mit Sicherheitsfunktionen
+import os
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from typing import Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
 import time
+from metrics import metrics
+from rate_limiter import RateLimitExceeded, UpstreamRateLimiter, jittered_backoff, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
-class BitpandaAPI:
+UPSTREAM_SECONDS = metrics.histogram(
+    'upstream_request_duration_seconds', 'Dauer von Anfragen an die Bitpanda-API', ('endpoint', 'status')
+)
+UPSTREAM_RETRIES = metrics.counter(
+    'upstream_retries_total', 'Wiederholte Anfragen an die Bitpanda-API', ('endpoint', 'reason')
+)
+
+class _TickerFlight:
+    """Eine laufende Ticker-Aktualisierung, auf die weitere Anfragen warten"""
     def __init__(self):
-        self.base_url = "https://api.bitpanda.com/v1"
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TickerCache:
+    """Prozessweiter Cache für die globale Ticker-Preistabelle.
+    
+    Die Preise sind für alle Benutzer identisch. Bei einem Cache-Miss lädt
+    genau ein Thread neu (Single-Flight), alle anderen warten auf dessen Ergebnis.
+    """
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._prices = None
+        self._expires_at = 0.0
+        self._flight = None
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+    
+    def get(self, loader: Callable[[], Optional[Dict[str, float]]]) -> Optional[Dict[str, float]]:
+        """Liefert die Preise aus dem Cache oder lädt sie genau einmal neu"""
+        with self._lock:
+            if self._prices is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._prices
+            
+            self.misses += 1
+            flight = self._flight
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flight = _TickerFlight()
+        
+        if not is_leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+        
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.refresh_errors += 1
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None:
+                    self.refreshes += 1
+                    if flight.value is not None:
+                        self._prices = flight.value
+                        self._expires_at = time.monotonic() + self.ttl
+                self._flight = None
+            flight.event.set()
+        
+        return flight.value
+    
+    def peek(self) -> Optional[Dict[str, float]]:
+        """Liefert gültige Preise ohne Nachladen (None bei Cache-Miss)"""
+        with self._lock:
+            if self._prices is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._prices
+            self.misses += 1
+            return None
+    
+    def store(self, prices: Dict[str, float]):
+        """Übernimmt extern geladene Preise (z.B. vom asynchronen Client)"""
+        with self._lock:
+            self.refreshes += 1
+            self._prices = prices
+            self._expires_at = time.monotonic() + self.ttl
+    
+    def invalidate(self):
+        """Verwirft die zwischengespeicherten Preise"""
+        with self._lock:
+            self._prices = None
+            self._expires_at = 0.0
+    
+    def stats(self) -> Dict:
+        """Zähler für Treffer, Fehlzugriffe und Aktualisierungen"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "ttl": self.ttl
+            }
+
+# Basis-URL der Bitpanda-API; für Last- und Offline-Tests z.B. auf bitpanda_stub.py umstellbar
+DEFAULT_BASE_URL = os.environ.get('BITPANDA_API_BASE_URL', 'https://api.bitpanda.com/v1')
+
+# Gemeinsamer Ticker-Cache für alle BitpandaAPI-Instanzen im Prozess
+ticker_cache = TickerCache(ttl=float(os.environ.get('TICKER_CACHE_TTL', '30')))
+
+# Gemeinsames Upstream-Budget (pro API-Schlüssel und global) für alle Instanzen
+upstream_rate_limiter = UpstreamRateLimiter(
+    per_key_rate=float(os.environ.get('UPSTREAM_RATE_PER_KEY', '2')),
+    per_key_burst=float(os.environ.get('UPSTREAM_BURST_PER_KEY', '10')),
+    global_rate=float(os.environ.get('UPSTREAM_RATE_GLOBAL', '20')),
+    global_burst=float(os.environ.get('UPSTREAM_BURST_GLOBAL', '40'))
+)
+
+class BitpandaAPI:
+    # Benutzerspezifische Endpunkte, die für ein Portfolio abgerufen werden
+    PORTFOLIO_ENDPOINTS = {
+        "asset_wallets": "/wallets",
+        "fiat_wallets": "/fiatwallets"
+    }
+    TICKER_ENDPOINT = "/ticker"
+
+    def __init__(self, concurrent: bool = True, max_workers: int = 16,
+                 ticker_cache: Optional[TickerCache] = ticker_cache,
+                 rate_limiter: Optional[UpstreamRateLimiter] = upstream_rate_limiter,
+                 max_retry_wait: float = 2.0, pool_size: int = 32,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 base_url: Optional[str] = None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        # Getrennte Timeouts für Verbindungsaufbau und Lesen (requests-Tupel-Format)
+        self.timeout = (connect_timeout, read_timeout)
         self.session = requests.Session()
-        self.session.timeout = 30  # Timeout für Anfragen
+        # Pool groß genug für alle parallelen Abrufe, damit Keep-Alive-Verbindungen
+        # wiederverwendet statt verworfen werden (Retries übernimmt _make_request)
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        # Paralleler Abruf: alle Endpunkte gleichzeitig über einen begrenzten Thread-Pool
+        self.concurrent = concurrent
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="bitpanda-fetch"
+        ) if concurrent else None
+        self.ticker_cache = ticker_cache
+        self.rate_limiter = rate_limiter
+        # Längste Wartezeit, die im Request-Thread für einen Retry abgesessen wird
+        self.max_retry_wait = max_retry_wait
         
     def _make_request(self, endpoint: str, api_key: str, max_retries: int = 3) -> Optional[Dict]:
         """Sichere API-Anfrage mit Retry-Logik"""
@@ -21,12 +171,22 @@ class BitpandaAPI:
         }
         
         for attempt in range(max_retries):
+            # Wirft RateLimitExceeded, wenn das Budget erschöpft ist
+            if self.rate_limiter:
+                self.rate_limiter.acquire(api_key)
+            
+            start = time.perf_counter()
             try:
-                response = self.session.get(
-                    f"{self.base_url}{endpoint}", 
-                    headers=headers,
-                    timeout=30
-                )
+                try:
+                    response = self.session.get(
+                        f"{self.base_url}{endpoint}", 
+                        headers=headers,
+                        timeout=self.timeout
+                    )
+                except requests.exceptions.RequestException:
+                    UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint, 'error')
+                    raise
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint, response.status_code)
                 
                 if response.status_code == 200:
                     return response.json()
@@ -34,50 +194,144 @@ class BitpandaAPI:
                     logger.error("Ungültiger API-Schlüssel")
                     raise ValueError("Ungültiger API-Schlüssel")
                 elif response.status_code == 429:
-                    # Rate Limiting von Bitpanda
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    logger.warning(f"Rate Limit erreicht, warte {wait_time} Sekunden...")
+                    # Rate Limiting von Bitpanda - Retry-After bevorzugen, sonst Backoff mit Jitter
+                    wait_time = parse_retry_after(response.headers.get('Retry-After'))
+                    if wait_time is None:
+                        wait_time = jittered_backoff(attempt)
+                    if self.rate_limiter:
+                        self.rate_limiter.block(api_key, wait_time)
+                    
+                    # Lange Wartezeiten nicht im Request-Thread absitzen
+                    if wait_time > self.max_retry_wait or attempt == max_retries - 1:
+                        logger.warning(f"Rate Limit erreicht, erneut versuchen in {wait_time:.1f} Sekunden")
+                        raise RateLimitExceeded(wait_time)
+                    logger.warning(f"Rate Limit erreicht, warte {wait_time:.1f} Sekunden...")
+                    UPSTREAM_RETRIES.inc(endpoint, 'rate_limited')
                     time.sleep(wait_time)
                     continue
                 else:
                     logger.error(f"API-Fehler {response.status_code}: {response.text}")
                     if attempt == max_retries - 1:
                         raise Exception(f"API-Fehler: {response.status_code}")
+                    UPSTREAM_RETRIES.inc(endpoint, 'status')
                     
             except requests.exceptions.RequestException as e:
                 logger.error(f"Netzwerk-Fehler bei Versuch {attempt + 1}: {e}")
                 if attempt == max_retries - 1:
                     raise Exception("Netzwerk-Fehler bei API-Anfrage")
-                time.sleep(1)
+                UPSTREAM_RETRIES.inc(endpoint, 'network')
+                time.sleep(min(self.max_retry_wait, jittered_backoff(attempt, base=0.5)))
         
         return None
     
     def get_portfolio(self, api_key: str) -> Dict:
         """Ruft Portfolio-Informationen ab"""
         try:
-            endpoints = {
-                "asset_wallets": "/wallets",
-                "fiat_wallets": "/fiatwallets",
-                "ticker": "/ticker"
-            }
+            # Ticker parallel zu den Wallets aus dem gemeinsamen Cache laden
+            ticker_future = None
+            if self.concurrent:
+                ticker_future = self._executor.submit(self.get_ticker_prices, api_key)
             
-            portfolio_data = {}
+            try:
+                portfolio_data = self._fetch_endpoints(self.PORTFOLIO_ENDPOINTS, api_key)
+            except Exception:
+                if ticker_future:
+                    ticker_future.cancel()
+                raise
             
-            for key, endpoint in endpoints.items():
-                logger.info(f"Lade {key}...")
-                data = self._make_request(endpoint, api_key)
-                if data:
-                    portfolio_data[key] = data
+            if ticker_future:
+                ticker_prices = ticker_future.result()
+            else:
+                ticker_prices = self.get_ticker_prices(api_key)
             
             # Portfolio-Daten verarbeiten
-            processed_data = self._process_portfolio_data(portfolio_data)
+            processed_data = self._process_portfolio_data(portfolio_data, ticker_prices)
             return processed_data
             
         except Exception as e:
             logger.error(f"Fehler beim Abrufen des Portfolios: {e}")
             raise
     
-    def _process_portfolio_data(self, raw_data: Dict) -> Dict:
+    def get_ticker_prices(self, api_key: str) -> Dict[str, float]:
+        """Liefert EUR-Preise je Kryptowährung, bevorzugt aus dem Ticker-Cache"""
+        def load():
+            logger.info("Lade ticker...")
+            data = self._make_request(self.TICKER_ENDPOINT, api_key)
+            return self._parse_ticker(data) if data else None
+        
+        if self.ticker_cache is None:
+            return load() or {}
+        return self.ticker_cache.get(load) or {}
+    
+    @staticmethod
+    def _parse_ticker(ticker: Dict) -> Dict[str, float]:
+        """Extrahiert EUR-Preise aus der Ticker-Antwort"""
+        ticker_data = {}
+        for crypto, prices in ticker.items():
+            if 'EUR' in prices:
+                ticker_data[crypto] = float(prices['EUR'])
+        return ticker_data
+    
+    def _fetch_endpoints(self, endpoints: Dict[str, str], api_key: str) -> Dict:
+        """Lädt mehrere Endpunkte - parallel oder nacheinander"""
+        portfolio_data = {}
+        
+        if not self.concurrent:
+            for key, endpoint in endpoints.items():
+                logger.info(f"Lade {key}...")
+                data = self._make_request(endpoint, api_key)
+                if data:
+                    portfolio_data[key] = data
+            return portfolio_data
+        
+        # Alle Anfragen gleichzeitig starten; Retry/401/429 bleiben pro Endpunkt in _make_request
+        futures = {}
+        for key, endpoint in endpoints.items():
+            logger.info(f"Lade {key}...")
+            futures[key] = self._executor.submit(self._make_request, endpoint, api_key)
+        
+        try:
+            for key, future in futures.items():
+                data = future.result()
+                if data:
+                    portfolio_data[key] = data
+        finally:
+            # Bei einem Fehler noch nicht gestartete Anfragen verwerfen
+            for future in futures.values():
+                future.cancel()
+        
+        return portfolio_data
+    
+    def pool_stats(self) -> Dict:
+        """Statistik der HTTP-Verbindungspools (neu aufgebaut vs. wiederverwendet)"""
+        pools = self._adapter.poolmanager.pools
+        created = 0
+        requests_sent = 0
+        idle = 0
+        with pools.lock:
+            connection_pools = list(pools._container.values())
+        for pool in connection_pools:
+            created += pool.num_connections
+            requests_sent += pool.num_requests
+            # urllib3 füllt die Queue mit None-Platzhaltern vor; nur echte Verbindungen zählen
+            if pool.pool:
+                with pool.pool.mutex:
+                    idle += sum(1 for conn in pool.pool.queue if conn is not None)
+        return {
+            "pools": len(connection_pools),
+            "connections_created": created,
+            "connections_reused": max(0, requests_sent - created),
+            "requests": requests_sent,
+            "idle_connections": idle
+        }
+    
+    def close(self):
+        """Gibt Thread-Pool und HTTP-Verbindungen frei"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+    
+    def _process_portfolio_data(self, raw_data: Dict, ticker_prices: Optional[Dict[str, float]] = None) -> Dict:
         """Verarbeitet und strukturiert Portfolio-Daten"""
         result = {
             "crypto_wallets": [],
@@ -87,11 +341,9 @@ class BitpandaAPI:
         }
         
         # Ticker-Daten für Preise
-        ticker_data = {}
-        if 'ticker' in raw_data:
-            for crypto, prices in raw_data['ticker'].items():
-                if 'EUR' in prices:
-                    ticker_data[crypto] = float(prices['EUR'])
+        ticker_data = ticker_prices or {}
+        if ticker_prices is None and 'ticker' in raw_data:
+            ticker_data = self._parse_ticker(raw_data['ticker'])
         
         # Krypto-Wallets verarbeiten
         if 'asset_wallets' in raw_data and 'data' in raw_data['asset_wallets']:
@@ -0,0 +1,187 @@
+# Asynchroner Bitpanda API-Client (asyncio/httpx)
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+from bitpanda_api import DEFAULT_BASE_URL, BitpandaAPI, TickerCache, ticker_cache, upstream_rate_limiter
+from rate_limiter import RateLimitExceeded, UpstreamRateLimiter, jittered_backoff, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+class AsyncBitpandaAPI:
+    """Asynchrone Variante von BitpandaAPI mit identischem get_portfolio-Ergebnis.
+
+    Alle Anfragen laufen über einen gemeinsamen httpx-Verbindungspool, sodass
+    ein Event-Loop die Portfolios vieler API-Schlüssel parallel laden kann.
+    Ticker-Cache und Upstream-Budget werden mit dem synchronen Client geteilt.
+    """
+    PORTFOLIO_ENDPOINTS = BitpandaAPI.PORTFOLIO_ENDPOINTS
+    TICKER_ENDPOINT = BitpandaAPI.TICKER_ENDPOINT
+
+    # Dieselbe Verarbeitung wie im synchronen Client
+    _parse_ticker = staticmethod(BitpandaAPI._parse_ticker)
+    _process_portfolio_data = BitpandaAPI._process_portfolio_data
+
+    def __init__(self, ticker_cache: Optional[TickerCache] = ticker_cache,
+                 rate_limiter: Optional[UpstreamRateLimiter] = upstream_rate_limiter,
+                 max_retry_wait: float = 2.0, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, max_concurrency: int = 50,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 base_url: Optional[str] = None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.ticker_cache = ticker_cache
+        self.rate_limiter = rate_limiter
+        self.max_retry_wait = max_retry_wait
+        self.max_concurrency = max_concurrency
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._client = None
+        self._ticker_lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Client erst im laufenden Event-Loop anlegen
+        if self._client is None:
+            self._client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout)
+            self._ticker_lock = asyncio.Lock()
+        return self._client
+
+    async def aclose(self):
+        """Schließt den Verbindungspool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _acquire(self, api_key: str):
+        if not self.rate_limiter:
+            return
+        # Wirft RateLimitExceeded, wenn das Budget erschöpft ist
+        while True:
+            wait = self.rate_limiter.try_acquire(api_key)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def _make_request(self, endpoint: str, api_key: str, max_retries: int = 3) -> Optional[Dict]:
+        """Sichere API-Anfrage mit Retry-Logik"""
+        headers = {
+            "X-API-KEY": api_key,
+            "Content-Type": "application/json",
+            "User-Agent": "BitpandaPortfolio/1.0"
+        }
+        client = self._get_client()
+
+        for attempt in range(max_retries):
+            await self._acquire(api_key)
+
+            try:
+                response = await client.get(f"{self.base_url}{endpoint}", headers=headers)
+
+                if response.status_code == 200:
+                    return response.json()
+                elif response.status_code == 401:
+                    logger.error("Ungültiger API-Schlüssel")
+                    raise ValueError("Ungültiger API-Schlüssel")
+                elif response.status_code == 429:
+                    wait_time = parse_retry_after(response.headers.get('Retry-After'))
+                    if wait_time is None:
+                        wait_time = jittered_backoff(attempt)
+                    if self.rate_limiter:
+                        self.rate_limiter.block(api_key, wait_time)
+
+                    if wait_time > self.max_retry_wait or attempt == max_retries - 1:
+                        logger.warning(f"Rate Limit erreicht, erneut versuchen in {wait_time:.1f} Sekunden")
+                        raise RateLimitExceeded(wait_time)
+                    logger.warning(f"Rate Limit erreicht, warte {wait_time:.1f} Sekunden...")
+                    await asyncio.sleep(wait_time)
+                    continue
+                else:
+                    logger.error(f"API-Fehler {response.status_code}: {response.text}")
+                    if attempt == max_retries - 1:
+                        raise Exception(f"API-Fehler: {response.status_code}")
+
+            except httpx.HTTPError as e:
+                logger.error(f"Netzwerk-Fehler bei Versuch {attempt + 1}: {e}")
+                if attempt == max_retries - 1:
+                    raise Exception("Netzwerk-Fehler bei API-Anfrage")
+                await asyncio.sleep(min(self.max_retry_wait, jittered_backoff(attempt, base=0.5)))
+
+        return None
+
+    async def get_ticker_prices(self, api_key: str) -> Dict[str, float]:
+        """Liefert EUR-Preise je Kryptowährung, bevorzugt aus dem Ticker-Cache"""
+        if self.ticker_cache is None:
+            # Ohne Cache gibt es nichts zu teilen; ein Lock würde nur serialisieren
+            data = await self._make_request(self.TICKER_ENDPOINT, api_key)
+            return (self._parse_ticker(data) if data else None) or {}
+
+        prices = self.ticker_cache.peek()
+        if prices is not None:
+            return prices
+
+        self._get_client()
+        # Innerhalb des Event-Loops lädt nur eine Coroutine den Ticker
+        async with self._ticker_lock:
+            prices = self.ticker_cache.peek()
+            if prices is not None:
+                return prices
+
+            logger.info("Lade ticker...")
+            data = await self._make_request(self.TICKER_ENDPOINT, api_key)
+            prices = self._parse_ticker(data) if data else None
+            if prices is not None:
+                self.ticker_cache.store(prices)
+            return prices or {}
+
+    async def get_portfolio(self, api_key: str) -> Dict:
+        """Ruft Portfolio-Informationen ab"""
+        try:
+            keys = list(self.PORTFOLIO_ENDPOINTS)
+            # Auf alle Anfragen warten, auch wenn eine fehlschlägt: sonst liefen die übrigen
+            # weiter, nachdem der Aufrufer den Verbindungspool schon geschlossen hat
+            results = await asyncio.gather(
+                self.get_ticker_prices(api_key),
+                *(self._make_request(self.PORTFOLIO_ENDPOINTS[key], api_key) for key in keys),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            ticker_prices = results[0]
+            portfolio_data = {key: data for key, data in zip(keys, results[1:]) if data}
+
+            # Portfolio-Daten verarbeiten
+            return self._process_portfolio_data(portfolio_data, ticker_prices)
+
+        except Exception as e:
+            logger.error(f"Fehler beim Abrufen des Portfolios: {e}")
+            raise
+
+    async def get_portfolios(self, api_keys: Iterable[str]) -> Dict[str, object]:
+        """Lädt die Portfolios mehrerer API-Schlüssel parallel.
+
+        Ergebnis je Schlüssel ist das Portfolio oder die aufgetretene Exception.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def load(api_key):
+            async with semaphore:
+                return await self.get_portfolio(api_key)
+
+        api_keys = list(dict.fromkeys(api_keys))
+        started = time.monotonic()
+        results = await asyncio.gather(*(load(key) for key in api_keys), return_exceptions=True)
+        logger.info(f"{len(api_keys)} Portfolios in {time.monotonic() - started:.2f}s geladen")
+        return dict(zip(api_keys, results))
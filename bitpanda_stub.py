@@ -0,0 +1,390 @@
+# Lokaler Stub der Bitpanda-API für Last- und Offline-Tests
+#
+# Aufruf (im Projektverzeichnis):
+#   python bitpanda_stub.py --port 8900 --wallets 50 --latency default=lognormal:0.08:0.5
+#   python bitpanda_stub.py --error-rate /ticker=0.05 --burst-every 60 --burst-duration 5
+#   python bitpanda_stub.py --record captures --upstream https://api.bitpanda.com/v1
+#   python bitpanda_stub.py --replay captures
+#
+# App und Backend nutzen den Stub über BITPANDA_API_BASE_URL=http://127.0.0.1:8900
+#
+# Endpunkte: /wallets, /fiatwallets, /ticker sowie seitenweise (cursor, page_size)
+# /wallets/transactions, /fiatwallets/transactions und /trades. Die Daten
+# werden aus `seed` deterministisch erzeugt; /_stub/stats liefert Zähler.
+#
+# Latenz-Angaben (Sekunden): 0.1 | fixed:0.1 | uniform:0.05:0.2 |
+# normal:0.1:0.02 | lognormal:<Median>:<Sigma> | exp:<Mittelwert>, wahlweise
+# je Endpunkt als /wallets=uniform:0.05:0.2 (sonst default=...).
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+logger = logging.getLogger(__name__)
+
+CRYPTO_PRICES_EUR = {
+    'BTC': 30000.0, 'ETH': 1600.0, 'ADA': 0.95, 'SOL': 60.0, 'XRP': 0.5, 'DOT': 5.0,
+    'LTC': 70.0, 'LINK': 7.0, 'DOGE': 0.07, 'BEST': 0.4, 'MATIC': 0.6, 'AVAX': 12.0,
+}
+FIAT_RATES = {'EUR': 1.0, 'USD': 1.08, 'CHF': 0.96, 'GBP': 0.86}
+
+PAGED_ENDPOINTS = ('/wallets/transactions', '/fiatwallets/transactions', '/trades')
+MAX_PAGE_SIZE = 100
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Erzeugt aus einer Latenz-Angabe eine Funktion, die Wartezeiten zieht"""
+    kind, _, rest = spec.partition(':')
+    try:
+        if not rest:
+            value = float(kind)
+            return lambda: value
+        args = [float(part) for part in rest.split(':')]
+        if kind == 'fixed':
+            return lambda: args[0]
+        if kind == 'uniform':
+            return lambda: random.uniform(args[0], args[1])
+        if kind == 'normal':
+            return lambda: max(0.0, random.gauss(args[0], args[1]))
+        if kind == 'lognormal':
+            return lambda: random.lognormvariate(math.log(args[0]), args[1])
+        if kind == 'exp':
+            return lambda: random.expovariate(1 / args[0])
+    except (ValueError, IndexError, ZeroDivisionError):
+        pass
+    raise ValueError(f"Ungültige Latenz-Angabe: {spec}")
+
+def parse_per_endpoint(values: Iterable[str], parse: Callable[[str], object]) -> Dict[str, object]:
+    """['/ticker=0.1', '0.01'] -> {'/ticker': ..., 'default': ...}"""
+    result = {}
+    for value in values:
+        endpoint, separator, spec = value.rpartition('=')
+        result[endpoint if separator else 'default'] = parse(spec)
+    return result
+
+class Recorder:
+    """Speichert Antworten einer echten API als JSON-Dateien und spielt sie wieder ab.
+
+    Abgelegt werden nur Status und Body, nie der API-Schlüssel.
+    """
+    def __init__(self, directory: str, upstream: Optional[str] = None, timeout: float = 30.0):
+        self.directory = directory
+        self.upstream = upstream.rstrip('/') if upstream else None
+        self.timeout = timeout
+        self._cache: Dict[str, Tuple[int, object]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(path: str, query: Dict[str, str]) -> str:
+        key = path + ('?' + urlencode(sorted(query.items())) if query else '')
+        return re.sub(r'[^\w.-]+', '_', key).strip('_') + '.json'
+
+    def record(self, path: str, query: Dict[str, str], api_key: str) -> Tuple[int, object]:
+        """Leitet die Anfrage an die echte API weiter und speichert die Antwort"""
+        url = self.upstream + path + ('?' + urlencode(query) if query else '')
+        request = urllib.request.Request(url, headers={'X-API-KEY': api_key, 'Accept': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, raw = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, raw = e.code, e.read()
+        try:
+            body = json.loads(raw or b'null')
+        except ValueError:
+            body = {'errors': [{'detail': raw.decode('utf-8', 'replace')}]}
+        if status == 200:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, self._name(path, query)), 'w') as f:
+                json.dump({'status': status, 'body': body}, f)
+        return status, body
+
+    def replay(self, path: str, query: Dict[str, str]) -> Optional[Tuple[int, object]]:
+        """Aufgezeichnete Antwort oder None"""
+        name = self._name(path, query)
+        with self._lock:
+            if name not in self._cache:
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        capture = json.load(f)
+                except FileNotFoundError:
+                    return None
+                self._cache[name] = (capture['status'], capture['body'])
+            return self._cache[name]
+
+class BitpandaStub:
+    """Antwortlogik des Stubs, unabhängig vom HTTP-Server.
+
+    Reihenfolge je Anfrage: API-Schlüssel prüfen (401), Latenz abwarten,
+    429 während eines Bursts (alle `burst_every` Sekunden für
+    `burst_duration` Sekunden, mit Retry-After), zufällige Fehler (500/503)
+    gemäß `error_rates`, dann die Antwort - synthetisch, aufgezeichnet
+    (`recorder` mit upstream) oder wiedergegeben (`recorder` ohne upstream).
+    """
+    def __init__(self, wallets: int = 10, fiat_wallets: int = 4, transactions: int = 250,
+                 latencies: Optional[Dict[str, Callable[[], float]]] = None,
+                 error_rates: Optional[Dict[str, float]] = None,
+                 burst_every: float = 0.0, burst_duration: float = 0.0, retry_after: Optional[float] = None,
+                 recorder: Optional[Recorder] = None, seed: int = 42):
+        self.wallet_count = wallets
+        self.fiat_wallet_count = fiat_wallets
+        self.transaction_count = transactions
+        self.latencies = latencies or {}
+        self.error_rates = error_rates or {}
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.retry_after = retry_after
+        self.recorder = recorder
+        self.seed = seed
+        self._started = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._build_data()
+
+    def _build_data(self):
+        rng = random.Random(self.seed)
+        symbols = list(CRYPTO_PRICES_EUR)
+        self.ticker = {
+            symbol: {fiat: f"{price * rate * rng.uniform(0.9, 1.1):.8g}" for fiat, rate in FIAT_RATES.items()}
+            for symbol, price in CRYPTO_PRICES_EUR.items()
+        }
+        self.wallets = {'data': [
+            {
+                'type': 'wallet',
+                'id': f"wallet-{i:06d}",
+                'attributes': {
+                    'cryptocoin_id': str(i % len(symbols) + 1),
+                    'cryptocoin_symbol': symbols[i % len(symbols)],
+                    # Wie bei echten Konten: etliche Wallets ohne Guthaben
+                    'balance': '0.00000000' if i % 4 == 3 else f"{rng.uniform(1, 5000) / CRYPTO_PRICES_EUR[symbols[i % len(symbols)]]:.8f}",
+                    'is_default': i < len(symbols),
+                    'name': f"{symbols[i % len(symbols)]} Wallet",
+                    'pending_transactions_count': 0,
+                    'deleted': False,
+                },
+            }
+            for i in range(self.wallet_count)
+        ]}
+        fiats = list(FIAT_RATES)
+        self.fiat_wallets = {'data': [
+            {
+                'type': 'fiat_wallet',
+                'id': f"fiat-{i:06d}",
+                'attributes': {
+                    'fiat_id': str(i % len(fiats) + 1),
+                    'fiat_symbol': fiats[i % len(fiats)],
+                    'balance': f"{rng.uniform(0, 5000):.2f}",
+                    'name': f"{fiats[i % len(fiats)]} Wallet",
+                    'pending_transactions_count': 0,
+                },
+            }
+            for i in range(self.fiat_wallet_count)
+        ]}
+
+    def _transaction(self, path: str, index: int) -> Dict:
+        """Erzeugt Eintrag `index` eines Transaktions-Endpunkts (deterministisch, ohne Vorhalten)"""
+        rng = random.Random(f"{self.seed}:{path}:{index}")
+        timestamp = int(time.time()) - index * 3600
+        attributes = {
+            'time': {'unix': str(timestamp)},
+            'status': 'finished',
+            'type': rng.choice(('buy', 'sell', 'deposit', 'withdrawal')),
+        }
+        if path == '/fiatwallets/transactions':
+            attributes.update(fiat_symbol=rng.choice(list(FIAT_RATES)), amount=f"{rng.uniform(10, 2000):.2f}")
+            kind = 'fiat_wallet_transaction'
+        else:
+            symbol = rng.choice(list(CRYPTO_PRICES_EUR))
+            attributes.update(cryptocoin_symbol=symbol, amount=f"{rng.uniform(0.001, 5):.8f}",
+                              price=f"{CRYPTO_PRICES_EUR[symbol] * rng.uniform(0.8, 1.2):.8g}")
+            kind = 'trade' if path == '/trades' else 'wallet_transaction'
+        return {'type': kind, 'id': f"{kind}-{index:08d}", 'attributes': attributes}
+
+    def _page(self, path: str, query: Dict[str, str]) -> Tuple[int, object]:
+        try:
+            offset = int(query.get('cursor') or 0)
+            page_size = min(MAX_PAGE_SIZE, max(1, int(query.get('page_size') or 25)))
+        except ValueError:
+            return 400, {'errors': [{'status': 400, 'title': 'bad_request', 'detail': 'Ungültiger cursor/page_size'}]}
+        end = min(self.transaction_count, offset + page_size)
+        body = {
+            'data': [self._transaction(path, i) for i in range(offset, end)],
+            'meta': {'total_count': self.transaction_count, 'page_size': page_size},
+            'links': {'self': f"?{urlencode({'cursor': offset, 'page_size': page_size})}"},
+        }
+        if end < self.transaction_count:
+            body['meta']['next_cursor'] = str(end)
+            body['links']['next'] = f"?{urlencode({'cursor': end, 'page_size': page_size})}"
+        return 200, body
+
+    def _lookup(self, table: Dict, path: str):
+        return table.get(path, table.get('default'))
+
+    def _in_burst(self) -> Optional[float]:
+        """Restdauer des aktuellen 429-Bursts oder None"""
+        if self.burst_every <= 0 or self.burst_duration <= 0:
+            return None
+        position = (time.monotonic() - self._started) % self.burst_every
+        return self.burst_duration - position if position < self.burst_duration else None
+
+    def handle(self, path: str, query: Dict[str, str], api_key: Optional[str]) -> Tuple[int, Dict[str, str], object]:
+        """Bearbeitet eine GET-Anfrage; liefert (Status, Header, JSON-Body)"""
+        if path.startswith('/v1/'):
+            path = path[3:]
+        status, headers, body = self._respond(path, query, api_key)
+        with self._lock:
+            self._counts[(path, status)] = self._counts.get((path, status), 0) + 1
+        return status, headers, body
+
+    def _respond(self, path: str, query: Dict[str, str], api_key: Optional[str]):
+        if path == '/_stub/stats':
+            return 200, {}, self.stats()
+        if not api_key:
+            return 401, {}, {'errors': [{'status': 401, 'title': 'unauthorized', 'detail': 'X-API-KEY fehlt'}]}
+
+        latency = self._lookup(self.latencies, path)
+        if latency is not None:
+            time.sleep(max(0.0, latency()))
+
+        remaining = self._in_burst()
+        if remaining is not None:
+            retry_after = self.retry_after if self.retry_after is not None else remaining
+            return 429, {'Retry-After': str(max(1, math.ceil(retry_after)))}, {
+                'errors': [{'status': 429, 'title': 'too_many_requests', 'detail': 'Rate Limit (Stub-Burst)'}]
+            }
+
+        error_rate = self._lookup(self.error_rates, path) or 0.0
+        with self._lock:
+            failed = self._random.random() < error_rate
+            error_status = self._random.choice((500, 503)) if failed else None
+        if failed:
+            return error_status, {}, {'errors': [{'status': error_status, 'title': 'server_error', 'detail': 'Stub-Fehler'}]}
+
+        if self.recorder is not None:
+            if self.recorder.upstream:
+                status, body = self.recorder.record(path, query, api_key)
+                return status, {}, body
+            capture = self.recorder.replay(path, query)
+            if capture is None:
+                return 404, {}, {'errors': [{'status': 404, 'title': 'not_found', 'detail': 'Nicht aufgezeichnet'}]}
+            return capture[0], {}, capture[1]
+
+        if path == '/wallets':
+            return 200, {}, self.wallets
+        if path == '/fiatwallets':
+            return 200, {}, self.fiat_wallets
+        if path == '/ticker':
+            return 200, {}, self.ticker
+        if path in PAGED_ENDPOINTS:
+            status, body = self._page(path, query)
+            return status, {}, body
+        return 404, {}, {'errors': [{'status': 404, 'title': 'not_found', 'detail': f"Unbekannter Endpunkt {path}"}]}
+
+    def stats(self) -> Dict:
+        """Anzahl Antworten je Endpunkt und Status"""
+        with self._lock:
+            counts = dict(self._counts)
+        result: Dict[str, Dict[str, int]] = {}
+        for (path, status), count in sorted(counts.items()):
+            result.setdefault(path, {})[str(status)] = count
+        return {'responses': result, 'uptime': round(time.monotonic() - self._started, 1)}
+
+def start_stub_server(stub: Optional[BitpandaStub] = None, host: str = '127.0.0.1', port: int = 0,
+                      verbose: bool = False) -> ThreadingHTTPServer:
+    """Startet den Stub in einem Hintergrund-Thread; die Adresse steht in `server.base_url`"""
+    stub = stub or BitpandaStub()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Header und Body sind zwei Schreibvorgänge; mit Nagle warten Keep-Alive-
+        # Verbindungen sonst auf das verzögerte ACK (~40 ms je Anfrage)
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            status, headers, body = stub.handle(parts.path, query, self.headers.get('X-API-KEY'))
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            if verbose:
+                logger.info(format % args)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Standard-Backlog (5) verwirft Verbindungen, wenn viele Aufrufer gleichzeitig starten
+        request_queue_size = 128
+
+    server = Server((host, port), Handler)
+    server.stub = stub
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name='bitpanda-stub', daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Lokaler Bitpanda-API-Stub mit Latenz-, Fehler- und 429-Injektion')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('BITPANDA_STUB_PORT', '8900')))
+    parser.add_argument('--wallets', type=int, default=10, help='Anzahl Krypto-Wallets')
+    parser.add_argument('--fiat-wallets', type=int, default=4, help='Anzahl Fiat-Wallets')
+    parser.add_argument('--transactions', type=int, default=250, help='Einträge je Transaktions-Endpunkt')
+    parser.add_argument('--latency', action='append', default=[], metavar='[ENDPUNKT=]VERTEILUNG',
+                        help='Latenz je Endpunkt, mehrfach angebbar (z.B. /ticker=uniform:0.01:0.05)')
+    parser.add_argument('--error-rate', action='append', default=[], metavar='[ENDPUNKT=]ANTEIL',
+                        help='Anteil 500/503-Antworten je Endpunkt, mehrfach angebbar')
+    parser.add_argument('--burst-every', type=float, default=0.0, help='Abstand der 429-Bursts in Sekunden (0 = aus)')
+    parser.add_argument('--burst-duration', type=float, default=0.0, help='Dauer eines 429-Bursts in Sekunden')
+    parser.add_argument('--retry-after', type=float, help='Fester Retry-After-Wert (sonst Restdauer des Bursts)')
+    parser.add_argument('--record', metavar='VERZEICHNIS', help='Antworten von --upstream aufzeichnen')
+    parser.add_argument('--upstream', default='https://api.bitpanda.com/v1', help='Echte API für --record')
+    parser.add_argument('--replay', metavar='VERZEICHNIS', help='Aufgezeichnete Antworten wiedergeben')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='Jede Anfrage protokollieren')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.record and args.replay:
+        parser.error('--record und --replay schließen sich aus')
+    try:
+        latencies = parse_per_endpoint(args.latency, parse_latency)
+        error_rates = parse_per_endpoint(args.error_rate, float)
+    except ValueError as e:
+        parser.error(str(e))
+
+    recorder = None
+    if args.record:
+        recorder = Recorder(args.record, upstream=args.upstream)
+    elif args.replay:
+        recorder = Recorder(args.replay)
+
+    stub = BitpandaStub(wallets=args.wallets, fiat_wallets=args.fiat_wallets, transactions=args.transactions,
+                        latencies=latencies, error_rates=error_rates, burst_every=args.burst_every,
+                        burst_duration=args.burst_duration, retry_after=args.retry_after,
+                        recorder=recorder, seed=args.seed)
+    server = start_stub_server(stub, args.host, args.port, verbose=args.verbose)
+    logger.info(f"Bitpanda-Stub läuft auf {server.base_url} (BITPANDA_API_BASE_URL={server.base_url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,191 @@
 # Sichere Datenbank-Verwaltung
+import os
 import sqlite3
 import hashlib
 import secrets
 import logging
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
-from werkzeug.security import generate_password_hash, check_password_hash
 from contextlib import contextmanager
+from audit_log import AuditWriter, setup_security_logging
+from key_cache import DecryptedKeyCache
+from password_hasher import DEFAULT_ITERATIONS, PasswordHasher, PasswordHasherOverloaded
+from metrics import metrics, observe_duration
+from migrations import apply_migrations, get_schema_version
+from rate_limiter import RateLimitExceeded, create_rate_limiter
 
-# Logging-Konfiguration
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('security.log'),
-        logging.StreamHandler()
-    ]
+# Logging-Konfiguration (security.log und Konsole); Hintergrund-Thread erst per start()
+security_logging = setup_security_logging('security.log')
+
+DB_OPERATION_SECONDS = metrics.histogram(
+    'db_operation_duration_seconds', 'Dauer von Benutzer-Datenbankoperationen', ('operation',)
+)
+DB_CONNECTION_WAIT_SECONDS = metrics.histogram(
+    'db_connection_wait_seconds', 'Wartezeit auf eine Verbindung aus dem SQLite-Pool'
 )
 
+class SQLiteConnectionPool:
+    """Thread-sicherer Pool wiederverwendbarer SQLite-Verbindungen.
+    
+    PRAGMAs werden einmal pro Verbindung gesetzt, vorbereitete Statements
+    bleiben über `cached_statements` pro Verbindung im Cache. Eine Verbindung
+    wird immer nur von einem Thread gleichzeitig benutzt; länger ungenutzte
+    Verbindungen werden vor der Ausgabe geprüft. Nach einem fork() (z.B.
+    Gunicorn-Worker) wird der Pool verworfen und neu aufgebaut.
+    """
+    def __init__(self, db_path, max_size=8, timeout=30.0, health_check_interval=30.0,
+                 cached_statements=256):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.cached_statements = cached_statements
+        self._idle = deque()
+        self._in_use = 0
+        # Im aktuellen Prozess ausgegebene Verbindungen (nach fork() leer)
+        self._checked_out = set()
+        self._pid = os.getpid()
+        self._condition = threading.Condition(threading.Lock())
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging für bessere Performance
+        conn.execute("PRAGMA foreign_keys=ON")   # Foreign Key Constraints aktivieren
+        conn.row_factory = sqlite3.Row
+        self.created += 1
+        return conn
+    
+    def _check_fork(self):
+        # Verbindungen dürfen nicht über Prozessgrenzen geteilt werden
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._checked_out.clear()
+            self._in_use = 0
+            self._pid = os.getpid()
+    
+    def acquire(self):
+        """Liefert eine Verbindung aus dem Pool (oder eine neue)"""
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    conn, idle_since = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError("Verbindungspool erschöpft")
+                self._condition.wait(remaining)
+        
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - idle_since > self.health_check_interval:
+                try:
+                    conn.execute("SELECT 1").fetchone()
+                    self.reused += 1
+                except sqlite3.Error:
+                    self.discarded += 1
+                    conn.close()
+                    conn = self._connect()
+            else:
+                self.reused += 1
+            with self._condition:
+                self._checked_out.add(conn)
+            return conn
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+    
+    def release(self, conn, discard=False):
+        """Gibt eine Verbindung an den Pool zurück"""
+        with self._condition:
+            # Vor einem fork() ausgegebene Verbindungen gehören nicht zu diesem Pool
+            if self._pid != os.getpid() or conn not in self._checked_out:
+                return
+        if not discard and conn.in_transaction:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard = True
+        with self._condition:
+            self._checked_out.discard(conn)
+            self._in_use -= 1
+            if discard:
+                self.discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+        if discard:
+            conn.close()
+    
+    def close_all(self):
+        """Schließt alle freien Verbindungen"""
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            conn.close()
+    
+    def stats(self):
+        """Pool-Statistik"""
+        with self._condition:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded
+            }
+
 class SecureUserDatabase:
-    def __init__(self, db_path='users.db'):
+    def __init__(self, db_path='users.db', pool_size=None, login_limiter=None, password_hasher=None):
         self.db_path = db_path
+        # pool_size=0 öffnet wie früher für jede Operation eine eigene Verbindung
+        if pool_size is None:
+            pool_size = int(os.environ.get('DB_POOL_SIZE', '8'))
+        self.pool = SQLiteConnectionPool(db_path, max_size=pool_size) if pool_size > 0 else None
+        # Fehlversuche je IP (Standard: 10 in 15 Minuten), ohne Datenbankzugriff
+        self.login_limiter = login_limiter or create_rate_limiter(
+            'login',
+            int(os.environ.get('LOGIN_RATE_LIMIT', '10')),
+            float(os.environ.get('LOGIN_RATE_WINDOW', '900'))
+        )
+        # PBKDF2 in eigenen Prozessen (PASSWORD_HASH_WORKERS=0: im Request-Thread)
+        workers = int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.password_hasher = password_hasher or PasswordHasher(
+            workers=workers,
+            max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', str(max(1, workers) * 8))),
+            iterations=int(os.environ.get('PASSWORD_HASH_ITERATIONS', str(DEFAULT_ITERATIONS)))
+        )
+        # Audit-Trail (login_attempts) wird gesammelt im Hintergrund geschrieben
+        self.audit_writer = AuditWriter(
+            self.get_db_connection,
+            flush_interval=float(os.environ.get('AUDIT_FLUSH_INTERVAL', '1.0')),
+            batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', '500')),
+            max_queue=int(os.environ.get('AUDIT_QUEUE_SIZE', '10000'))
+        )
         self.encryption_key = self._get_or_create_encryption_key()
         self.cipher_suite = Fernet(self.encryption_key)
+        # Entschlüsselte API-Schlüssel je Benutzer (API_KEY_CACHE_TTL=0 deaktiviert)
+        self.key_cache = DecryptedKeyCache(
+            ttl=float(os.environ.get('API_KEY_CACHE_TTL', '300')),
+            max_entries=int(os.environ.get('API_KEY_CACHE_MAX_ENTRIES', '1000'))
+        )
         self._init_database()
         
     def _get_or_create_encryption_key(self):
@@ -40,6 +203,11 @@ class SecureUserDatabase:
     @contextmanager
     def get_db_connection(self):
         """Sichere Datenbankverbindung mit automatischem Schließen"""
+        if self.pool is not None:
+            with self._pooled_connection() as conn:
+                yield conn
+            return
+        
         conn = None
         try:
             conn = sqlite3.connect(self.db_path, timeout=30.0)
@@ -56,58 +224,56 @@ class SecureUserDatabase:
             if conn:
                 conn.close()
     
+    @contextmanager
+    def _pooled_connection(self):
+        """Verbindung aus dem Pool; nach SQLite-Fehlern wird sie verworfen"""
+        conn = None
+        discard = False
+        try:
+            start = time.perf_counter()
+            conn = self.pool.acquire()
+            DB_CONNECTION_WAIT_SECONDS.observe(time.perf_counter() - start)
+            yield conn
+        except Exception as e:
+            discard = isinstance(e, sqlite3.Error) and not isinstance(e, sqlite3.IntegrityError)
+            if conn:
+                # Ein Fehler beim Rollback darf den ursprünglichen nicht ersetzen
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    discard = True
+            logging.error(f"Datenbankfehler: {e}")
+            raise
+        finally:
+            if conn:
+                self.pool.release(conn, discard)
+    
     def _init_database(self):
-        """Initialisiert Datenbanktabellen"""
+        """Initialisiert Datenbanktabellen über versionierte Migrationen"""
         with self.get_db_connection() as conn:
-            # Benutzer-Tabelle
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    api_key_encrypted BLOB NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
-                    failed_login_attempts INTEGER DEFAULT 0,
-                    locked_until TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1
-                )
-            ''')
-            
-            # Session-Tabelle
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS sessions (
-                    id TEXT PRIMARY KEY,
-                    user_id INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP NOT NULL,
-                    ip_address TEXT,
-                    user_agent TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-                )
-            ''')
-            
-            # Login-Versuche-Tabelle für Rate Limiting
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS login_attempts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ip_address TEXT NOT NULL,
-                    username TEXT,
-                    success BOOLEAN NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )            ''')
-            
-            conn.commit()
-            logging.info("Datenbank initialisiert")
+            apply_migrations(conn)
+            logging.info(f"Datenbank initialisiert (Schema-Version {get_schema_version(conn)})")
     
     def _encrypt_api_key(self, api_key):
         """Verschlüsselt API-Schlüssel"""
         return self.cipher_suite.encrypt(api_key.encode())
     
-    def _decrypt_api_key(self, encrypted_api_key):
-        """Entschlüsselt API-Schlüssel"""
-        return self.cipher_suite.decrypt(encrypted_api_key).decode()
+    def _decrypt_api_key(self, encrypted_api_key, user_id=None):
+        """Entschlüsselt API-Schlüssel (mit user_id über den Schlüssel-Cache)"""
+        if user_id is not None:
+            api_key = self.key_cache.get(user_id, encrypted_api_key)
+            if api_key is not None:
+                return api_key
+        api_key = self.cipher_suite.decrypt(encrypted_api_key).decode()
+        if user_id is not None:
+            self.key_cache.put(user_id, encrypted_api_key, api_key)
+        return api_key
     
+    def forget_api_key(self, user_id):
+        """Entfernt den entschlüsselten API-Schlüssel eines Benutzers aus dem Speicher"""
+        self.key_cache.invalidate(user_id)
+    
+    @observe_duration(DB_OPERATION_SECONDS, 'create_user')
     def create_user(self, username, password, api_key):
         """Erstellt neuen Benutzer mit verschlüsseltem API-Schlüssel"""
         if len(username) < 3:
@@ -118,7 +284,7 @@ class SecureUserDatabase:
         if not api_key or (api_key != 'DEMO_MODE' and len(api_key) < 10):
             raise ValueError("Gültiger API-Schlüssel erforderlich oder leer für Demo-Modus")
         
-        password_hash = generate_password_hash(password, method='pbkdf2:sha256', salt_length=16)
+        password_hash = self.password_hasher.hash(password)
         encrypted_api_key = self._encrypt_api_key(api_key)
         
         try:
@@ -134,36 +300,66 @@ class SecureUserDatabase:
             logging.warning(f"Benutzer '{username}' existiert bereits")
             raise ValueError("Benutzername bereits vergeben")
     
+    @observe_duration(DB_OPERATION_SECONDS, 'authenticate_user')
     def authenticate_user(self, username, password, ip_address, user_agent):
-        """Authentifiziert Benutzer mit Sicherheitsprüfungen"""
-        # Rate Limiting prüfen
-        if self._is_rate_limited(ip_address):
+        """Authentifiziert Benutzer mit Sicherheitsprüfungen (eine Transaktion, ein Commit)"""
+        # Rate Limit vor jedem Datenbankzugriff: jeder Versuch verbraucht eine
+        # Einheit, erfolgreiche Anmeldungen geben sie zurück (= nur Fehlversuche zählen)
+        retry_after = self.login_limiter.hit(ip_address)
+        if retry_after:
             logging.warning(f"Rate Limit erreicht für IP: {ip_address}")
-            raise ValueError("Zu viele Anmeldeversuche. Bitte warten Sie.")
-        
-        # Login-Versuch protokollieren
-        self._log_login_attempt(ip_address, username, False)
+            raise RateLimitExceeded(retry_after, "Zu viele Anmeldeversuche. Bitte warten Sie.")
         
+        # Lesephase: Benutzer laden; die Verbindung geht vor dem Hashing an den Pool zurück
         with self.get_db_connection() as conn:
             user = conn.execute('''
                 SELECT id, username, password_hash, api_key_encrypted, failed_login_attempts, locked_until
                 FROM users 
                 WHERE username = ? AND is_active = 1
             ''', (username,)).fetchone()
+        
+        if not user:
+            self._log_login_attempts([(ip_address, username, False)])
+            logging.warning(f"Login-Versuch für unbekannten Benutzer: {username}")
+            raise ValueError("Ungültige Anmeldedaten")
+        
+        # Passwortprüfung (PBKDF2, bis zum Hasher-Timeout) ohne belegte Pool-Verbindung,
+        # damit ein Login-Ansturm den Pool nicht leert, bevor der Hasher Last abweist
+        password_ok = False
+        if not self._is_locked(user['locked_until']):
+            try:
+                password_ok = self.password_hasher.verify(user['password_hash'], password)
+            except PasswordHasherOverloaded:
+                # Versuch wurde nicht geprüft und zählt nicht gegen das Rate Limit
+                self.login_limiter.refund(ip_address)
+                raise
+        
+        with self.get_db_connection() as conn:
+            # Schreibphase: alle Änderungen mit einem Commit
+            conn.execute('BEGIN IMMEDIATE')
             
-            if not user:
-                logging.warning(f"Login-Versuch für unbekannten Benutzer: {username}")
+            # Sperrstatus innerhalb der Transaktion neu lesen (parallele Fehlversuche)
+            state = conn.execute('''
+                SELECT failed_login_attempts, locked_until FROM users WHERE id = ? AND is_active = 1
+            ''', (user['id'],)).fetchone()
+            
+            # Zwischen Lese- und Schreibphase gelöscht oder deaktiviert
+            if state is None:
+                conn.rollback()
+                self._log_login_attempts([(ip_address, username, False)])
                 raise ValueError("Ungültige Anmeldedaten")
             
             # Account-Sperre prüfen
-            if user['locked_until'] and datetime.fromisoformat(user['locked_until']) > datetime.now():
+            if self._is_locked(state['locked_until']):
+                conn.rollback()
+                self._log_login_attempts([(ip_address, username, False)])
                 logging.warning(f"Versuch, gesperrtes Konto anzumelden: {username}")
                 raise ValueError("Konto ist gesperrt. Bitte kontaktieren Sie den Administrator.")
             
             # Passwort prüfen
-            if not check_password_hash(user['password_hash'], password):
+            if not password_ok:
                 # Fehlgeschlagene Versuche erhöhen
-                failed_attempts = user['failed_login_attempts'] + 1
+                failed_attempts = state['failed_login_attempts'] + 1
                 locked_until = None
                 
                 if failed_attempts >= 5:
@@ -176,6 +372,7 @@ class SecureUserDatabase:
                     WHERE id = ?
                 ''', (failed_attempts, locked_until, user['id']))
                 conn.commit()
+                self._log_login_attempts([(ip_address, username, False)])
                 
                 raise ValueError("Ungültige Anmeldedaten")
             
@@ -197,18 +394,25 @@ class SecureUserDatabase:
             ''', (user['id'],))
             
             conn.commit()
-            
-            # Erfolgreichen Login protokollieren
-            self._log_login_attempt(ip_address, username, True)
+            self.login_limiter.refund(ip_address)
+            # Wie bisher: Versuch und erfolgreichen Login protokollieren
+            self._log_login_attempts([(ip_address, username, False), (ip_address, username, True)])
             logging.info(f"Erfolgreiche Anmeldung: {username}")
             
             return {
                 'session_id': session_id,
+                'expires_at': expires_at,
                 'user_id': user['id'],
                 'username': user['username'],
-                'api_key': self._decrypt_api_key(user['api_key_encrypted'])
+                'api_key': self._decrypt_api_key(user['api_key_encrypted'], user['id'])
             }
     
+    @staticmethod
+    def _is_locked(locked_until):
+        """Prüft, ob eine Kontosperre noch aktiv ist"""
+        return bool(locked_until) and datetime.fromisoformat(locked_until) > datetime.now()
+    
+    @observe_duration(DB_OPERATION_SECONDS, 'get_user_by_session')
     def get_user_by_session(self, session_id):
         """Lädt Benutzer basierend auf Session-ID"""
         with self.get_db_connection() as conn:
@@ -230,9 +434,10 @@ class SecureUserDatabase:
             return {
                 'user_id': result['id'],
                 'username': result['username'],
-                'api_key': self._decrypt_api_key(result['api_key_encrypted'])
+                'api_key': self._decrypt_api_key(result['api_key_encrypted'], result['id'])
             }
     
+    @observe_duration(DB_OPERATION_SECONDS, 'logout_user')
     def logout_user(self, session_id):
         """Meldet Benutzer ab (löscht Session)"""
         with self.get_db_connection() as conn:
@@ -240,16 +445,33 @@ class SecureUserDatabase:
             conn.commit()
             logging.info(f"Session beendet: {session_id[:8]}...")
     
+    @observe_duration(DB_OPERATION_SECONDS, 'delete_user')
     def delete_user(self, username):
         """Löscht Benutzer (nur für Admin-Funktionen)"""
         with self.get_db_connection() as conn:
+            user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
             result = conn.execute('DELETE FROM users WHERE username = ?', (username,))
             conn.commit()
+            if user:
+                self.forget_api_key(user['id'])
             if result.rowcount > 0:
                 logging.info(f"Benutzer gelöscht: {username}")
                 return True
             return False
     
+    def is_user_active(self, user_id):
+        """Prüft, ob ein aktiver Benutzer mit dieser ID existiert"""
+        with self.get_db_connection() as conn:
+            return conn.execute(
+                'SELECT 1 FROM users WHERE id = ? AND is_active = 1', (user_id,)
+            ).fetchone() is not None
+    
+    def get_user_id(self, username):
+        """Liefert die ID eines Benutzers oder None"""
+        with self.get_db_connection() as conn:
+            result = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+            return result['id'] if result else None
+    
     def list_users(self):
         """Listet alle aktiven Benutzer auf"""
         with self.get_db_connection() as conn:
@@ -261,33 +483,45 @@ class SecureUserDatabase:
             ''').fetchall()
             return [dict(user) for user in users]
     
-    def _is_rate_limited(self, ip_address, max_attempts=10, time_window=15):
-        """Prüft Rate Limiting für IP-Adresse"""
-        with self.get_db_connection() as conn:
-            cutoff_time = (datetime.now() - timedelta(minutes=time_window)).isoformat()
-            attempts = conn.execute('''
-                SELECT COUNT(*) as count
-                FROM login_attempts
-                WHERE ip_address = ? AND timestamp > ? AND success = 0
-            ''', (ip_address, cutoff_time)).fetchone()
-            
-            return attempts['count'] >= max_attempts
-    
-    def _log_login_attempt(self, ip_address, username, success):
-        """Protokolliert Login-Versuche"""
-        with self.get_db_connection() as conn:
-            conn.execute('''
-                INSERT INTO login_attempts (ip_address, username, success)
-                VALUES (?, ?, ?)
-            ''', (ip_address, username, success))
-            conn.commit()
+    def _log_login_attempts(self, attempts):
+        """Protokolliert Login-Versuche asynchron (nicht Teil der Login-Latenz)"""
+        for attempt in attempts:
+            self.audit_writer.submit(
+                'INSERT INTO login_attempts (ip_address, username, success) VALUES (?, ?, ?)',
+                attempt
+            )
     
-    def cleanup_old_sessions(self):
+    @observe_duration(DB_OPERATION_SECONDS, 'cleanup_old_sessions')
+    def cleanup_old_sessions(self, chunk_size=1000):
         """Entfernt abgelaufene Sessions"""
-        with self.get_db_connection() as conn:
-            conn.execute('DELETE FROM sessions WHERE expires_at < ?', (datetime.now().isoformat(),))
-            conn.commit()
+        return self._delete_in_chunks('sessions', 'expires_at < ?', (datetime.now().isoformat(),), chunk_size)
+    
+    @observe_duration(DB_OPERATION_SECONDS, 'cleanup_login_attempts')
+    def cleanup_login_attempts(self, max_age_hours=24, chunk_size=1000):
+        """Entfernt alte Login-Versuche"""
+        cutoff_time = (datetime.now() - timedelta(hours=max_age_hours)).isoformat()
+        return self._delete_in_chunks('login_attempts', 'timestamp < ?', (cutoff_time,), chunk_size)
+    
+    def _delete_in_chunks(self, table, where, params, chunk_size=1000, pause=0.005):
+        """Löscht in kleinen Transaktionen, damit Logins zwischendurch schreiben können.
+        
+        table und where stammen nur aus dem Code, nie aus Benutzereingaben.
+        """
+        deleted = 0
+        while True:
+            with self.get_db_connection() as conn:
+                count = conn.execute(f'''
+                    DELETE FROM {table} WHERE rowid IN (
+                        SELECT rowid FROM {table} WHERE {where} LIMIT ?
+                    )
+                ''', (*params, chunk_size)).rowcount
+                conn.commit()
+            deleted += count
+            if count < chunk_size:
+                return deleted
+            time.sleep(pause)
     
+    @observe_duration(DB_OPERATION_SECONDS, 'get_user_by_id')
     def get_user_by_id(self, user_id):
         """Lädt Benutzer basierend auf User-ID"""
         with self.get_db_connection() as conn:
@@ -303,5 +537,5 @@ class SecureUserDatabase:
             return {
                 'user_id': result['id'],
                 'username': result['username'],
-                'api_key': self._decrypt_api_key(result['api_key_encrypted'])
+                'api_key': self._decrypt_api_key(result['api_key_encrypted'], result['id'])
             }
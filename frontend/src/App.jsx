@@ -1,10 +1,12 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import './styles.css';
 import axios from 'axios';
 import PieChart from './PieChart';
 
 function App() {
   const [portfolio, setPortfolio] = useState(null);
+  // Aktueller Stand für das Intervall-Callback (Basis für Delta-Anfragen)
+  const portfolioRef = useRef(null);
   const [userInfo, setUserInfo] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -23,6 +25,10 @@ function App() {
     document.documentElement.setAttribute('data-theme', newTheme);
   };
 
+  useEffect(() => {
+    portfolioRef.current = portfolio;
+  }, [portfolio]);
+
   // Theme anwenden beim Laden der Komponente
   useEffect(() => {
     document.documentElement.setAttribute('data-theme', theme);
@@ -43,11 +49,35 @@ function App() {
     }
   };
 
+  // Delta-Antwort (?since=<version>) auf den bisherigen Stand anwenden
+  const applyPortfolioPatch = (current, { patch, version, cache_age, cache_status }) => {
+    const next = { ...current, ...patch.set, version, cache_age, cache_status };
+    patch.unset.forEach((key) => delete next[key]);
+    Object.entries(patch.lists).forEach(([key, { upsert, remove }]) => {
+      const updates = new Map(upsert.map((item) => [item.symbol, item]));
+      const merged = (current[key] || [])
+        .filter((item) => !remove.includes(item.symbol))
+        .map((item) => updates.get(item.symbol) || item);
+      const known = new Set(merged.map((item) => item.symbol));
+      next[key] = merged.concat(upsert.filter((item) => !known.has(item.symbol)));
+    });
+    return next;
+  };
+
   // Automatisches Laden (setzt loading nicht, UI bleibt erhalten)
   const autoFetchPortfolioData = async () => {
     try {
-      const response = await axios.get('/api/portfolio');
-      setPortfolio(response.data);
+      const version = portfolioRef.current?.version;
+      const response = await axios.get('/api/portfolio', {
+        params: version ? { since: version } : {},
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304
+      });
+      if (response.status !== 304) {
+        const data = response.data.delta
+          ? applyPortfolioPatch(portfolioRef.current, response.data)
+          : response.data;
+        setPortfolio(data);
+      }
       setLastUpdate(new Date());
       setError(null);
     } catch (err) {
@@ -70,12 +100,41 @@ function App() {
     fetchUserInfo();
     fetchPortfolioData();
 
-    // Intervall für automatisches Laden (alle 60 Sekunden)
-    const interval = setInterval(() => {
-      autoFetchPortfolioData();
-    }, 60000);
+    // Fallback: Intervall für automatisches Laden (alle 60 Sekunden)
+    let interval = null;
+    const startPolling = () => {
+      if (interval === null) {
+        interval = setInterval(() => {
+          autoFetchPortfolioData();
+        }, 60000);
+      }
+    };
+
+    // Live-Updates per Server-Sent Events; der Browser verbindet sich
+    // automatisch neu und sendet dabei Last-Event-ID mit
+    let source = null;
+    if (typeof EventSource !== 'undefined') {
+      source = new EventSource('/api/portfolio/stream');
+      source.addEventListener('portfolio', (event) => {
+        setPortfolio(JSON.parse(event.data));
+        setLastUpdate(new Date());
+        setError(null);
+      });
+      source.onerror = (err) => {
+        console.error('Portfolio-Stream unterbrochen:', err);
+        // Server lehnt weitere Streams ab (503): kein Reconnect, auf Polling wechseln
+        if (source.readyState === EventSource.CLOSED) {
+          startPolling();
+        }
+      };
+    } else {
+      startPolling();
+    }
 
-    return () => clearInterval(interval);
+    return () => {
+      if (source) source.close();
+      if (interval !== null) clearInterval(interval);
+    };
   }, []);
 
   // Loading State mit modernem Spinner
@@ -546,6 +605,9 @@ function App() {
         {lastUpdate && (
           <p style={{color: 'var(--text-secondary)', marginBottom: '1rem', fontSize: '0.875rem'}}>
             🕒 Letzte Aktualisierung: {lastUpdate.toLocaleTimeString('de-DE')}
+            {portfolio?.cache_age > 0 && (
+              <span> (Daten {Math.round(portfolio.cache_age)} s alt{portfolio.cache_status === 'stale' ? ', werden aktualisiert' : ''})</span>
+            )}
           </p>        )}
         <button onClick={fetchPortfolioData} className="refresh-button">
           🔄 Portfolio aktualisieren
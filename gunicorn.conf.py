@@ -0,0 +1,68 @@
+# Gunicorn-Konfiguration für den Produktionsbetrieb
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Graceful Reload der Worker: kill -HUP <master-pid>
+# (mit preload_app werden Codeänderungen erst nach kill -USR2 bzw. Neustart aktiv)
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('GUNICORN_WORKERS', str(min(4, multiprocessing.cpu_count() * 2 + 1))))
+# Threads je Worker: Upstream-Abrufe und SSE-Streams blockieren auf I/O.
+# Ein SSE-Stream belegt einen Thread bis SSE_MAX_DURATION; app.py lässt je Worker
+# höchstens SSE_MAX_STREAMS (Standard: threads // 2) zu, weitere erhalten 503 + Polling
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+
+# App einmal im Master laden: Workern teilen sich Code und SECRET_KEY
+# (ohne gesetztes SECRET_KEY erzeugt sonst jeder Worker einen eigenen Schlüssel)
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+# Worker regelmäßig erneuern (begrenzt Speicherwachstum), mit Jitter
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+def on_starting(server):
+    """Master: Metrik-Snapshots beendeter Worker eines früheren Laufs entfernen"""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        from metrics import clear_snapshots
+        clear_snapshots(metrics_dir)
+
+def worker_exit(server, worker):
+    """Worker: letzte Metrik-Werte in den Sammel-Snapshot übernehmen"""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        from metrics import metrics
+        metrics.retire(metrics_dir)
+
+def child_exit(server, worker):
+    """Master: Snapshots hart beendeter Worker (z.B. Timeout) übernehmen"""
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        from metrics import retire_snapshots
+        retire_snapshots(metrics_dir, worker.pid)
+
+def post_fork(server, worker):
+    """Worker: eigene Hintergrunddienste starten"""
+    from wsgi import start_worker_services
+    start_worker_services()
+
+def post_worker_init(worker):
+    """Worker: Wartungs-Scheduler starten; per flock-Leader-Wahl arbeitet nur ein Worker.
+
+    Bewusst nicht im Master: ein Thread mit SQLite- und Logging-Arbeit würde
+    beim fork() gehaltene Locks (Pool-Condition, QueueHandler) in neue Worker
+    kopieren und diese blockieren. Stirbt der Leader (z.B. max_requests),
+    übernimmt ein anderer Worker nach spätestens MAINTENANCE_LEADER_RETRY Sekunden.
+    """
+    from wsgi import start_maintenance
+    start_maintenance()
@@ -0,0 +1,112 @@
+# Cache entschlüsselter API-Schlüssel mit Speicherhygiene
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+def _wipe(buffer: bytearray):
+    """Überschreibt den Inhalt eines Puffers an Ort und Stelle mit Nullbytes"""
+    buffer[:] = bytes(len(buffer))
+
+class _KeyEntry:
+    __slots__ = ('fingerprint', 'plaintext', 'expires_at')
+
+    def __init__(self, fingerprint: bytes, plaintext: bytearray, expires_at: float):
+        self.fingerprint = fingerprint
+        self.plaintext = plaintext
+        self.expires_at = expires_at
+
+class DecryptedKeyCache:
+    """Begrenzter TTL/LRU-Cache für entschlüsselte API-Schlüssel je Benutzer.
+
+    Erspart die Fernet-Entschlüsselung (HMAC-Prüfung + AES) pro Anfrage.
+    Klartexte liegen in bytearrays und werden beim Verdrängen, Ablaufen,
+    Logout und Löschen des Benutzers mit Nullbytes überschrieben. Jeder
+    Eintrag ist an einen Fingerabdruck des Chiffrats gebunden, ein geänderter
+    Schlüssel in der Datenbank führt daher nie zu einem veralteten Treffer.
+
+    Hinweis: Aufrufer erhalten (wie bisher) einen str; dessen Kopien kann
+    Python nicht gezielt löschen, die Hygiene betrifft den Cache selbst.
+    ttl <= 0 deaktiviert den Cache.
+    """
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.wipes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def _fingerprint(ciphertext: bytes) -> bytes:
+        return hashlib.blake2b(ciphertext, digest_size=16).digest()
+
+    def get(self, user_id, ciphertext: bytes) -> Optional[str]:
+        """Liefert den Klartext, wenn er zum Chiffrat passt und nicht abgelaufen ist"""
+        if not self.enabled:
+            return None
+        key = str(user_id)
+        fingerprint = self._fingerprint(ciphertext)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.plaintext.decode()
+
+    def put(self, user_id, ciphertext: bytes, plaintext: str):
+        """Speichert einen entschlüsselten Schlüssel"""
+        if not self.enabled:
+            return
+        key = str(user_id)
+        entry = _KeyEntry(self._fingerprint(ciphertext), bytearray(plaintext.encode()),
+                          time.monotonic() + self.ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Löscht den Schlüssel eines Benutzers (Logout, Löschung)"""
+        with self._lock:
+            self._remove(str(user_id))
+
+    def clear(self):
+        """Löscht alle Einträge"""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            _wipe(entry.plaintext)
+            self.wipes += 1
+
+    def stats(self) -> Dict:
+        """Treffer- und Fehlzugriffszähler"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'wipes': self.wipes
+            }
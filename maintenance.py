@@ -0,0 +1,157 @@
+# Wartungs-Scheduler mit Leader-Wahl (ein Thread, eine aktive Instanz je Host)
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: kein flock, jeder Prozess gilt als Leader
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class LeaderLock:
+    """Nicht blockierendes flock auf eine Datei; wer es hält, ist Leader.
+
+    Das Lock bleibt bis Prozessende gehalten und wird vom Betriebssystem
+    freigegeben, wenn der Prozess stirbt - ein anderer übernimmt dann beim
+    nächsten Versuch.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+class _Task:
+    __slots__ = ('name', 'func', 'interval', 'runs', 'failures', 'last_duration', 'last_run')
+
+    def __init__(self, name: str, func: Callable[[], object], interval: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_duration = None
+        self.last_run = None
+
+class MaintenanceScheduler:
+    """Führt periodische Wartungsaufgaben in einem einzigen Hintergrund-Thread aus.
+
+    Intervalle werden um ±`jitter` (Anteil) gestreut, damit mehrere Hosts
+    nicht gleichzeitig löschen. Nur der Prozess, der das Leader-Lock hält,
+    führt Aufgaben aus; alle anderen versuchen es alle `leader_retry`
+    Sekunden erneut.
+    """
+    def __init__(self, lock_path: str, jitter: float = 0.1, leader_retry: float = 60.0,
+                 initial_delay: float = 5.0):
+        self.lock = LeaderLock(lock_path)
+        self.jitter = jitter
+        self.leader_retry = leader_retry
+        self.initial_delay = initial_delay
+        self._tasks: Dict[str, _Task] = {}
+        self._queue = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_task(self, name: str, func: Callable[[], object], interval: float):
+        """Registriert eine Aufgabe (vor start() aufrufen)"""
+        self._tasks[name] = _Task(name, func, interval)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running or not self._tasks:
+            return
+        self._stop.clear()
+        now = time.monotonic()
+        self._queue = [(now + self._jittered(self.initial_delay), name) for name in self._tasks]
+        heapq.heapify(self._queue)
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.lock.release()
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.lock.held:
+                if not self.lock.try_acquire():
+                    self._stop.wait(self._jittered(self.leader_retry))
+                    continue
+                logger.info(f"Wartung: Prozess {os.getpid()} ist Leader")
+
+            due_at, name = self._queue[0]
+            wait = due_at - time.monotonic()
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            heapq.heappop(self._queue)
+            task = self._tasks[name]
+            self._execute(task)
+            heapq.heappush(self._queue, (time.monotonic() + self._jittered(task.interval), name))
+
+    def _execute(self, task: _Task):
+        start = time.perf_counter()
+        try:
+            result = task.func()
+            task.runs += 1
+            logger.info(f"Wartung '{task.name}' abgeschlossen ({result if result is not None else 'ok'})")
+        except Exception as e:
+            task.failures += 1
+            logger.error(f"Fehler bei Wartung '{task.name}': {e}")
+        task.last_duration = time.perf_counter() - start
+        task.last_run = time.time()
+
+    def stats(self) -> Dict:
+        return {
+            'leader': self.lock.held,
+            'running': self.running,
+            'tasks': {
+                task.name: {
+                    'interval': task.interval,
+                    'runs': task.runs,
+                    'failures': task.failures,
+                    'last_duration': task.last_duration,
+                    'last_run': task.last_run
+                }
+                for task in self._tasks.values()
+            }
+        }
@@ -0,0 +1,411 @@
+# Prozessinterne Metriken im Prometheus-Textformat (/metrics)
+import atexit
+import bisect
+import fcntl
+import functools
+import glob
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sekunden; deckt Cache-Treffer (<1 ms) bis langsame Upstream-Abrufe ab
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Summierte Zähler beendeter Worker im Snapshot-Verzeichnis
+RETIRED_SNAPSHOT = 'metrics-retired.json'
+
+class _Shard:
+    """Werte eines Threads; nur dieser Thread schreibt, daher ohne Lock"""
+    __slots__ = ('thread', 'counters', 'histograms')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.counters: Dict[Tuple, float] = {}
+        self.histograms: Dict[Tuple, List] = {}
+
+class _Metric:
+    def __init__(self, registry: 'MetricsRegistry', name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+
+    def _key(self, labels: Tuple) -> Tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: erwartet Labels {self.labelnames}")
+        return (self.name, tuple(str(label) for label in labels))
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount: float = 1.0):
+        counters = self.registry._shard().counters
+        key = self._key(labels)
+        counters[key] = counters.get(key, 0.0) + amount
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, help_text, labelnames, buckets: Iterable[float]):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        histograms = self.registry._shard().histograms
+        key = self._key(labels)
+        state = histograms.get(key)
+        if state is None:
+            # [Zähler je Bucket (+Inf zuletzt), Summe]
+            state = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+class MetricsRegistry:
+    """Zähler und Histogramme mit Aggregation pro Thread.
+
+    Jeder Thread schreibt in einen eigenen Shard (kein Lock im Hot Path);
+    erst render() summiert alle Shards. Shards beendeter Threads werden dabei
+    in einen Sammel-Shard übernommen, damit Zähler monoton bleiben.
+    Gauges werden über Callbacks erst beim Abruf berechnet. Ohne Verzeichnis
+    gelten die Werte je Prozess (Label `pid`). Mit `directory` schreibt jeder
+    Worker Snapshots dorthin (start_flusher) und render() fasst alle zusammen:
+    Zähler und Histogramme summiert über alle Worker, auch beendete, damit sie
+    monoton bleiben; Gauges je laufendem Worker mit Label `pid`. Beim Beenden
+    eines Workers (retire bzw. retire_snapshots) wandern seine Zähler in einen
+    Sammel-Snapshot und seine Datei wird gelöscht.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[Tuple, float]], Tuple[str, ...]]] = {}
+        self._shards: List[_Shard] = []
+        self._retired = _Shard()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._started = time.time()
+        self._closed = False
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def gauge_callback(self, name: str, help_text: str, func: Callable[[], Dict[Tuple, float]],
+                       labelnames: Tuple[str, ...] = ()):
+        """Gauge, deren Werte func() beim Abruf als {Labels: Wert} liefert"""
+        with self._lock:
+            self._gauges[name] = (help_text, func, labelnames)
+
+    def _register(self, metric: _Metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def _check_fork(self):
+        # Nach fork(): Werte des Elternprozesses nicht doppelt zählen (Aufruf mit self._lock)
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._started = time.time()
+            self._shards = []
+            self._retired = _Shard()
+            self._closed = False
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None or self._pid != os.getpid():
+            shard = _Shard()
+            with self._lock:
+                self._check_fork()
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _collect(self) -> Tuple[Dict[Tuple, float], Dict[Tuple, List]]:
+        counters: Dict[Tuple, float] = {}
+        histograms: Dict[Tuple, List] = {}
+        with self._lock:
+            alive = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    self._merge(shard, self._retired.counters, self._retired.histograms)
+            self._shards = alive
+            for shard in [self._retired] + alive:
+                self._merge(shard, counters, histograms)
+        return counters, histograms
+
+    @staticmethod
+    def _merge(shard: _Shard, counters: Dict, histograms: Dict):
+        for key, value in list(shard.counters.items()):
+            counters[key] = counters.get(key, 0.0) + value
+        for key, (buckets, total) in list(shard.histograms.items()):
+            state = histograms.get(key)
+            if state is None:
+                histograms[key] = [list(buckets), total]
+            else:
+                state[0] = [a + b for a, b in zip(state[0], buckets)]
+                state[1] += total
+
+    def _gauge_values(self) -> Dict[str, Dict[Tuple, float]]:
+        with self._lock:
+            gauges = list(self._gauges.items())
+        result = {}
+        for name, (_, func, _) in gauges:
+            try:
+                values = func()
+            except Exception:
+                continue
+            result[name] = {tuple(str(label) for label in labels): value
+                            for labels, value in values.items() if value is not None}
+        return result
+
+    def snapshot(self) -> Dict:
+        """Aktuelle Werte des Prozesses als JSON-fähiges Dict"""
+        with self._lock:
+            self._check_fork()
+            pid, started = self._pid, self._started
+        counters, histograms = self._collect()
+        data = _snapshot_data(counters, histograms, pid)
+        data['started'] = started
+        data['gauges'] = [[name, list(labels), value]
+                          for name, values in self._gauge_values().items() for labels, value in values.items()]
+        return data
+
+    def write_snapshot(self, directory: str):
+        """Schreibt den Snapshot atomar nach <directory>/metrics-<pid>-<Startzeit>.json"""
+        if self._closed and self._pid == os.getpid():
+            return
+        data = self.snapshot()
+        _write_json(directory, _snapshot_name(data['pid'], data['started']), data)
+
+    def retire(self, directory: str):
+        """Beim Beenden eines Workers: Zähler in den Sammel-Snapshot, eigene Datei löschen"""
+        final = self.snapshot()
+        self._closed = True
+        retire_snapshots(directory, final['pid'], final)
+
+    def start_flusher(self, directory: str, interval: float = 10.0):
+        """Schreibt alle `interval` Sekunden und beim Beenden einen Snapshot (je Worker)"""
+        os.makedirs(directory, exist_ok=True)
+
+        def flush():
+            try:
+                self.write_snapshot(directory)
+            except Exception as e:
+                logger.warning(f"Metrik-Snapshot konnte nicht geschrieben werden: {e}")
+
+        def run():
+            while True:
+                time.sleep(interval)
+                flush()
+
+        flush()
+        atexit.register(flush)
+        threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+    def _aggregate(self, directory: str):
+        """Snapshots aller Worker zusammenführen (eigene Werte frisch)"""
+        self.write_snapshot(directory)
+        counters: Dict[Tuple, float] = {}
+        histograms: Dict[Tuple, List] = {}
+        gauges: Dict[str, Dict[Tuple, float]] = {}
+        # Geteilte Sperre: kein halb übernommener Worker (doppelt oder gar nicht gezählt)
+        with _snapshot_lock(directory, fcntl.LOCK_SH):
+            snapshots = [_read_json(path) for path in glob.glob(os.path.join(directory, 'metrics-*.json'))]
+        for data in snapshots:
+            if data is None:
+                continue
+            self._merge(_shard_from(data), counters, histograms)
+            # Gauges beendeter Worker beschreiben keinen aktuellen Zustand mehr
+            if data.get('pid') is not None and _pid_alive(data['pid']):
+                pid = str(data['pid'])
+                for name, labels, value in data.get('gauges', ()):
+                    gauges.setdefault(name, {})[tuple(labels) + (pid,)] = value
+        return counters, histograms, gauges
+
+    def render(self, directory: Optional[str] = None) -> str:
+        """Alle Metriken im Prometheus-Textformat 0.0.4 (mit `directory`: aller Worker)"""
+        if directory:
+            counters, histograms, gauges = self._aggregate(directory)
+            extra = ()
+        else:
+            counters, histograms = self._collect()
+            pid = (str(os.getpid()),)
+            counters = {(name, labels + pid): value for (name, labels), value in counters.items()}
+            histograms = {(name, labels + pid): state for (name, labels), state in histograms.items()}
+            gauges = {name: {labels + pid: value for labels, value in values.items()}
+                      for name, values in self._gauge_values().items()}
+            extra = ('pid',)
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            gauge_info = list(self._gauges.items())
+
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            names = metric.labelnames + extra
+            if metric.type == 'counter':
+                for (name, labels), value in sorted(counters.items()):
+                    if name == metric.name:
+                        lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            for (name, labels), (buckets, total) in sorted(histograms.items()):
+                if name != metric.name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (math.inf,), buckets):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _number(bound)
+                    lines.append(f"{name}_bucket{_labels(names + ('le',), labels + (le,))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+
+        for name, (help_text, _, labelnames) in gauge_info:
+            if name not in gauges:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in sorted(gauges[name].items()):
+                lines.append(f"{name}{_labels(labelnames + ('pid',), labels)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _snapshot_name(pid: int, started: float) -> str:
+    # Mit Startzeit: ein wiederverwendeter pid überschreibt keinen beendeten Worker
+    return f"metrics-{pid}-{int(started * 1000)}.json"
+
+def _snapshot_data(counters: Dict, histograms: Dict, pid: Optional[int]) -> Dict:
+    return {
+        'pid': pid,
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), buckets, total]
+                       for (name, labels), (buckets, total) in histograms.items()],
+    }
+
+def _shard_from(data: Dict) -> _Shard:
+    shard = _Shard()
+    shard.counters = {(name, tuple(labels)): value for name, labels, value in data['counters']}
+    shard.histograms = {(name, tuple(labels)): [buckets, total]
+                        for name, labels, buckets, total in data['histograms']}
+    return shard
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(directory: str, name: str, data: Dict):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, os.path.join(directory, name))
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+@contextmanager
+def _snapshot_lock(directory: str, operation: int):
+    with open(os.path.join(directory, '.metrics.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def retire_snapshots(directory: str, pid: int, final: Optional[Dict] = None):
+    """Übernimmt die Zähler eines beendeten Workers in den Sammel-Snapshot und löscht seine Dateien.
+
+    `final` ist der letzte Snapshot des Workers selbst (worker_exit); ohne ihn
+    (Master, child_exit, z.B. nach einem Timeout-Kill) zählt die letzte Datei.
+    """
+    with _snapshot_lock(directory, fcntl.LOCK_EX):
+        paths = glob.glob(os.path.join(directory, f'metrics-{pid}-*.json'))
+        snapshots = [final] if final is not None else [_read_json(path) for path in paths]
+        snapshots = [data for data in snapshots if data is not None]
+        if snapshots:
+            counters: Dict[Tuple, float] = {}
+            histograms: Dict[Tuple, List] = {}
+            retired_path = os.path.join(directory, RETIRED_SNAPSHOT)
+            for data in [_read_json(retired_path)] + snapshots:
+                if data is not None:
+                    MetricsRegistry._merge(_shard_from(data), counters, histograms)
+            _write_json(directory, RETIRED_SNAPSHOT, _snapshot_data(counters, histograms, None))
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+def clear_snapshots(directory: str):
+    """Snapshots eines früheren Laufs entfernen (Gunicorn: beim Start im Master)"""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + '}'
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+# Gemeinsame Registry des Prozesses
+metrics = MetricsRegistry()
+
+def observe_duration(histogram: Histogram, *labels) -> Callable:
+    """Decorator: misst die Laufzeit einer Funktion in einem Histogramm"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorator
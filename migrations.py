@@ -0,0 +1,119 @@
+# Versionierte Schema-Migrationen für users.db
+import logging
+from datetime import datetime
+
+# (Version, Beschreibung, SQL-Anweisungen) - nur anhängen, niemals bestehende ändern
+MIGRATIONS = [
+    (1, "Basisschema: users, sessions, login_attempts", [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            api_key_encrypted BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP,
+            failed_login_attempts INTEGER DEFAULT 0,
+            locked_until TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP NOT NULL,
+            ip_address TEXT,
+            user_agent TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ip_address TEXT NOT NULL,
+            username TEXT,
+            success BOOLEAN NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (2, "Indizes für Rate Limiting, Session- und Login-Bereinigung", [
+        # _is_rate_limited: WHERE ip_address = ? AND success = 0 AND timestamp > ?
+        # (seit Version 4 entfernt: das Login-Rate-Limit zählt nicht mehr in login_attempts)
+        'CREATE INDEX IF NOT EXISTS idx_login_attempts_ip_success_ts ON login_attempts (ip_address, success, timestamp)',
+        # Stündliche Bereinigung: DELETE ... WHERE timestamp < ?
+        'CREATE INDEX IF NOT EXISTS idx_login_attempts_timestamp ON login_attempts (timestamp)',
+        # cleanup_old_sessions: DELETE ... WHERE expires_at < ?
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)',
+        # ON DELETE CASCADE beim Löschen eines Benutzers
+        'CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions (user_id)',
+    ]),
+    (3, "Sperrliste für signierte Session-Tokens", [
+        '''
+        CREATE TABLE IF NOT EXISTS revoked_sessions (
+            session_id TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL,
+            revoked_at REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_revoked_sessions_revoked_at ON revoked_sessions (revoked_at)',
+        '''
+        CREATE TABLE IF NOT EXISTS user_revocations (
+            user_id INTEGER PRIMARY KEY,
+            revoked_before REAL NOT NULL,
+            revoked_at REAL NOT NULL
+        )
+        ''',
+    ]),
+    (4, "Ungenutzten Rate-Limit-Index auf login_attempts entfernen", [
+        # Rate Limiting läuft über GCRA (rate_limiter.py); der Index verteuerte nur jeden Insert
+        'DROP INDEX IF EXISTS idx_login_attempts_ip_success_ts',
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    """Aktuelle Schema-Version (PRAGMA user_version)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def apply_migrations(conn, target_version=LATEST_VERSION):
+    """Wendet alle ausstehenden Migrationen bis target_version an.
+
+    Läuft unter BEGIN IMMEDIATE, damit parallel startende Worker dieselbe
+    Migration nicht doppelt ausführen. Jede Migration wird zusätzlich in
+    der Tabelle schema_migrations protokolliert.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        ''')
+        current = get_schema_version(conn)
+        applied = []
+        for version, description, statements in MIGRATIONS:
+            if version <= current or version > target_version:
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                'INSERT OR REPLACE INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.now().isoformat())
+            )
+            # PRAGMA akzeptiert keine Parameter; version stammt aus MIGRATIONS
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            applied.append(version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for version in applied:
+        logging.info(f"Schema-Migration {version} angewendet")
+    return applied
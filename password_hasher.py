@@ -0,0 +1,157 @@
+# Passwort-Hashing (PBKDF2) in einem begrenzten Prozess-Pool
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Standard-Arbeitsfaktor von Werkzeug 2.3 für pbkdf2:sha256
+DEFAULT_ITERATIONS = 600000
+
+# spawn führt im Kindprozess das Hauptmodul des Elternprozesses erneut aus,
+# bei `python app.py` also die ganze App samt users.db und Hintergrund-Threads.
+# Während Pool-Prozesse entstehen, zeigt __main__ daher auf dieses Modul.
+_WORKER_MAIN = types.ModuleType('__mp_main__')
+_WORKER_MAIN.__spec__ = __spec__
+_main_lock = threading.Lock()
+
+@contextmanager
+def _worker_main():
+    with _main_lock:
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = _WORKER_MAIN
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main
+
+class PasswordHasherOverloaded(Exception):
+    """Zu viele ausstehende Hash-Operationen - Anfrage wird abgewiesen"""
+    def __init__(self, message: str = "Server ausgelastet. Bitte versuchen Sie es gleich erneut."):
+        super().__init__(message)
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method, salt_length=16)
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+class PasswordHasher:
+    """Führt PBKDF2 außerhalb des Request-Threads in eigenen Prozessen aus.
+
+    Die Berechnung hält dort nicht den GIL des Web-Prozesses, sodass
+    günstige Anfragen während eines Login-Ansturms nicht warten. Mehr als
+    `max_pending` gleichzeitige Operationen werden sofort mit
+    PasswordHasherOverloaded abgewiesen, statt eine unbegrenzte Warteschlange
+    aufzubauen. Wer länger als `timeout` wartet, erhält ebenfalls
+    PasswordHasherOverloaded; die Aufgabe zählt als ausstehend, bis sie im
+    Pool wirklich beendet ist. Der Pool entsteht beim ersten Aufruf (spawn,
+    nach fork() neu); seine Prozesse laden nur dieses Modul, nicht das
+    Hauptprogramm. workers=0 rechnet wie bisher direkt im aufrufenden Thread.
+
+    Bestehende Hashes behalten ihren Arbeitsfaktor; `iterations` gilt für
+    neu erzeugte Hashes.
+    """
+    def __init__(self, workers: int = 2, max_pending: Optional[int] = None,
+                 iterations: int = DEFAULT_ITERATIONS, timeout: float = 30.0):
+        self.workers = workers
+        self.max_pending = max_pending if max_pending is not None else max(1, workers) * 8
+        self.method = f'pbkdf2:sha256:{iterations}'
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def hash(self, password: str) -> str:
+        """Erzeugt einen Passwort-Hash"""
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Prüft ein Passwort gegen einen gespeicherten Hash"""
+        return self._run(_verify, password_hash, password)
+
+    def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                logger.warning(f"Passwort-Hashing überlastet ({self._pending} ausstehend)")
+                raise PasswordHasherOverloaded()
+            self._pending += 1
+        try:
+            # submit() startet bei Bedarf einen weiteren Pool-Prozess
+            with _worker_main():
+                future = self._get_executor().submit(func, *args)
+        except BaseException as e:
+            self._task_done(None)
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor()
+            raise
+        # Erst freigeben, wenn die Aufgabe im Pool fertig ist - nicht schon beim Timeout
+        future.add_done_callback(self._task_done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"Passwort-Hashing nach {self.timeout:g}s abgebrochen ({self._pending} ausstehend)")
+            raise PasswordHasherOverloaded()
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+
+    def _task_done(self, future: Optional[Future]):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled():
+                self.completed += 1
+
+    def _reset_executor(self):
+        # Abgestürzter Worker: beim nächsten Aufruf neuen Pool anlegen
+        with self._lock:
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Pool eines Elternprozesses ist nach fork() unbrauchbar
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """Zähler des Hashers"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts
+            }
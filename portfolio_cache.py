@@ -0,0 +1,286 @@
+# Benutzerbezogener Portfolio-Cache mit Stale-While-Revalidate
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Felder, die sich bei jedem Abruf ändern und keine inhaltliche Änderung darstellen
+VOLATILE_FIELDS = ('last_updated', 'last_update')
+
+class _Waiter:
+    """Condition eines Benutzers mit Anzahl wartender Streams"""
+    __slots__ = ('condition', 'count')
+
+    def __init__(self, lock: threading.Lock):
+        self.condition = threading.Condition(lock)
+        self.count = 0
+
+class _CacheEntry:
+    __slots__ = ('data', 'stored_at', 'data_size', 'size', 'digest', 'previous')
+
+    def __init__(self, data: Dict, size: int, digest: str):
+        self.data = data
+        self.stored_at = time.time()
+        self.data_size = size
+        # Gesamtgröße inklusive der gespeicherten Vorgängerversionen
+        self.size = size
+        self.digest = digest
+        # Ältere Versionen (Digest -> (Daten, Größe)) als Basis für Delta-Antworten
+        self.previous = OrderedDict()
+
+    @property
+    def version(self) -> str:
+        return self.digest
+
+def portfolio_delta(old: Dict, new: Dict) -> Dict:
+    """Berechnet die Änderungen zwischen zwei Portfolio-Snapshots.
+
+    Format:
+      {"set": {feld: wert}, "unset": [feld],
+       "lists": {feld: {"upsert": [eintrag], "remove": [symbol]}}}
+
+    Listen aus Einträgen mit 'symbol' (Assets, Wallets) werden pro Symbol
+    verglichen; alle anderen Felder werden bei Änderung vollständig ersetzt.
+    """
+    delta = {"set": {}, "unset": [], "lists": {}}
+    for key, value in new.items():
+        old_value = old.get(key)
+        if _is_symbol_list(value) and _is_symbol_list(old_value):
+            old_items = {item['symbol']: item for item in old_value}
+            new_symbols = set()
+            upsert = []
+            for item in value:
+                new_symbols.add(item['symbol'])
+                if old_items.get(item['symbol']) != item:
+                    upsert.append(item)
+            remove = [symbol for symbol in old_items if symbol not in new_symbols]
+            if upsert or remove:
+                delta["lists"][key] = {"upsert": upsert, "remove": remove}
+        elif key not in old or old_value != value:
+            delta["set"][key] = value
+    delta["unset"] = [key for key in old if key not in new]
+    return delta
+
+def _is_symbol_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) and 'symbol' in item for item in value)
+
+class PortfolioCache:
+    """LRU-Cache für verarbeitete Portfolio-Ergebnisse je Benutzer.
+
+    - frisch (Alter < fresh_ttl): Ergebnis direkt ausliefern
+    - veraltet (Alter < fresh_ttl + stale_ttl): Ergebnis ausliefern und im
+      Hintergrund aktualisieren
+    - abgelaufen/fehlend: synchron laden
+
+    Die Größe wird über die JSON-Länge der Einträge abgeschätzt und auf
+    max_bytes begrenzt; die am längsten ungenutzten Einträge werden verdrängt.
+
+    Die Version eines Eintrags ist der Digest seines Inhalts (ohne
+    VOLATILE_FIELDS). Sie ist damit über Prozesse und Gunicorn-Worker hinweg
+    vergleichbar: gleiche Version bedeutet gleicher Inhalt.
+    wait_for_change() blockiert, bis sich ein Portfolio ändert.
+    """
+    def __init__(self, fresh_ttl: float = 30.0, stale_ttl: float = 300.0,
+                 max_bytes: int = 50 * 1024 * 1024, max_refresh_workers: int = 4,
+                 max_versions: int = 4):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.max_versions = max_versions
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Wartende je Benutzer: put() weckt nur die Streams des betroffenen Benutzers
+        self._waiters: Dict[object, _Waiter] = {}
+        self._user_locks = {}
+        self._listeners = []
+        self._refreshing = set()
+        self._total_bytes = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_refresh_workers,
+            thread_name_prefix="portfolio-refresh"
+        )
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id, loader: Callable[[], Dict]) -> Tuple[Dict, float, str]:
+        """Liefert (Daten, Alter in Sekunden, Status) für einen Benutzer"""
+        entry = self._lookup(user_id)
+        if entry is not None:
+            age = time.time() - entry.stored_at
+            if age < self.fresh_ttl:
+                with self._lock:
+                    self.hits += 1
+                return entry.data, age, 'fresh'
+            if age < self.fresh_ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                self._schedule_refresh(user_id, loader)
+                return entry.data, age, 'stale'
+
+        # Pro Benutzer nur ein synchroner Ladevorgang (mehrere Tabs)
+        with self._user_lock(user_id):
+            entry = self._lookup(user_id)
+            if entry is not None and time.time() - entry.stored_at < self.fresh_ttl:
+                with self._lock:
+                    self.hits += 1
+                return entry.data, time.time() - entry.stored_at, 'fresh'
+
+            with self._lock:
+                self.misses += 1
+            data = loader()
+            self.put(user_id, data)
+            return data, 0.0, 'miss'
+
+    def peek(self, user_id) -> Optional[Tuple[Dict, float]]:
+        """Liefert (Daten, Alter) ohne Aktualisierung, falls vorhanden"""
+        entry = self._lookup(user_id)
+        if entry is None:
+            return None
+        return entry.data, time.time() - entry.stored_at
+
+    def peek_versioned(self, user_id) -> Optional[Tuple[Dict, float, str]]:
+        """Wie peek(), zusätzlich mit Versionsnummer"""
+        entry = self._lookup(user_id)
+        if entry is None:
+            return None
+        return entry.data, time.time() - entry.stored_at, entry.version
+
+    def get_version(self, user_id, version: str) -> Optional[Dict]:
+        """Liefert die Daten einer bestimmten (auch älteren) Version, falls noch vorhanden"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry.version == version:
+                return entry.data
+            previous = entry.previous.get(version)
+            return previous[0] if previous else None
+
+    def wait_for_change(self, user_id, since_version: Optional[str], timeout: float) -> Optional[Tuple[Dict, float, str]]:
+        """Wartet, bis eine andere Version als since_version vorliegt.
+
+        Gibt (Daten, Alter, Version) zurück oder None nach Ablauf des Timeouts.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            waiter = self._waiters.get(user_id)
+            if waiter is None:
+                waiter = self._waiters[user_id] = _Waiter(self._lock)
+            waiter.count += 1
+            try:
+                while True:
+                    entry = self._entries.get(user_id)
+                    if entry is not None and entry.version != since_version:
+                        return entry.data, time.time() - entry.stored_at, entry.version
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    waiter.condition.wait(remaining)
+            finally:
+                waiter.count -= 1
+                if waiter.count == 0:
+                    self._waiters.pop(user_id, None)
+
+    def put(self, user_id, data: Dict):
+        """Speichert ein Ergebnis und verdrängt alte Einträge bei Bedarf"""
+        body = json.dumps({k: v for k, v in data.items() if k not in VOLATILE_FIELDS},
+                          sort_keys=True, default=str).encode()
+        size = len(body)
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        with self._lock:
+            old = self._entries.pop(user_id, None)
+            if old is not None:
+                self._total_bytes -= old.size
+
+            # Unveränderter Inhalt behält seine Version (keine Benachrichtigung)
+            version = digest
+            entry = _CacheEntry(data, size, digest)
+            if old is not None:
+                # Vorgängerversionen für Delta-Antworten übernehmen (begrenzt)
+                entry.previous = old.previous
+                entry.previous.pop(version, None)
+                if old.version != version:
+                    entry.previous[old.version] = (old.data, old.data_size)
+                while len(entry.previous) > self.max_versions:
+                    entry.previous.popitem(last=False)
+                entry.size += sum(prev_size for _, prev_size in entry.previous.values())
+            self._entries[user_id] = entry
+            self._total_bytes += entry.size
+            if old is None or old.version != version:
+                waiter = self._waiters.get(user_id)
+                if waiter is not None:
+                    waiter.condition.notify_all()
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size
+                self.evictions += 1
+
+        for listener in self._listeners:
+            try:
+                listener(user_id, data, version)
+            except Exception as e:
+                logger.error(f"Fehler im Portfolio-Cache-Listener: {e}")
+
+    def add_listener(self, listener: Callable[[object, Dict, str], None]):
+        """Registriert einen Callback (user_id, Daten, Version), der nach jedem put() läuft"""
+        self._listeners.append(listener)
+
+    def invalidate(self, user_id):
+        """Entfernt den Eintrag eines Benutzers"""
+        with self._lock:
+            entry = self._entries.pop(user_id, None)
+            if entry is not None:
+                self._total_bytes -= entry.size
+            self._user_locks.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        """Zähler und Speicherbelegung des Caches"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _lookup(self, user_id) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+            return entry
+
+    def _user_lock(self, user_id) -> threading.Lock:
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def _schedule_refresh(self, user_id, loader: Callable[[], Dict]):
+        with self._lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+        self._executor.submit(self._refresh, user_id, loader)
+
+    def _refresh(self, user_id, loader: Callable[[], Dict]):
+        try:
+            self.put(user_id, loader())
+        except Exception as e:
+            logger.warning(f"Hintergrund-Aktualisierung für User {user_id} fehlgeschlagen: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
@@ -0,0 +1,243 @@
+# Persistente Portfolio-Historie (kompakte Tagesblöcke in SQLite)
+import bisect
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from audit_log import AuditWriter
+
+logger = logging.getLogger(__name__)
+
+# Serienname für den Gesamtwert; alle anderen Serien sind Asset-Symbole
+TOTAL_SERIES = '__total__'
+SECONDS_PER_DAY = 86400
+
+_UPSERT_SQL = '''
+    INSERT INTO portfolio_history (user_id, series, day, n, ts, val, min_val, max_val, last_ts, last_val)
+    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, series, day) DO UPDATE SET
+        n = n + 1,
+        ts = CAST(ts || excluded.ts AS BLOB),
+        val = CAST(val || excluded.val AS BLOB),
+        min_val = min(min_val, excluded.min_val),
+        max_val = max(max_val, excluded.max_val),
+        last_ts = excluded.last_ts,
+        last_val = excluded.last_val
+    WHERE last_ts < ?
+'''
+
+def _pack(values: List[float]) -> bytes:
+    """Packt float64-Werte in Little-Endian-Bytes"""
+    packed = array('d', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+def _unpack(blob: bytes) -> array:
+    values = array('d')
+    values.frombytes(blob)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+class PortfolioHistoryStore:
+    """Append-only Historie von Portfoliowert und Asset-Beständen je Benutzer.
+
+    Pro Benutzer, Serie und Tag existiert genau eine Zeile mit zwei gepackten
+    float64-Arrays (Zeitstempel, Werte). Neue Punkte werden per BLOB-Konkatenation
+    angehängt, ohne die Zeile zu lesen. Zusätzlich werden Tageskennzahlen
+    (min/max/letzter Wert) gepflegt, sodass Abfragen mit Tagesauflösung die
+    Arrays gar nicht entpacken müssen; feinere Auflösungen werden per
+    Binärsuche über die Zeitstempel heruntergerechnet.
+
+    Geschrieben wird im Hintergrund über einen AuditWriter, nicht im
+    Request-Thread. Pro Benutzer und Intervall von `min_interval` Sekunden
+    (an der Epoche ausgerichtet) landet höchstens ein Punkt in der Datenbank,
+    auch wenn mehrere Worker-Prozesse denselben Snapshot melden: das Upsert
+    ergänzt eine Zeile nur, wenn ihr letzter Punkt vor dem Intervall liegt.
+    """
+    def __init__(self, db_path='portfolio_history.db', min_interval: float = 60.0,
+                 max_points: int = 5000):
+        self.db_path = db_path
+        self.min_interval = min_interval
+        self.max_points = max_points
+        self._last_recorded = {}
+        self._lock = threading.Lock()
+        self._init_database()
+        self.writer = AuditWriter(self.get_db_connection, name='history-writer')
+
+    @contextmanager
+    def get_db_connection(self):
+        """Datenbankverbindung mit automatischem Schließen"""
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            yield conn
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Historien-Datenbankfehler: {e}")
+            raise
+        finally:
+            if conn:
+                conn.close()
+
+    def _init_database(self):
+        with self.get_db_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS portfolio_history (
+                    user_id INTEGER NOT NULL,
+                    series TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    n INTEGER NOT NULL,
+                    ts BLOB NOT NULL,
+                    val BLOB NOT NULL,
+                    min_val REAL NOT NULL,
+                    max_val REAL NOT NULL,
+                    last_ts REAL NOT NULL,
+                    last_val REAL NOT NULL,
+                    PRIMARY KEY (user_id, series, day)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_history_day ON portfolio_history(day)')
+            conn.commit()
+
+    @staticmethod
+    def extract_values(portfolio: Dict) -> Dict[str, float]:
+        """Ermittelt Gesamtwert und Bestände je Asset aus einem Portfolio-Ergebnis"""
+        values = {}
+        total = portfolio.get('total_value_eur', portfolio.get('total_value'))
+        if total is not None:
+            values[TOTAL_SERIES] = float(total)
+        for wallet in portfolio.get('crypto_wallets', []):
+            values[wallet['symbol']] = float(wallet.get('balance', 0))
+        for asset in portfolio.get('assets', []):
+            values[asset['symbol']] = float(asset.get('amount', 0))
+        return values
+
+    def record(self, user_id, portfolio: Dict, timestamp: Optional[float] = None) -> bool:
+        """Reiht einen Snapshot ein (höchstens einer pro Intervall und Benutzer)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        bucket = timestamp - timestamp % self.min_interval if self.min_interval > 0 else timestamp
+        with self._lock:
+            # Nur eine Vorprüfung je Prozess; prozessübergreifend entscheidet das Upsert
+            if self._last_recorded.get(user_id) == bucket:
+                return False
+            self._last_recorded[user_id] = bucket
+
+        values = self.extract_values(portfolio)
+        if not values:
+            return False
+
+        day = int(timestamp // SECONDS_PER_DAY)
+        ts_blob = _pack([timestamp])
+        for series, value in values.items():
+            self.writer.submit(_UPSERT_SQL, (user_id, series, day, ts_blob, _pack([value]),
+                                             value, value, timestamp, value, bucket))
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wartet, bis alle eingereihten Snapshots geschrieben sind"""
+        return self.writer.flush(timeout)
+
+    def query(self, user_id, start: float, end: float, resolution: Optional[float] = None,
+              series: str = TOTAL_SERIES) -> Dict:
+        """Liefert heruntergerechnete Punkte [Zeitstempel, Wert] im Bereich [start, end].
+
+        Pro Intervall der Länge `resolution` wird der letzte Wert ausgegeben.
+        """
+        span = max(1.0, end - start)
+        resolution = max(resolution or 0, span / self.max_points, 1.0)
+        first_day = int(start // SECONDS_PER_DAY)
+        last_day = int(end // SECONDS_PER_DAY)
+
+        with self.get_db_connection() as conn:
+            if resolution >= SECONDS_PER_DAY:
+                # Tageskennzahlen genügen - keine Arrays entpacken
+                rows = conn.execute('''
+                    SELECT last_ts, last_val FROM portfolio_history
+                    WHERE user_id = ? AND series = ? AND day BETWEEN ? AND ?
+                    ORDER BY day
+                ''', (user_id, series, first_day, last_day)).fetchall()
+                timestamps = array('d', (row['last_ts'] for row in rows))
+                values = array('d', (row['last_val'] for row in rows))
+            else:
+                rows = conn.execute('''
+                    SELECT ts, val FROM portfolio_history
+                    WHERE user_id = ? AND series = ? AND day BETWEEN ? AND ?
+                    ORDER BY day
+                ''', (user_id, series, first_day, last_day)).fetchall()
+                timestamps = array('d')
+                values = array('d')
+                for row in rows:
+                    timestamps.extend(_unpack(row['ts']))
+                    values.extend(_unpack(row['val']))
+
+        return {
+            'series': 'total' if series == TOTAL_SERIES else series,
+            'from': start,
+            'to': end,
+            'resolution': resolution,
+            'points': self._downsample(timestamps, values, start, end, resolution)
+        }
+
+    @staticmethod
+    def _downsample(timestamps: array, values: array, start: float, end: float,
+                    resolution: float) -> List[List[float]]:
+        """Letzter Wert je Intervall per Binärsuche (O(Intervalle * log n))"""
+        points = []
+        lo = bisect.bisect_left(timestamps, start)
+        hi = bisect.bisect_right(timestamps, end)
+        bucket_end = start + resolution
+        while lo < hi:
+            idx = bisect.bisect_left(timestamps, bucket_end, lo, hi)
+            if idx > lo:
+                points.append([timestamps[idx - 1], values[idx - 1]])
+                lo = idx
+            else:
+                # Leere Intervalle überspringen
+                bucket_end = start + ((timestamps[lo] - start) // resolution) * resolution
+            bucket_end += resolution
+        return points
+
+    def purge_older_than(self, max_age_days: float) -> int:
+        """Löscht ganze Tageszeilen, die älter als max_age_days sind"""
+        cutoff_day = int((time.time() - max_age_days * SECONDS_PER_DAY) // SECONDS_PER_DAY)
+        return self._delete_in_chunks('day < ?', (cutoff_day,))
+
+    def _delete_in_chunks(self, where, params, chunk_size=1000, pause=0.005):
+        """Löscht in kleinen Transaktionen, damit Schreibvorgänge dazwischen durchkommen.
+
+        where stammt nur aus dem Code, nie aus Benutzereingaben. Die Tabelle hat
+        keine rowid, daher wird über den Primärschlüssel ausgewählt.
+        """
+        deleted = 0
+        while True:
+            with self.get_db_connection() as conn:
+                count = conn.execute(f'''
+                    DELETE FROM portfolio_history WHERE (user_id, series, day) IN (
+                        SELECT user_id, series, day FROM portfolio_history WHERE {where} LIMIT ?
+                    )
+                ''', (*params, chunk_size)).rowcount
+                conn.commit()
+            deleted += count
+            if count < chunk_size:
+                return deleted
+            time.sleep(pause)
+
+    def delete_user(self, user_id):
+        """Entfernt die Historie eines Benutzers"""
+        # Eingereihte Snapshots zuerst schreiben, sonst tauchen sie nach dem Löschen wieder auf
+        self.flush()
+        with self.get_db_connection() as conn:
+            conn.execute('DELETE FROM portfolio_history WHERE user_id = ?', (user_id,))
+            conn.commit()
+        with self._lock:
+            self._last_recorded.pop(user_id, None)
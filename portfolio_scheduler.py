@@ -0,0 +1,196 @@
+# Hintergrund-Aktualisierung der Portfolios aktiver Benutzer
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+class _ScheduledUser:
+    __slots__ = ('api_key', 'last_seen', 'next_due', 'failures')
+
+    def __init__(self, api_key: str, next_due: float):
+        self.api_key = api_key
+        self.last_seen = time.monotonic()
+        self.next_due = next_due
+        self.failures = 0
+
+class PortfolioRefreshScheduler:
+    """Aktualisiert Portfolios aktiver Benutzer im Hintergrund.
+
+    Der Request-Pfad liest nur noch den letzten Snapshot aus dem
+    PortfolioCache. Kürzlich aktive Benutzer werden zuerst und häufiger
+    aktualisiert, die Abrufe werden gleichmäßig über die Zeit verteilt
+    (höchstens `max_rate` pro Sekunde) und bei erschöpftem Upstream-Budget
+    entsprechend Retry-After verschoben. Liefert `is_active(user_id)` False
+    (z.B. in einem anderen Worker gelöscht), wird der Benutzer vor dem
+    Abruf entfernt.
+    """
+    def __init__(self, cache, fetch: Callable[[str], Dict], refresh_interval: float = 60.0,
+                 max_rate: float = 2.0, active_window: float = 900.0, max_workers: int = 4,
+                 is_active: Optional[Callable[[object], bool]] = None):
+        self.cache = cache
+        self.fetch = fetch
+        self.is_active = is_active
+        self.refresh_interval = refresh_interval
+        self.max_rate = max_rate
+        self.active_window = active_window
+        self.max_workers = max_workers
+        self._users: Dict[object, _ScheduledUser] = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self.refreshes = 0
+        self.failures = 0
+        self.deferred = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def max_snapshot_age(self) -> float:
+        """Ältester Snapshot, den der Request-Pfad noch direkt ausliefert"""
+        return self.refresh_interval * 4 + 30
+
+    def touch(self, user_id, api_key: str, loaded: bool = False):
+        """Markiert einen Benutzer als aktiv (bei jeder Portfolio-Anfrage).
+
+        Neue Benutzer werden fällig, sobald ihr Snapshot älter als das
+        Intervall ist - ohne Snapshot sofort. `loaded=True`: der Aufrufer hat
+        gerade selbst geladen (bzw. eine Aktualisierung angestoßen), der
+        erste Abruf des Schedulers folgt dann erst nach einem Intervall.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry.api_key = api_key
+                entry.last_seen = now
+                return
+
+        if loaded:
+            delay = self.refresh_interval
+        else:
+            snapshot = self.cache.peek(user_id)
+            delay = max(0.0, self.refresh_interval - snapshot[1]) if snapshot else 0.0
+        with self._lock:
+            if user_id not in self._users:
+                # Jitter verteilt gleichzeitige Logins
+                self._users[user_id] = _ScheduledUser(api_key, now + delay + random.uniform(0, 1.0 / self.max_rate))
+                self._wakeup.set()
+
+    def forget(self, user_id):
+        """Entfernt einen Benutzer (z.B. beim Logout)"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def start(self):
+        """Startet den Scheduler-Thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="portfolio-scheduler")
+        self._thread = threading.Thread(target=self._run, name="portfolio-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Portfolio-Scheduler gestartet (Intervall {self.refresh_interval}s, max. {self.max_rate}/s)")
+
+    def stop(self):
+        """Stoppt den Scheduler-Thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """Zähler des Schedulers"""
+        with self._lock:
+            return {
+                'active_users': len(self._users),
+                'in_flight': len(self._in_flight),
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'deferred': self.deferred
+            }
+
+    def _interval_for(self, entry: _ScheduledUser, now: float) -> float:
+        # Länger inaktive Sitzungen seltener aktualisieren
+        idle = now - entry.last_seen
+        if idle < self.refresh_interval * 2:
+            return self.refresh_interval
+        return self.refresh_interval * 4
+
+    def _next_user(self, now: float):
+        """Wählt den fälligen Benutzer mit der jüngsten Aktivität"""
+        with self._lock:
+            for user_id in [uid for uid, e in self._users.items() if now - e.last_seen > self.active_window]:
+                del self._users[user_id]
+
+            due = [(uid, e) for uid, e in self._users.items()
+                   if e.next_due <= now and uid not in self._in_flight]
+            if not due:
+                upcoming = [e.next_due for e in self._users.values()]
+                return None, (min(upcoming) - now) if upcoming else self.refresh_interval
+
+            user_id, entry = max(due, key=lambda item: item[1].last_seen)
+            entry.next_due = now + self._interval_for(entry, now)
+            self._in_flight.add(user_id)
+            return (user_id, entry.api_key), 0.0
+
+    def _run(self):
+        pacing = 1.0 / self.max_rate
+        while not self._stop.is_set():
+            job, wait = self._next_user(time.monotonic())
+            if job is None:
+                self._wakeup.wait(timeout=max(0.05, min(wait, self.refresh_interval)))
+                self._wakeup.clear()
+                continue
+
+            self._executor.submit(self._refresh, *job)
+            # Gleichmäßige Verteilung der Upstream-Last
+            self._stop.wait(pacing)
+
+    def _refresh(self, user_id, api_key: str):
+        try:
+            if self.is_active is not None and not self.is_active(user_id):
+                self.forget(user_id)
+                self.cache.invalidate(user_id)
+                logger.info(f"Portfolio-Aktualisierung für User {user_id} beendet (Benutzer nicht mehr aktiv)")
+                return
+            self.cache.put(user_id, self.fetch(api_key))
+            with self._lock:
+                self.refreshes += 1
+                entry = self._users.get(user_id)
+                if entry:
+                    entry.failures = 0
+        except RateLimitExceeded as e:
+            with self._lock:
+                self.deferred += 1
+                entry = self._users.get(user_id)
+                if entry:
+                    entry.next_due = max(entry.next_due, time.monotonic() + e.retry_after)
+            logger.info(f"Portfolio-Aktualisierung für User {user_id} um {e.retry_after:.1f}s verschoben")
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                entry = self._users.get(user_id)
+                if entry:
+                    # Wiederholte Fehler (z.B. ungültiger Schlüssel) zunehmend seltener versuchen
+                    entry.failures += 1
+                    entry.next_due = time.monotonic() + self.refresh_interval * min(2 ** entry.failures, 16)
+            logger.warning(f"Portfolio-Aktualisierung für User {user_id} fehlgeschlagen: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(user_id)
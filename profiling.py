@@ -0,0 +1,138 @@
+# Profiling einzelner Anfragen (cProfile) mit begrenztem Ring auf der Festplatte
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+class RequestProfiler:
+    """Erstellt cProfile-Profile ausgewählter Anfragen.
+
+    Profiliert wird, wenn der Header-Token dem Admin-Token entspricht oder
+    (bei sample_rate N > 0) jede N-te Anfrage auf einen der `sample_paths`.
+    Es läuft höchstens ein Profil gleichzeitig (cProfile erfasst nur den
+    eigenen Thread, und ab Python 3.12 ist nur ein aktiver Profiler erlaubt);
+    weitere Kandidaten werden übersprungen. Die Profile landen als .prof
+    (pstats-Format, z.B. für snakeviz) in `directory`; über `max_files`
+    hinaus werden die ältesten gelöscht.
+    """
+    def __init__(self, directory: str = 'profiles', max_files: int = 50, sample_rate: int = 0,
+                 admin_token: Optional[str] = None, sample_paths=('/api/', '/login')):
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.sample_paths = tuple(sample_paths)
+        self._counter = itertools.count(1)
+        self._active = threading.Lock()
+        self._files_lock = threading.Lock()
+        self.captured = 0
+        self.skipped = 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        """Prüft einen übergebenen Admin-Token (ohne konfigurierten Token immer False)"""
+        return bool(self.admin_token) and bool(token) and secrets.compare_digest(token, self.admin_token)
+
+    def wants(self, path: str, token: Optional[str]) -> bool:
+        """Soll diese Anfrage profiliert werden?"""
+        if token is not None and self.is_admin(token):
+            return True
+        if self.sample_rate > 0 and path.startswith(self.sample_paths):
+            return next(self._counter) % self.sample_rate == 0
+        return False
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Startet ein Profil, sofern gerade keines läuft"""
+        if not self._active.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Anderer Profiler aktiv (z.B. Debugger)
+            self._active.release()
+            self.skipped += 1
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile, label: str, duration: float) -> Optional[str]:
+        """Beendet das Profil, speichert es und gibt den Dateinamen zurück"""
+        try:
+            profile.disable()
+        finally:
+            self._active.release()
+
+        safe_label = re.sub(r'[^\w-]+', '_', label).strip('_') or 'root'
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(duration * 1000)}ms-{safe_label[:60]}-{secrets.token_hex(3)}.prof"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(os.path.join(self.directory, name))
+            self._trim()
+        except OSError as e:
+            logger.error(f"Profil konnte nicht gespeichert werden: {e}")
+            return None
+        self.captured += 1
+        logger.info(f"Profil gespeichert: {name}")
+        return name
+
+    def _trim(self):
+        with self._files_lock:
+            entries = self._entries()
+            for entry in entries[self.max_files:]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def _entries(self) -> List[os.DirEntry]:
+        """Profile, neueste zuerst"""
+        try:
+            with os.scandir(self.directory) as scan:
+                entries = [entry for entry in scan if entry.is_file() and _PROFILE_NAME.match(entry.name)]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    def list_profiles(self) -> List[Dict]:
+        """Gespeicherte Profile mit Größe und Zeitpunkt"""
+        return [
+            {'name': entry.name, 'size': entry.stat().st_size, 'created': entry.stat().st_mtime}
+            for entry in self._entries()
+        ]
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Pfad zu einem gespeicherten Profil (nur gültige Namen, keine Pfade)"""
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def render_text(self, name: str, sort: str = 'cumulative', limit: int = 60) -> Optional[str]:
+        """pstats-Textauszug eines Profils"""
+        path = self.path_for(name)
+        if path is None:
+            return None
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.sort_stats(sort if sort in ('cumulative', 'tottime', 'calls') else 'cumulative')
+        stats.print_stats(limit)
+        return output.getvalue()
+
+    def stats(self) -> Dict:
+        return {
+            'captured': self.captured,
+            'skipped': self.skipped,
+            'sample_rate': self.sample_rate,
+            'files': len(self._entries())
+        }
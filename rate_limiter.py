@@ -0,0 +1,310 @@
+# Rate-Limits: Upstream-Anfragen an Bitpanda sowie Login/Registrierung
+import hashlib
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    """Budget erschöpft - Anfrage später wiederholen"""
+    def __init__(self, retry_after: float, message: str = "Rate Limit erreicht, bitte später erneut versuchen"):
+        super().__init__(message)
+        self.retry_after = max(0.0, retry_after)
+
+class TokenBucket:
+    """Klassischer Token-Bucket: `rate` Tokens pro Sekunde, maximal `capacity`"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Sekunden bis ein Token verfügbar ist (0 = sofort)"""
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def consume(self):
+        self.tokens -= 1
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+class UpstreamRateLimiter:
+    """Token-Bucket je API-Schlüssel plus globales Upstream-Budget.
+
+    `acquire` blockiert höchstens `max_wait` Sekunden (mit Jitter); ist das
+    Budget länger erschöpft, wird sofort RateLimitExceeded ausgelöst, statt
+    einen Worker-Thread festzuhalten.
+    """
+    def __init__(self, per_key_rate: float = 2.0, per_key_burst: float = 10.0,
+                 global_rate: float = 20.0, global_burst: float = 40.0,
+                 max_wait: float = 0.5, max_keys: int = 10000):
+        self.per_key_rate = per_key_rate
+        self.per_key_burst = per_key_burst
+        self.max_wait = max_wait
+        self.max_keys = max_keys
+        self._global = TokenBucket(global_rate, global_burst)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    @staticmethod
+    def _key_id(api_key: str) -> str:
+        # Keine Klartext-Schlüssel im Speicher des Limiters halten
+        return hashlib.sha256(api_key.encode()).hexdigest()[:24]
+
+    def _bucket(self, key_id: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key_id] = TokenBucket(self.per_key_rate, self.per_key_burst)
+        return bucket
+
+    def _prune(self, now: float):
+        for key_id in [k for k, b in self._buckets.items() if b.is_idle(now)]:
+            del self._buckets[key_id]
+
+    def try_acquire(self, api_key: str) -> float:
+        """Versucht ein Token zu reservieren, ohne zu warten.
+
+        Gibt 0 zurück, wenn das Token vergeben wurde, sonst die empfohlene
+        Wartezeit in Sekunden. Liegt diese über `max_wait`, wird
+        RateLimitExceeded ausgelöst.
+        """
+        key_id = self._key_id(api_key)
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._bucket(key_id, now)
+            wait = max(bucket.wait_time(now), self._global.wait_time(now))
+            if wait == 0:
+                bucket.consume()
+                self._global.consume()
+                self.granted += 1
+                return 0.0
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise RateLimitExceeded(wait)
+            self.throttled += 1
+            # Jitter, damit wartende Threads nicht gleichzeitig erneut zugreifen
+            return wait * random.uniform(1.0, 1.5)
+
+    def acquire(self, api_key: str):
+        """Reserviert ein Token für eine Upstream-Anfrage"""
+        while True:
+            wait = self.try_acquire(api_key)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    def block(self, api_key: Optional[str], seconds: float):
+        """Sperrt einen Schlüssel (oder global) z.B. nach Retry-After"""
+        with self._lock:
+            now = time.monotonic()
+            until = now + seconds
+            bucket = self._global if api_key is None else self._bucket(self._key_id(api_key), now)
+            bucket.blocked_until = max(bucket.blocked_until, until)
+
+    def stats(self) -> Dict:
+        """Zähler des Limiters"""
+        with self._lock:
+            return {
+                'granted': self.granted,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+                'tracked_keys': len(self._buckets)
+            }
+
+class GCRALimiter:
+    """In-Memory-Limiter nach dem Generic Cell Rate Algorithm.
+
+    Erlaubt höchstens `limit` Ereignisse je `period` Sekunden pro Schlüssel
+    (als Burst oder gleichmäßig verteilt) und speichert dafür je Schlüssel nur
+    die theoretische Ankunftszeit (TAT). Eine Entscheidung ist eine
+    Dictionary-Operation unter einem Lock - kein Datenbankzugriff.
+    """
+    def __init__(self, limit: int, period: float, max_keys: int = 100000):
+        self.limit = limit
+        self.period = period
+        self.emission_interval = period / limit
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def hit(self, key: str, cost: int = 1) -> float:
+        """Verbraucht `cost` Einheiten; 0 = erlaubt, sonst Wartezeit in Sekunden"""
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + cost * self.emission_interval
+            if new_tat - now > self.period:
+                self.limited += 1
+                return new_tat - now - self.period
+            if key not in self._tats and len(self._tats) >= self.max_keys:
+                self._prune(now)
+            self._tats[key] = new_tat
+            self.allowed += 1
+            return 0.0
+
+    def refund(self, key: str, cost: int = 1):
+        """Gibt verbrauchte Einheiten zurück (z.B. nach erfolgreichem Login)"""
+        with self._lock:
+            tat = self._tats.get(key)
+            if tat is not None:
+                self._tats[key] = tat - cost * self.emission_interval
+
+    def reset(self, key: str):
+        with self._lock:
+            self._tats.pop(key, None)
+
+    def _prune(self, now: float):
+        for key in [k for k, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+
+    def stats(self) -> Dict:
+        """Zähler des Limiters"""
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'allowed': self.allowed,
+                'limited': self.limited,
+                'tracked_keys': len(self._tats)
+            }
+
+class SQLiteGCRALimiter:
+    """GCRA mit gemeinsamem Zustand in einer SQLite-Datei für mehrere Worker.
+
+    Gleiche Semantik wie GCRALimiter; die TAT wird als Unix-Zeit in der
+    Tabelle rate_limits gehalten. Jede Entscheidung ist eine kurze
+    BEGIN-IMMEDIATE-Transaktion auf einer eigenen, kleinen Datenbank
+    (synchronous=OFF), getrennt von users.db.
+    """
+    def __init__(self, db_path: str, name: str, limit: int, period: float):
+        self.db_path = db_path
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.emission_interval = period / limit
+        self._local = threading.local()
+        self.allowed = 0
+        self.limited = 0
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    tat REAL NOT NULL,
+                    PRIMARY KEY (name, key)
+                ) WITHOUT ROWID
+            ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        # Eine Verbindung je Thread und Prozess (nach fork neu öffnen)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key: str, cost: int = 1) -> float:
+        """Verbraucht `cost` Einheiten; 0 = erlaubt, sonst Wartezeit in Sekunden"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            row = conn.execute('SELECT tat FROM rate_limits WHERE name = ? AND key = ?',
+                               (self.name, key)).fetchone()
+            tat = max(row[0], now) if row else now
+            new_tat = tat + cost * self.emission_interval
+            if new_tat - now > self.period:
+                conn.execute('ROLLBACK')
+                self.limited += 1
+                return new_tat - now - self.period
+            conn.execute('INSERT OR REPLACE INTO rate_limits (name, key, tat) VALUES (?, ?, ?)',
+                         (self.name, key, new_tat))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self.allowed += 1
+        return 0.0
+
+    def refund(self, key: str, cost: int = 1):
+        """Gibt verbrauchte Einheiten zurück (z.B. nach erfolgreichem Login)"""
+        self._connection().execute('UPDATE rate_limits SET tat = tat - ? WHERE name = ? AND key = ?',
+                                   (cost * self.emission_interval, self.name, key))
+
+    def reset(self, key: str):
+        self._connection().execute('DELETE FROM rate_limits WHERE name = ? AND key = ?', (self.name, key))
+
+    def purge_expired(self) -> int:
+        """Entfernt Schlüssel, deren Budget wieder vollständig ist"""
+        return self._connection().execute('DELETE FROM rate_limits WHERE name = ? AND tat <= ?',
+                                          (self.name, time.time())).rowcount
+
+    def stats(self) -> Dict:
+        """Zähler des Limiters (nur dieser Prozess)"""
+        return {
+            'backend': 'sqlite',
+            'allowed': self.allowed,
+            'limited': self.limited
+        }
+
+def create_rate_limiter(name: str, limit: int, period: float):
+    """Erzeugt einen Limiter für Login/Registrierung gemäß Umgebung.
+
+    LOGIN_RATE_LIMIT_BACKEND=memory (Standard, je Prozess) oder sqlite
+    (gemeinsam für mehrere Worker über LOGIN_RATE_LIMIT_DATABASE_PATH).
+    """
+    backend = os.environ.get('LOGIN_RATE_LIMIT_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        db_path = os.environ.get('LOGIN_RATE_LIMIT_DATABASE_PATH', 'rate_limits.db')
+        return SQLiteGCRALimiter(db_path, name, limit, period)
+    if backend != 'memory':
+        logger.warning(f"Unbekanntes Rate-Limit-Backend '{backend}', verwende memory")
+    return GCRALimiter(limit, period)
+
+def jittered_backoff(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponentielles Backoff mit vollem Jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Wertet einen Retry-After-Header in Sekunden aus"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,185 @@
+# Signierte, zustandslose Session-Tokens mit kompakter Sperrliste
+import base64
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = 'v1'
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+class RevocationList:
+    """Gesperrte Sessions und Benutzer, im Speicher gespiegelt.
+
+    Die Tabellen revoked_sessions und user_revocations (Migration 3) sind die
+    gemeinsame Quelle für alle Worker. Jeder Prozess lädt spätestens alle
+    `refresh_interval` Sekunden nur die seit dem letzten Abgleich neu
+    hinzugekommenen Einträge; Prüfungen selbst sind reine Set-/Dict-Zugriffe.
+    """
+    def __init__(self, connection_factory, refresh_interval: float = 5.0):
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self._sessions: Dict[str, float] = {}
+        self._users: Dict[str, float] = {}
+        self._synced_until = 0.0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def is_revoked(self, session_id: str, user_id, issued_at: float) -> bool:
+        self._refresh_if_due()
+        if session_id in self._sessions:
+            return True
+        revoked_before = self._users.get(str(user_id))
+        return revoked_before is not None and issued_at <= revoked_before
+
+    def revoke_session(self, session_id: str, expires_at: float):
+        """Sperrt eine Session bis zu ihrem Ablauf"""
+        now = time.time()
+        with self.connection_factory() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO revoked_sessions (session_id, expires_at, revoked_at)
+                VALUES (?, ?, ?)
+            ''', (session_id, expires_at, now))
+            conn.commit()
+        with self._lock:
+            self._sessions[session_id] = expires_at
+
+    def revoke_user(self, user_id):
+        """Sperrt alle bis jetzt ausgestellten Tokens eines Benutzers"""
+        now = time.time()
+        with self.connection_factory() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO user_revocations (user_id, revoked_before, revoked_at)
+                VALUES (?, ?, ?)
+            ''', (user_id, now, now))
+            conn.commit()
+        with self._lock:
+            self._users[str(user_id)] = now
+
+    def purge_expired(self, max_token_age: float) -> int:
+        """Entfernt Sperren, die keine gültigen Tokens mehr betreffen können"""
+        now = time.time()
+        with self.connection_factory() as conn:
+            deleted = conn.execute('DELETE FROM revoked_sessions WHERE expires_at < ?', (now,)).rowcount
+            deleted += conn.execute('DELETE FROM user_revocations WHERE revoked_before < ?',
+                                    (now - max_token_age,)).rowcount
+            conn.commit()
+        with self._lock:
+            for session_id in [s for s, expires_at in self._sessions.items() if expires_at < now]:
+                del self._sessions[session_id]
+        return deleted
+
+    def _refresh_if_due(self):
+        now = time.monotonic()
+        if now < self._next_refresh:
+            return
+        with self._lock:
+            if now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_interval
+            since = self._synced_until
+        try:
+            # Kleine Überlappung, damit gleichzeitig geschriebene Einträge nicht fehlen
+            cutoff = since - self.refresh_interval if since else 0.0
+            with self.connection_factory() as conn:
+                sessions = conn.execute('''
+                    SELECT session_id, expires_at, revoked_at FROM revoked_sessions
+                    WHERE revoked_at > ? AND expires_at > ?
+                ''', (cutoff, time.time())).fetchall()
+                users = conn.execute('''
+                    SELECT user_id, revoked_before, revoked_at FROM user_revocations WHERE revoked_at > ?
+                ''', (cutoff,)).fetchall()
+        except Exception as e:
+            logger.error(f"Sperrliste konnte nicht aktualisiert werden: {e}")
+            return
+        with self._lock:
+            latest = since
+            for session_id, expires_at, revoked_at in sessions:
+                self._sessions[session_id] = expires_at
+                latest = max(latest, revoked_at)
+            for user_id, revoked_before, revoked_at in users:
+                self._users[str(user_id)] = max(self._users.get(str(user_id), 0.0), revoked_before)
+                latest = max(latest, revoked_at)
+            self._synced_until = latest
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'revoked_sessions': len(self._sessions), 'revoked_users': len(self._users)}
+
+class SessionTokenManager:
+    """Stellt HMAC-signierte Session-Tokens aus und prüft sie ohne Datenbank.
+
+    Format: v1.<user_id>.<session_id>.<issued_at>.<expires_at>.<signatur>
+    (Signatur: HMAC-SHA256 über alles davor, base64url). Abgemeldete
+    Sessions und gelöschte Benutzer werden über die RevocationList gesperrt.
+    """
+    def __init__(self, secret: bytes, revocations: RevocationList):
+        self._secret = secret
+        self.revocations = revocations
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _sign(self, payload: str) -> str:
+        return _b64encode(hmac.new(self._secret, payload.encode(), hashlib.sha256).digest())
+
+    def issue(self, user_id, session_id: str, expires_at: float) -> str:
+        """Erzeugt ein Token für eine neue Session"""
+        payload = f"{TOKEN_VERSION}.{user_id}.{session_id}.{int(time.time())}.{int(expires_at)}"
+        self.issued += 1
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: Optional[str]) -> Optional[Dict]:
+        """Prüft Signatur, Ablauf und Sperrliste; liefert die Claims oder None"""
+        claims = self._decode(token)
+        if claims is None or self.revocations.is_revoked(claims['session_id'], claims['user_id'],
+                                                           claims['issued_at']):
+            self.rejected += 1
+            return None
+        self.verified += 1
+        return claims
+
+    def _decode(self, token: Optional[str]) -> Optional[Dict]:
+        if not token:
+            return None
+        payload, _, signature = token.rpartition('.')
+        parts = payload.split('.')
+        if len(parts) != 5 or parts[0] != TOKEN_VERSION:
+            return None
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None
+        try:
+            issued_at, expires_at = int(parts[3]), int(parts[4])
+        except ValueError:
+            return None
+        if expires_at < time.time():
+            return None
+        return {
+            'user_id': parts[1],
+            'session_id': parts[2],
+            'issued_at': issued_at,
+            'expires_at': expires_at
+        }
+
+    def revoke(self, token: Optional[str]):
+        """Sperrt die Session eines (gültigen) Tokens, z.B. beim Logout"""
+        claims = self._decode(token)
+        if claims is not None:
+            self.revocations.revoke_session(claims['session_id'], claims['expires_at'])
+
+    def revoke_user(self, user_id):
+        self.revocations.revoke_user(user_id)
+
+    def stats(self) -> Dict:
+        stats = {'issued': self.issued, 'verified': self.verified, 'rejected': self.rejected}
+        stats.update(self.revocations.stats())
+        return stats
@@ -22,12 +22,10 @@ cleanup() {
 # Set trap to cleanup on script exit
 trap cleanup SIGINT SIGTERM
 
-# Start backend in background
+# Start backend in background (Gunicorn, Einstellungen in gunicorn.conf.py)
 echo "⚙️  Backend wird gestartet (Port 5000)..."
-cd backend
-python app.py &
+gunicorn -c gunicorn.conf.py wsgi:app &
 BACKEND_PID=$!
-cd ..
 
 # Wait a moment for backend to start
 sleep 3
@@ -0,0 +1,68 @@
+# Gemeinsame Test-Einstellungen: Projektverzeichnis importierbar machen, gemeinsame Fixtures
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeClock:
+    """Ersatz für das time-Modul; Zeit läuft nur per advance()"""
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Ersetzt `time` in den übergebenen Modulen durch eine gemeinsame FakeClock"""
+    clock = FakeClock()
+
+    def install(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "time", clock)
+        return clock
+
+    return install
+
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    """SecureUserDatabase mit eigener Datenbank und schnellem Hashing im Test-Verzeichnis"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PASSWORD_HASH_WORKERS", "0")
+    monkeypatch.setenv("PASSWORD_HASH_ITERATIONS", "1000")
+    from database import SecureUserDatabase
+
+    db = SecureUserDatabase(str(tmp_path / "users.db"), pool_size=2)
+    yield db
+    db.audit_writer.close()
+    db.pool.close_all()
+
+
+@pytest.fixture
+def stub_server():
+    """Startet lokale Bitpanda-Stubs (Optionen wie BitpandaStub) und beendet sie nach dem Test"""
+    from bitpanda_stub import BitpandaStub, start_stub_server
+
+    servers = []
+
+    def start(**options):
+        server = start_stub_server(BitpandaStub(**options))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
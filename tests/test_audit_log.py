@@ -0,0 +1,113 @@
+# Tests für audit_log: gesammeltes Schreiben im Hintergrund und Sicherheits-Logging
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from audit_log import AuditWriter, setup_security_logging
+
+INSERT = "INSERT INTO events (name) VALUES (?)"
+
+
+def _connection_factory(path):
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    with connect() as conn:
+        conn.execute("CREATE TABLE events (name TEXT NOT NULL)")
+    return connect
+
+
+def _names(factory):
+    with factory() as conn:
+        return [row[0] for row in conn.execute("SELECT name FROM events ORDER BY rowid")]
+
+
+def test_writer_batches_events_in_background(tmp_path):
+    factory = _connection_factory(str(tmp_path / "audit.db"))
+    writer = AuditWriter(factory, flush_interval=10, batch_size=100)
+    for index in range(5):
+        writer.submit(INSERT, (f"login-{index}",))
+
+    assert writer.flush()
+    writer.close()
+
+    assert _names(factory) == [f"login-{index}" for index in range(5)]
+    assert writer.stats()["batches"] == 1
+    assert writer.stats()["written"] == 5
+
+
+def test_full_queue_and_closed_writer_write_synchronously(tmp_path):
+    factory = _connection_factory(str(tmp_path / "audit.db"))
+    gate = threading.Event()
+
+    @contextmanager
+    def slow_factory():
+        # Nur der Hintergrund-Thread hängt, synchrone Schreibvorgänge nicht
+        if threading.current_thread().name == "audit-writer":
+            gate.wait(5)
+        with factory() as conn:
+            yield conn
+
+    writer = AuditWriter(slow_factory, batch_size=1, max_queue=1, put_timeout=0.01)
+    writer.submit(INSERT, ("first",))
+    # Warten, bis der Hintergrund-Thread "first" übernommen hat
+    while writer._queue.qsize():
+        time.sleep(0.001)
+    writer.submit(INSERT, ("queued",))
+    writer.submit(INSERT, ("overflow",))
+    assert _names(factory) == ["overflow"]
+
+    gate.set()
+    writer.close()
+    writer.submit(INSERT, ("after-close",))
+
+    assert _names(factory) == ["overflow", "first", "queued", "after-close"]
+    assert writer.stats()["sync_writes"] == 1
+
+
+def _bare_root_logger(monkeypatch):
+    # Im Testkörper, da pytest seine Capture-Handler erst nach den Fixtures anhängt
+    root = logging.getLogger()
+    monkeypatch.setattr(root, "handlers", [])
+    monkeypatch.setattr(root, "level", root.level)
+    return root
+
+
+def test_logs_synchronously_until_started(tmp_path, monkeypatch):
+    root = _bare_root_logger(monkeypatch)
+    log_file = tmp_path / "security.log"
+    threads_before = threading.active_count()
+
+    security_logging = setup_security_logging(str(log_file), fmt="%(message)s")
+    logging.getLogger("test").info("vor dem Start")
+
+    # Kein Thread beim Import (Gunicorn-Master), Eintrag sofort in der Datei
+    assert threading.active_count() == threads_before
+    assert log_file.read_text() == "vor dem Start\n"
+
+    security_logging.start()
+    security_logging.start()
+    logging.getLogger("test").info("nach dem Start")
+    security_logging.stop()
+
+    assert threading.active_count() == threads_before
+    assert log_file.read_text() == "vor dem Start\nnach dem Start\n"
+    assert [type(h).__name__ for h in root.handlers] == ["QueueHandler"]
+    for handler in security_logging.handlers:
+        handler.close()
+
+
+def test_existing_configuration_is_kept(monkeypatch):
+    root = _bare_root_logger(monkeypatch)
+    handler = logging.NullHandler()
+    root.addHandler(handler)
+
+    assert setup_security_logging("unused.log") is None
+    assert root.handlers == [handler]
@@ -0,0 +1,16 @@
+# Tests für BitpandaAPI gegen den lokalen Bitpanda-Stub
+from bitpanda_api import BitpandaAPI
+
+
+def test_pool_stats_counts_only_real_idle_connections(stub_server):
+    server = stub_server()
+    api = BitpandaAPI(ticker_cache=None, rate_limiter=None, pool_size=32, base_url=server.base_url)
+    try:
+        api.get_portfolio("key-a")
+        stats = api.pool_stats()
+    finally:
+        api.close()
+
+    # Drei parallele Anfragen, die vorbelegten 32 Pool-Plätze zählen nicht mit
+    assert stats["requests"] == 3
+    assert stats["idle_connections"] == stats["connections_created"] <= 3
@@ -0,0 +1,76 @@
+# Tests für AsyncBitpandaAPI gegen den lokalen Bitpanda-Stub
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from bitpanda_api import BitpandaAPI
+from bitpanda_api_async import AsyncBitpandaAPI
+from bitpanda_stub import parse_latency
+
+API_KEYS = ["key-a", "key-b", "key-c"]
+
+
+def _load_async(base_url, api_keys):
+    async def run():
+        async with AsyncBitpandaAPI(ticker_cache=None, rate_limiter=None, base_url=base_url) as api:
+            return await api.get_portfolios(api_keys)
+    return asyncio.run(run())
+
+
+def _without_volatile(data):
+    return {k: v for k, v in data.items() if k != "last_updated"}
+
+
+def test_fan_out_matches_sync_client(stub_server):
+    server = stub_server(wallets=40, fiat_wallets=4)
+
+    results = _load_async(server.base_url, API_KEYS)
+
+    sync_api = BitpandaAPI(ticker_cache=None, rate_limiter=None, base_url=server.base_url)
+    try:
+        expected = _without_volatile(sync_api.get_portfolio(API_KEYS[0]))
+    finally:
+        sync_api.close()
+
+    assert list(results) == API_KEYS
+    assert expected["crypto_wallets"]
+    for api_key in API_KEYS:
+        assert _without_volatile(results[api_key]) == expected
+
+
+def test_upstream_errors_are_returned_per_key(stub_server):
+    server = stub_server(error_rates={"default": 1.0})
+
+    results = _load_async(server.base_url, API_KEYS)
+
+    assert set(results) == set(API_KEYS)
+    for result in results.values():
+        assert isinstance(result, Exception)
+        assert "API-Fehler" in str(result)
+    # Drei Versuche je Endpunkt und Schlüssel, kein Abbruch nach dem ersten Fehler
+    responses = server.stub.stats()["responses"]["/wallets"]
+    assert sum(responses.values()) == 3 * len(API_KEYS)
+
+
+def test_invalid_key_fails_without_affecting_others(stub_server):
+    server = stub_server()
+
+    results = _load_async(server.base_url, ["", "key-a"])
+
+    assert isinstance(results[""], ValueError)
+    assert results["key-a"]["crypto_wallets"]
+
+
+def test_ticker_loads_in_parallel_without_cache(stub_server):
+    server = stub_server(latencies={"default": parse_latency("fixed:0.2")})
+
+    start = time.perf_counter()
+    results = _load_async(server.base_url, [f"key-{i}" for i in range(5)])
+    elapsed = time.perf_counter() - start
+
+    # Ohne Ticker-Cache kein gemeinsamer Lock: fünf Schlüssel brauchen eine Latenz, nicht fünf
+    assert not any(isinstance(result, Exception) for result in results.values())
+    assert elapsed < 0.6
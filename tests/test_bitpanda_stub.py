@@ -0,0 +1,65 @@
+# Tests für den Bitpanda-Stub: Latenz-, Fehler- und 429-Injektion aus Sicht des Clients
+import time
+
+import pytest
+
+from bitpanda_api import BitpandaAPI
+from bitpanda_stub import parse_latency
+from rate_limiter import RateLimitExceeded
+
+
+@pytest.fixture
+def client_for(stub_server):
+    clients = []
+
+    def create(**options):
+        server = stub_server(**options)
+        client = BitpandaAPI(ticker_cache=None, rate_limiter=None, base_url=server.base_url)
+        clients.append(client)
+        return client, server.stub
+
+    yield create
+    for client in clients:
+        client.close()
+
+
+def test_latency_is_applied_per_request(client_for):
+    client, stub = client_for(latencies={"default": parse_latency("fixed:0.2")})
+
+    start = time.perf_counter()
+    portfolio = client.get_portfolio("key-a")
+    elapsed = time.perf_counter() - start
+
+    # Drei Endpunkte parallel: einmal die Latenz, nicht dreimal
+    assert 0.2 <= elapsed < 0.5
+    assert portfolio["crypto_wallets"]
+    assert stub.stats()["responses"]["/ticker"] == {"200": 1}
+
+
+def test_server_errors_are_retried_then_raised(client_for):
+    client, stub = client_for(error_rates={"/wallets": 1.0})
+
+    with pytest.raises(Exception, match="API-Fehler: 50[03]"):
+        client.get_portfolio("key-a")
+
+    assert sum(stub.stats()["responses"]["/wallets"].values()) == 3
+
+
+def test_long_rate_limit_burst_raises_with_retry_after(client_for):
+    client, stub = client_for(burst_every=60, burst_duration=60, retry_after=30)
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        client.get_portfolio("key-a")
+
+    # Retry-After über max_retry_wait: sofort abbrechen statt im Request-Thread warten
+    assert excinfo.value.retry_after == 30
+    assert stub.stats()["responses"]["/wallets"] == {"429": 1}
+
+
+def test_short_rate_limit_burst_is_waited_out(client_for):
+    client, stub = client_for(burst_every=3600, burst_duration=0.5)
+
+    portfolio = client.get_portfolio("key-a")
+
+    assert portfolio["crypto_wallets"]
+    assert stub.stats()["responses"]["/wallets"] == {"429": 1, "200": 1}
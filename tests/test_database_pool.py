@@ -0,0 +1,64 @@
+# Tests für SQLiteConnectionPool und die Fehlerbehandlung in SecureUserDatabase
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from database import SQLiteConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / "pool.db"), max_size=1, timeout=0.2)
+    yield pool
+    pool.close_all()
+
+
+def test_failed_rollback_discards_connection_and_keeps_original_error(user_db):
+    with pytest.raises(sqlite3.IntegrityError):
+        with user_db.get_db_connection() as conn:
+            conn.execute("CREATE TEMP TABLE t (id INTEGER PRIMARY KEY)")
+            # Verbindung kaputt: das Rollback scheitert mit ProgrammingError
+            conn.close()
+            raise sqlite3.IntegrityError("ursprünglicher Fehler")
+
+    stats = user_db.pool.stats()
+    assert stats["discarded"] == 1
+    assert stats["in_use"] == 0
+    # Die nächste Operation bekommt eine neue, funktionierende Verbindung
+    with user_db.get_db_connection() as conn:
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_pool_is_rebuilt_after_fork(pool):
+    inherited = pool.acquire()
+    pool.release(inherited)
+    held = pool.acquire()
+
+    # Wie nach fork(): der Pool gehört einem anderen Prozess
+    pool._pid -= 1
+    conn = pool.acquire()
+
+    assert conn is not held and conn is not inherited
+    assert pool.stats()["created"] == 2
+    # Rückgaben aus dem Elternprozess verändern den neuen Pool nicht
+    pool.release(held)
+    assert pool.stats()["in_use"] == 1
+    pool.release(conn)
+    assert pool.stats()["idle"] == 1
+
+
+def test_exhausted_pool_waits_for_release_then_times_out(pool):
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+
+    # Wartet, bis die Verbindung zurückkommt, und verwendet sie wieder
+    assert pool.acquire() is conn
+    assert pool.stats()["reused"] == 1
+
+    start = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError, match="erschöpft"):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.2
+    pool.release(conn)
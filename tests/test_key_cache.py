@@ -0,0 +1,66 @@
+# Tests für DecryptedKeyCache: Bindung an das Chiffrat, Ablauf und Überschreiben der Klartexte
+import pytest
+
+import key_cache
+from key_cache import DecryptedKeyCache
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(key_cache)
+
+
+def _buffer(cache, user_id):
+    return cache._entries[str(user_id)].plaintext
+
+
+def test_hit_requires_matching_ciphertext(clock):
+    cache = DecryptedKeyCache(ttl=60)
+    cache.put(1, b"chiffrat-1", "api-key")
+
+    assert cache.get(1, b"chiffrat-1") == "api-key"
+    buffer = _buffer(cache, 1)
+    # Schlüssel in der Datenbank geändert: kein veralteter Treffer, alter Klartext überschrieben
+    assert cache.get(1, b"chiffrat-2") is None
+    assert buffer == bytearray(len("api-key"))
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_wiped(clock):
+    cache = DecryptedKeyCache(ttl=60)
+    cache.put(1, b"chiffrat", "api-key")
+    buffer = _buffer(cache, 1)
+
+    clock.advance(61)
+
+    assert cache.get(1, b"chiffrat") is None
+    assert not any(buffer)
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_and_invalidate_wipe_plaintext(clock):
+    cache = DecryptedKeyCache(ttl=60, max_entries=2)
+    cache.put(1, b"a", "key-1")
+    cache.put(2, b"b", "key-2")
+    cache.get(1, b"a")
+    evicted = _buffer(cache, 2)
+
+    cache.put(3, b"c", "key-3")
+
+    assert not any(evicted)
+    assert cache.get(1, b"a") == "key-1"
+    assert cache.get(2, b"b") is None
+    invalidated = _buffer(cache, 3)
+    cache.invalidate(3)
+    assert not any(invalidated)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["wipes"] == 2
+
+
+def test_disabled_with_zero_ttl():
+    cache = DecryptedKeyCache(ttl=0)
+    cache.put(1, b"chiffrat", "api-key")
+
+    assert cache.get(1, b"chiffrat") is None
+    assert cache.stats()["entries"] == 0
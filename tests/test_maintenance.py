@@ -0,0 +1,72 @@
+# Tests für maintenance: Leader-Lock über flock und Ausführung nur beim Leader
+import threading
+import time
+
+import pytest
+
+from maintenance import LeaderLock, MaintenanceScheduler
+
+pytest.importorskip("fcntl")
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_leader_lock_is_exclusive_until_released(tmp_path):
+    path = str(tmp_path / "maintenance.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+
+    assert first.try_acquire()
+    assert first.try_acquire()
+    assert not second.try_acquire()
+
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def _scheduler(path, runs):
+    scheduler = MaintenanceScheduler(path, jitter=0, leader_retry=0.05, initial_delay=0)
+    scheduler.add_task("cleanup", lambda: runs.append(threading.current_thread().name), interval=0.05)
+    return scheduler
+
+
+def test_only_the_leader_runs_tasks_and_another_takes_over(tmp_path):
+    path = str(tmp_path / "maintenance.lock")
+    leader_runs, follower_runs = [], []
+    leader = _scheduler(path, leader_runs)
+    leader.start()
+    assert _wait_for(lambda: len(leader_runs) >= 2)
+
+    follower = _scheduler(path, follower_runs)
+    follower.start()
+    try:
+        time.sleep(0.2)
+        assert follower_runs == []
+        assert not follower.stats()["leader"]
+
+        # Leader endet (z.B. Worker-Neustart): der andere übernimmt nach leader_retry
+        leader.stop()
+        assert _wait_for(lambda: follower_runs)
+        assert follower.stats()["leader"]
+    finally:
+        follower.stop()
+        leader.stop()
+
+
+def test_failing_task_is_counted_and_rescheduled(tmp_path):
+    scheduler = MaintenanceScheduler(str(tmp_path / "maintenance.lock"), jitter=0, initial_delay=0)
+    scheduler.add_task("broken", lambda: 1 / 0, interval=0.05)
+    scheduler.start()
+    try:
+        assert _wait_for(lambda: scheduler.stats()["tasks"]["broken"]["failures"] >= 2)
+        assert scheduler.running
+    finally:
+        scheduler.stop()
+    assert scheduler.stats()["tasks"]["broken"]["runs"] == 0
@@ -0,0 +1,88 @@
+# Tests für MetricsRegistry: Aggregation über mehrere Worker-Prozesse
+import multiprocessing
+
+from metrics import MetricsRegistry
+
+
+def _registry():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Anfragen", ("route",))
+    latency = registry.histogram("request_seconds", "Dauer", ("route",), buckets=(0.1, 1.0))
+    registry.gauge_callback("queue_size", "Warteschlange", lambda: {(): 3})
+    return registry, requests, latency
+
+
+def _worker(directory, count):
+    registry, requests, latency = _registry()
+    for _ in range(count):
+        requests.inc("/api")
+        latency.observe(0.05, "/api")
+    registry.write_snapshot(directory)
+
+
+def test_render_sums_all_workers_including_exited_ones(tmp_path):
+    directory = str(tmp_path)
+    context = multiprocessing.get_context("spawn")
+    for count in (2, 5):
+        process = context.Process(target=_worker, args=(directory, count))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+    registry, requests, latency = _registry()
+    requests.inc("/api")
+    latency.observe(0.5, "/api")
+
+    output = registry.render(directory)
+
+    # Zähler/Histogramme: Summe aller Worker, ohne pid-Label
+    assert 'requests_total{route="/api"} 8' in output
+    assert 'request_seconds_bucket{route="/api",le="0.1"} 7' in output
+    assert 'request_seconds_count{route="/api"} 8' in output
+    # Gauges nur vom laufenden Prozess; beendete Worker fallen heraus
+    gauge_lines = [line for line in output.splitlines() if line.startswith("queue_size")]
+    assert len(gauge_lines) == 1
+    # Wiederholter Abruf zählt den eigenen Snapshot nicht doppelt
+    assert registry.render(directory) == output
+
+
+def test_render_without_directory_is_per_process():
+    registry, requests, _ = _registry()
+    requests.inc("/api")
+    output = registry.render()
+    assert 'requests_total{route="/api",pid="' in output
+
+
+def test_retired_worker_counts_stay_and_its_file_is_removed(tmp_path):
+    directory = str(tmp_path)
+    registry, requests, _ = _registry()
+    requests.inc("/api", amount=3)
+    registry.write_snapshot(directory)
+
+    # Worker endet: Zähler in den Sammel-Snapshot, eigene Datei weg, keine weiteren Schreibvorgänge
+    registry.retire(directory)
+    registry.write_snapshot(directory)
+    files = sorted(path.name for path in tmp_path.glob("metrics-*.json"))
+    assert files == ["metrics-retired.json"]
+
+    # Ein neuer Worker (auch mit gleichem pid) überschreibt nichts
+    successor, requests, _ = _registry()
+    requests.inc("/api", amount=2)
+    output = successor.render(directory)
+    assert 'requests_total{route="/api"} 5' in output
+
+
+def test_metrics_endpoint_requires_token_or_direct_loopback(monkeypatch, user_db):
+    monkeypatch.setenv("PORTFOLIO_REFRESH_ENABLED", "false")
+    from app import app
+
+    client = app.test_client()
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    assert client.get("/metrics").status_code == 200
+    assert client.get("/metrics", environ_base={"REMOTE_ADDR": "203.0.113.5"}).status_code == 403
+    # Über nginx (X-Forwarded-For) zählt auch ein lokaler Proxy nicht als lokal
+    assert client.get("/metrics", headers={"X-Forwarded-For": "127.0.0.1"}).status_code == 403
+
+    monkeypatch.setenv("METRICS_TOKEN", "geheim")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer geheim"}).status_code == 200
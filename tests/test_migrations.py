@@ -0,0 +1,71 @@
+# Tests für migrations: schrittweises Upgrade von user_version, Wiederholung und Rollback
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import LATEST_VERSION, MIGRATIONS, apply_migrations, get_schema_version
+
+
+@pytest.fixture
+def conn(tmp_path):
+    connection = sqlite3.connect(str(tmp_path / "users.db"))
+    yield connection
+    connection.close()
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_upgrade_step_by_step_to_latest(conn):
+    assert get_schema_version(conn) == 0
+
+    assert apply_migrations(conn, target_version=2) == [1, 2]
+    assert get_schema_version(conn) == 2
+    assert "idx_login_attempts_ip_success_ts" in _indexes(conn)
+    assert "revoked_sessions" not in _tables(conn)
+
+    assert apply_migrations(conn) == list(range(3, LATEST_VERSION + 1))
+    assert get_schema_version(conn) == LATEST_VERSION
+    assert {"revoked_sessions", "user_revocations"} <= _tables(conn)
+    # Migration 4 entfernt den Index aus Migration 2 wieder
+    assert "idx_login_attempts_ip_success_ts" not in _indexes(conn)
+    logged = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert logged == [version for version, _, _ in MIGRATIONS]
+
+
+def test_second_run_applies_nothing(conn):
+    apply_migrations(conn)
+
+    assert apply_migrations(conn) == []
+    assert get_schema_version(conn) == LATEST_VERSION
+
+
+def test_newer_database_is_not_downgraded(conn):
+    # Datenbank einer neueren Version: alte Migrationen nicht erneut anwenden, Version nicht senken
+    conn.execute(f"PRAGMA user_version = {LATEST_VERSION + 1}")
+
+    assert apply_migrations(conn) == []
+    assert get_schema_version(conn) == LATEST_VERSION + 1
+    assert "users" not in _tables(conn)
+
+
+def test_failed_migration_rolls_back_version_and_schema(conn, monkeypatch):
+    apply_migrations(conn)
+    broken = (LATEST_VERSION + 1, "Defekt", [
+        "CREATE TABLE half_applied (id INTEGER)",
+        "CREATE TABLE broken (",
+    ])
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS + [broken])
+
+    with pytest.raises(sqlite3.OperationalError):
+        apply_migrations(conn, target_version=LATEST_VERSION + 1)
+
+    assert get_schema_version(conn) == LATEST_VERSION
+    assert "half_applied" not in _tables(conn)
+    assert conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()[0] == LATEST_VERSION
@@ -0,0 +1,49 @@
+# Tests für PasswordHasher: Prozess-Pool, Hauptmodul der Pool-Prozesse und Überlastschutz
+import os
+import sys
+import threading
+
+import pytest
+
+from password_hasher import PasswordHasher, PasswordHasherOverloaded
+
+
+def _worker_state():
+    main = sys.modules["__main__"]
+    return {
+        "main": os.path.basename(getattr(main, "__file__", "") or ""),
+        "threads": threading.active_count(),
+        "database": "database" in sys.modules,
+    }
+
+
+@pytest.fixture
+def pooled_hasher():
+    hasher = PasswordHasher(workers=1, iterations=1000)
+    yield hasher
+    hasher.close()
+
+
+def test_pool_round_trip(pooled_hasher):
+    password_hash = pooled_hasher.hash("geheim")
+
+    assert password_hash.startswith("pbkdf2:sha256:1000$")
+    assert pooled_hasher.verify(password_hash, "geheim")
+    assert not pooled_hasher.verify(password_hash, "falsch")
+    assert pooled_hasher.stats()["completed"] == 3
+
+
+def test_pool_processes_load_only_the_hasher_module(pooled_hasher):
+    state = pooled_hasher._run(_worker_state)
+
+    # Nicht das Hauptprogramm des Elternprozesses (bei `python app.py` die ganze App)
+    assert state == {"main": "password_hasher.py", "threads": 1, "database": False}
+    assert sys.modules["__main__"].__name__ == "__main__"
+
+
+def test_rejects_beyond_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=0)
+
+    with pytest.raises(PasswordHasherOverloaded):
+        hasher.hash("geheim")
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,104 @@
+# Tests für PortfolioCache: Versionen/ETags über mehrere Prozesse hinweg
+from portfolio_cache import PortfolioCache, portfolio_delta
+
+
+def _portfolio(btc_balance, last_updated):
+    return {
+        "crypto_wallets": [
+            {"symbol": "BTC", "balance": btc_balance, "price_eur": 30000.0, "value_eur": btc_balance * 30000.0},
+            {"symbol": "ETH", "balance": 2.0, "price_eur": 1600.0, "value_eur": 3200.0},
+        ],
+        "fiat_wallets": [{"symbol": "EUR", "balance": 100.0}],
+        "total_value_eur": btc_balance * 30000.0 + 3300.0,
+        "last_updated": last_updated,
+    }
+
+
+def _without_volatile(data):
+    return {k: v for k, v in data.items() if k != "last_updated"}
+
+
+def test_equal_versions_mean_equal_content_across_instances():
+    # Zwei Instanzen = zwei Gunicorn-Worker mit eigenem Cache
+    worker_a = PortfolioCache()
+    worker_b = PortfolioCache()
+
+    # Worker B hat vorher schon andere Inhalte gesehen (anderer "Zählerstand")
+    worker_b.put(1, _portfolio(0.1, 1.0))
+    worker_b.put(1, _portfolio(0.2, 2.0))
+
+    worker_a.put(1, _portfolio(0.5, 10.0))
+    worker_b.put(1, _portfolio(0.5, 20.0))
+
+    data_a, _, version_a = worker_a.peek_versioned(1)
+    data_b, _, version_b = worker_b.peek_versioned(1)
+    assert version_a == version_b
+    assert _without_volatile(data_a) == _without_volatile(data_b)
+
+
+def test_different_content_never_shares_a_version():
+    worker_a = PortfolioCache()
+    worker_b = PortfolioCache()
+    worker_a.put(1, _portfolio(0.5, 10.0))
+    worker_b.put(1, _portfolio(0.6, 10.0))
+    assert worker_a.peek_versioned(1)[2] != worker_b.peek_versioned(1)[2]
+
+
+def test_unchanged_content_keeps_version():
+    cache = PortfolioCache()
+    cache.put(1, _portfolio(0.5, 10.0))
+    version = cache.peek_versioned(1)[2]
+    cache.put(1, _portfolio(0.5, 11.0))
+    assert cache.peek_versioned(1)[2] == version
+
+
+def test_delta_base_resolved_by_digest_from_other_instance():
+    # Client kennt Version von Worker A und fragt bei Worker B mit ?since= nach
+    worker_a = PortfolioCache()
+    worker_b = PortfolioCache()
+    worker_a.put(1, _portfolio(0.5, 10.0))
+    client_data, _, client_version = worker_a.peek_versioned(1)
+
+    worker_b.put(1, _portfolio(0.5, 11.0))
+    worker_b.put(1, _portfolio(0.7, 12.0))
+    current, _, current_version = worker_b.peek_versioned(1)
+
+    base = worker_b.get_version(1, client_version)
+    assert _without_volatile(base) == _without_volatile(client_data)
+    assert current_version != client_version
+
+    # Der Patch auf den Stand des Clients ergibt den aktuellen Inhalt von Worker B
+    patch = portfolio_delta(base, current)
+    assert patch["set"]["total_value_eur"] == current["total_value_eur"]
+    assert patch["lists"]["crypto_wallets"]["upsert"] == [current["crypto_wallets"][0]]
+
+
+def test_unknown_version_has_no_delta_base():
+    cache = PortfolioCache()
+    cache.put(1, _portfolio(0.5, 10.0))
+    assert cache.get_version(1, "0" * 32) is None
+
+
+def test_put_wakes_only_streams_of_the_changed_user():
+    import threading
+    import time
+
+    cache = PortfolioCache()
+    results = {}
+
+    def wait(user_id):
+        results[user_id] = cache.wait_for_change(user_id, None, timeout=0.5)
+
+    threads = [threading.Thread(target=wait, args=(user_id,)) for user_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    cache.put(1, _portfolio(0.5, 10.0))
+    threads[0].join()
+    assert time.monotonic() - start < 0.3
+    threads[1].join()
+
+    assert results[1] is not None and results[1][2] == cache.peek_versioned(1)[2]
+    assert results[2] is None
+    assert cache._waiters == {}
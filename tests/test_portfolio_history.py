@@ -0,0 +1,67 @@
+# Tests für PortfolioHistoryStore: Löschen je Benutzer, Aufbewahrungsfrist und Intervalle über Worker hinweg
+import time
+
+from portfolio_history import SECONDS_PER_DAY, PortfolioHistoryStore
+
+
+def _store(tmp_path):
+    return PortfolioHistoryStore(db_path=str(tmp_path / "history.db"), min_interval=0)
+
+
+def _portfolio(total):
+    return {"total_value_eur": total, "crypto_wallets": [{"symbol": "BTC", "balance": 0.5}]}
+
+
+def test_delete_user_removes_only_that_users_history(tmp_path):
+    store = _store(tmp_path)
+    now = time.time()
+    store.record(1, _portfolio(100.0), now)
+    store.record(2, _portfolio(200.0), now)
+
+    # delete_user schreibt eingereihte Snapshots vorher
+    store.delete_user(1)
+    store.flush()
+
+    assert store.query(1, now - 60, now + 60)["points"] == []
+    assert [point[1] for point in store.query(2, now - 60, now + 60)["points"]] == [200.0]
+
+
+def test_purge_older_than_drops_days_outside_retention(tmp_path):
+    store = _store(tmp_path)
+    now = time.time()
+    store.record(1, _portfolio(100.0), now - 40 * SECONDS_PER_DAY)
+    store.record(1, _portfolio(110.0), now)
+    store.flush()
+
+    deleted = store.purge_older_than(30)
+
+    # Eine Tageszeile je Serie (Gesamtwert und BTC)
+    assert deleted == 2
+    remaining = store.query(1, now - 50 * SECONDS_PER_DAY, now + 60)
+    assert [point[1] for point in remaining["points"]] == [110.0]
+
+
+def test_workers_record_one_point_per_interval(tmp_path):
+    path = str(tmp_path / "history.db")
+    # Zwei Worker-Prozesse mit eigener Vorprüfung, gleiche Datenbank
+    workers = [PortfolioHistoryStore(db_path=path, min_interval=60) for _ in range(2)]
+    start = 1_700_000_040.0
+
+    for offset in (0.0, 1.5, 30.0, 65.0):
+        for index, worker in enumerate(workers):
+            worker.record(1, _portfolio(100.0 + offset), start + offset + index)
+    for worker in workers:
+        worker.flush()
+
+    points = workers[0].query(1, start - 60, start + 120, resolution=1)["points"]
+    assert [point[1] for point in points] == [100.0, 165.0]
+
+
+def test_purge_deletes_in_chunks(tmp_path):
+    store = _store(tmp_path)
+    old = time.time() - 40 * SECONDS_PER_DAY
+    for user_id in range(5):
+        store.record(user_id, _portfolio(1.0), old)
+    store.flush()
+
+    assert store._delete_in_chunks("day < ?", (int(time.time() // SECONDS_PER_DAY),), chunk_size=3) == 10
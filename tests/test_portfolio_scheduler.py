@@ -0,0 +1,52 @@
+# Tests für PortfolioRefreshScheduler (ohne Hintergrund-Thread)
+import time
+
+from portfolio_cache import PortfolioCache
+from portfolio_scheduler import PortfolioRefreshScheduler
+
+
+def _portfolio():
+    return {"crypto_wallets": [], "fiat_wallets": [], "total_value_eur": 0.0, "last_updated": 1.0}
+
+
+def test_refresh_stops_for_users_deleted_elsewhere():
+    cache = PortfolioCache()
+    fetched = []
+    active = {1: True}
+
+    def fetch(api_key):
+        fetched.append(api_key)
+        return _portfolio()
+
+    scheduler = PortfolioRefreshScheduler(cache, fetch, is_active=lambda user_id: active[user_id])
+    scheduler.touch(1, "key-1")
+    scheduler._refresh(1, "key-1")
+    assert fetched == ["key-1"]
+    assert cache.peek_versioned(1) is not None
+
+    # Benutzer wurde (z.B. in einem anderen Worker) gelöscht
+    active[1] = False
+    scheduler._refresh(1, "key-1")
+
+    assert fetched == ["key-1"]
+    assert cache.peek_versioned(1) is None
+    assert scheduler.stats()["active_users"] == 0
+
+
+def test_touch_does_not_refetch_a_freshly_loaded_user():
+    cache = PortfolioCache()
+    scheduler = PortfolioRefreshScheduler(cache, lambda api_key: _portfolio(), refresh_interval=60, max_rate=100)
+    now = time.monotonic()
+
+    # Ohne Snapshot: sofort fällig
+    scheduler.touch(1, "key-1")
+    assert scheduler._users[1].next_due < now + 1
+
+    # Snapshot gerade synchron geladen (SSE-Pfad): erst nach dem Intervall
+    cache.put(2, _portfolio())
+    scheduler.touch(2, "key-2")
+    assert scheduler._users[2].next_due > now + 59
+
+    # Aufrufer lädt selbst (Fallback in /api/portfolio), noch ohne fertigen Snapshot
+    scheduler.touch(3, "key-3", loaded=True)
+    assert scheduler._users[3].next_due > now + 59
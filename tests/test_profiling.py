@@ -0,0 +1,67 @@
+# Tests für RequestProfiler: Auswahl der Anfragen, ein Profil zur Zeit und begrenzter Ring
+import os
+import time
+
+import pytest
+
+from profiling import RequestProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(directory=str(tmp_path / "profiles"), max_files=2, sample_rate=3,
+                           admin_token="admin")
+
+
+def _busy():
+    return sum(i * i for i in range(1000))
+
+
+def test_wants_admin_token_or_every_nth_sampled_request(profiler):
+    assert profiler.wants("/health", "admin")
+    assert not profiler.wants("/health", "falsch")
+    assert [profiler.wants("/api/portfolio", None) for _ in range(6)] == [False, False, True] * 2
+    assert not profiler.wants("/static/app.js", None)
+    assert not RequestProfiler(admin_token=None).is_admin("")
+
+
+def test_profile_is_saved_and_rendered(profiler):
+    profile = profiler.start()
+    _busy()
+    name = profiler.finish(profile, "/api/portfolio", 0.012)
+
+    assert "-12ms-api_portfolio-" in name
+    assert "_busy" in profiler.render_text(name)
+    assert [entry["name"] for entry in profiler.list_profiles()] == [name]
+
+
+def test_only_one_profile_at_a_time(profiler):
+    first = profiler.start()
+    try:
+        assert profiler.start() is None
+    finally:
+        profiler.finish(first, "first", 0.001)
+
+    assert profiler.stats()["skipped"] == 1
+    second = profiler.start()
+    assert second is not None
+    profiler.finish(second, "second", 0.001)
+
+
+def test_oldest_profiles_are_trimmed(profiler):
+    names = []
+    for index in range(3):
+        names.append(profiler.finish(profiler.start(), f"run-{index}", 0.001))
+        # Eindeutige Änderungszeiten, da nach mtime sortiert wird
+        past = time.time() - 10 + index
+        os.utime(profiler.path_for(names[-1]), (past, past))
+
+    assert [entry["name"] for entry in profiler.list_profiles()] == names[:0:-1]
+
+
+def test_path_for_rejects_other_files(profiler, tmp_path):
+    (tmp_path / "secret.prof").write_text("x")
+
+    assert profiler.path_for("../secret.prof") is None
+    assert profiler.path_for("missing.prof") is None
+    assert profiler.render_text("../secret.prof") is None
@@ -0,0 +1,162 @@
+# Tests für rate_limiter: Token-Bucket, Upstream-Limiter, GCRA (Speicher und SQLite), Retry-After
+import email.utils
+import time
+
+import pytest
+
+import rate_limiter
+from rate_limiter import (GCRALimiter, RateLimitExceeded, SQLiteGCRALimiter, TokenBucket,
+                          UpstreamRateLimiter, create_rate_limiter, parse_retry_after)
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(rate_limiter)
+
+
+def test_token_bucket_refills_at_rate_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    now = bucket.updated_at
+    bucket.consume()
+    bucket.consume()
+
+    assert bucket.wait_time(now) == 0.5
+    assert bucket.wait_time(now + 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(now + 10) == 0.0
+    assert bucket.tokens == 2
+    assert bucket.is_idle(now + 10)
+
+
+def test_token_bucket_block_overrides_tokens():
+    bucket = TokenBucket(rate=1.0, capacity=5)
+    now = bucket.updated_at
+    bucket.blocked_until = now + 3
+
+    assert bucket.wait_time(now + 1) == pytest.approx(2.0)
+    assert not bucket.is_idle(now + 1)
+
+
+def test_upstream_limiter_throttles_then_rejects_per_key(clock):
+    limiter = UpstreamRateLimiter(per_key_rate=1.0, per_key_burst=2, global_rate=100, global_burst=100,
+                                  max_wait=0.5)
+
+    assert limiter.try_acquire("key-a") == 0
+    assert limiter.try_acquire("key-a") == 0
+    # Nächstes Token erst in 1 s - länger als max_wait
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.try_acquire("key-a")
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+    # Andere Schlüssel haben ein eigenes Budget
+    assert limiter.try_acquire("key-b") == 0
+
+    clock.advance(0.6)
+    wait = limiter.try_acquire("key-a")
+    assert 0.4 <= wait <= 0.6
+    assert limiter.stats() == {"granted": 3, "throttled": 1, "rejected": 1, "tracked_keys": 2}
+
+
+def test_upstream_limiter_global_budget_and_block(clock):
+    limiter = UpstreamRateLimiter(per_key_rate=10, per_key_burst=10, global_rate=1.0, global_burst=1,
+                                  max_wait=0.5)
+
+    assert limiter.try_acquire("key-a") == 0
+    with pytest.raises(RateLimitExceeded):
+        limiter.try_acquire("key-b")
+
+    clock.advance(1.0)
+    limiter.block(None, 30)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.try_acquire("key-c")
+    assert excinfo.value.retry_after == pytest.approx(30)
+
+
+def test_upstream_limiter_prunes_idle_keys(clock):
+    limiter = UpstreamRateLimiter(per_key_rate=1.0, per_key_burst=1, max_keys=2)
+    limiter.try_acquire("key-a")
+    limiter.try_acquire("key-b")
+
+    clock.advance(5)
+    limiter.try_acquire("key-c")
+
+    assert limiter.stats()["tracked_keys"] == 1
+
+
+GCRA_BACKENDS = {
+    "memory": lambda tmp_path: GCRALimiter(limit=3, period=60),
+    "sqlite": lambda tmp_path: SQLiteGCRALimiter(str(tmp_path / "rate_limits.db"), "login", limit=3, period=60),
+}
+
+
+@pytest.fixture(params=sorted(GCRA_BACKENDS))
+def gcra(request, tmp_path, clock):
+    return GCRA_BACKENDS[request.param](tmp_path)
+
+
+def test_gcra_allows_limit_per_period_then_reports_wait(gcra, clock):
+    assert [gcra.hit("ip") for _ in range(3)] == [0, 0, 0]
+    # Emissionsintervall 20 s: die nächste Einheit wird nach 20 s frei
+    assert gcra.hit("ip") == pytest.approx(20)
+    assert gcra.hit("other") == 0
+
+    clock.advance(20)
+    assert gcra.hit("ip") == 0
+    assert gcra.hit("ip") == pytest.approx(20)
+    assert gcra.stats()["allowed"] == 5
+    assert gcra.stats()["limited"] == 2
+
+
+def test_gcra_refund_and_reset(gcra):
+    for _ in range(3):
+        gcra.hit("user")
+
+    gcra.refund("user")
+    assert gcra.hit("user") == 0
+    assert gcra.hit("user") > 0
+
+    gcra.reset("user")
+    assert gcra.hit("user", cost=3) == 0
+
+
+def test_sqlite_gcra_is_shared_between_workers_and_purged(tmp_path, clock):
+    path = str(tmp_path / "rate_limits.db")
+    first = SQLiteGCRALimiter(path, "login", limit=2, period=10)
+    second = SQLiteGCRALimiter(path, "login", limit=2, period=10)
+    register = SQLiteGCRALimiter(path, "register", limit=2, period=10)
+
+    assert first.hit("ip") == 0
+    assert second.hit("ip") == 0
+    assert first.hit("ip") == pytest.approx(5)
+    # Eigener Name, eigenes Budget
+    assert register.hit("ip") == 0
+
+    clock.advance(10)
+    assert first.purge_expired() == 1
+    assert register.purge_expired() == 1
+
+
+def test_create_rate_limiter_uses_backend_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("LOGIN_RATE_LIMIT_BACKEND", "sqlite")
+    monkeypatch.setenv("LOGIN_RATE_LIMIT_DATABASE_PATH", str(tmp_path / "limits.db"))
+    assert isinstance(create_rate_limiter("login", 5, 60), SQLiteGCRALimiter)
+
+    monkeypatch.setenv("LOGIN_RATE_LIMIT_BACKEND", "redis")
+    assert isinstance(create_rate_limiter("login", 5, 60), GCRALimiter)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120.0),
+    ("1.5", 1.5),
+    ("-3", 0.0),
+    ("", None),
+    (None, None),
+    ("bald", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    value = email.utils.formatdate(time.time() + 30, usegmt=True)
+
+    assert 28 <= parse_retry_after(value) <= 30
+    assert parse_retry_after(email.utils.formatdate(time.time() - 30, usegmt=True)) == 0.0
@@ -0,0 +1,82 @@
+# Tests für session_tokens: Signatur, Ablauf und Sperrliste über mehrere Worker
+import time
+
+import pytest
+
+from session_tokens import RevocationList, SessionTokenManager
+
+
+@pytest.fixture
+def revocations(user_db):
+    return RevocationList(user_db.get_db_connection, refresh_interval=0)
+
+
+@pytest.fixture
+def tokens(revocations):
+    return SessionTokenManager(b"secret", revocations)
+
+
+def test_issue_and_verify_round_trip(tokens):
+    token = tokens.issue(7, "session-a", time.time() + 3600)
+
+    claims = tokens.verify(token)
+
+    assert claims["user_id"] == "7"
+    assert claims["session_id"] == "session-a"
+    assert claims["issued_at"] <= time.time() < claims["expires_at"]
+
+
+def test_rejects_tampered_foreign_expired_and_malformed_tokens(tokens, revocations):
+    token = tokens.issue(7, "session-a", time.time() + 3600)
+    payload, _, signature = token.rpartition(".")
+
+    assert tokens.verify(payload.replace(".7.", ".8.") + "." + signature) is None
+    assert SessionTokenManager(b"other", revocations).verify(token) is None
+    assert tokens.verify(tokens.issue(7, "session-b", time.time() - 1)) is None
+    assert tokens.verify("v1.kaputt") is None
+    assert tokens.verify(None) is None
+    assert tokens.stats()["rejected"] == 4
+
+
+def test_logout_revokes_only_that_session(tokens):
+    expires_at = time.time() + 3600
+    first = tokens.issue(7, "session-a", expires_at)
+    second = tokens.issue(7, "session-b", expires_at)
+
+    tokens.revoke(first)
+
+    assert tokens.verify(first) is None
+    assert tokens.verify(second) is not None
+
+
+def test_revoke_user_rejects_earlier_tokens(tokens):
+    token = tokens.issue(7, "session-a", time.time() + 3600)
+    other_user = tokens.issue(8, "session-b", time.time() + 3600)
+
+    tokens.revoke_user(7)
+
+    assert tokens.verify(token) is None
+    assert tokens.verify(other_user) is not None
+
+
+def test_revocations_reach_other_workers(user_db, tokens):
+    other_worker = SessionTokenManager(b"secret", RevocationList(user_db.get_db_connection, refresh_interval=0))
+    session_token = tokens.issue(7, "session-a", time.time() + 3600)
+    user_token = tokens.issue(8, "session-b", time.time() + 3600)
+    assert other_worker.verify(session_token) is not None
+
+    tokens.revoke(session_token)
+    tokens.revoke_user(8)
+
+    assert other_worker.verify(session_token) is None
+    assert other_worker.verify(user_token) is None
+
+
+def test_purge_drops_expired_revocations(revocations):
+    revocations.revoke_session("expired", time.time() - 1)
+    revocations.revoke_session("active", time.time() + 3600)
+    revocations.revoke_user(7)
+
+    assert revocations.purge_expired(max_token_age=3600) == 1
+    assert revocations.stats() == {"revoked_sessions": 1, "revoked_users": 1}
+    assert revocations.is_revoked("active", 7, time.time() - 10)
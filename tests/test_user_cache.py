@@ -0,0 +1,68 @@
+# Tests für UserCache: TTL, LRU-Verdrängung und Invalidierung je Sitzung und Benutzer
+from types import SimpleNamespace
+
+import pytest
+
+import user_cache
+from user_cache import UserCache
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(user_cache)
+
+
+def _user(user_id, username):
+    return SimpleNamespace(id=user_id, username=username)
+
+
+def test_entries_are_per_session_and_expire(clock):
+    cache = UserCache(ttl=60)
+    alice = _user(1, "alice")
+    cache.put(1, "session-a", alice)
+
+    assert cache.get(1, "session-a") is alice
+    assert cache.get("1", "session-a") is alice
+    assert cache.get(1, "session-b") is None
+
+    clock.advance(61)
+    assert cache.get(1, "session-a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_session_and_user(clock):
+    cache = UserCache(ttl=60)
+    alice, bob = _user(1, "alice"), _user(2, "bob")
+    cache.put(1, "session-a", alice)
+    cache.put(1, "session-b", alice)
+    cache.put(2, "session-c", bob)
+
+    cache.invalidate_session(1, "session-a")
+    assert cache.get(1, "session-a") is None
+    assert cache.get(1, "session-b") is alice
+
+    # Über den Benutzernamen, z.B. wenn nur dieser bekannt ist
+    assert cache.invalidate_user(username="alice") == ["1"]
+    assert cache.invalidate_user(user_id=2, username="bob") == ["2"]
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = UserCache(ttl=60, max_entries=2)
+    cache.put(1, "a", _user(1, "alice"))
+    cache.put(2, "b", _user(2, "bob"))
+    cache.get(1, "a")
+
+    cache.put(3, "c", _user(3, "carol"))
+
+    assert cache.get(2, "b") is None
+    assert cache.get(1, "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_with_zero_ttl():
+    cache = UserCache(ttl=0)
+    cache.put(1, "a", _user(1, "alice"))
+
+    assert cache.get(1, "a") is None
@@ -0,0 +1,92 @@
+# Prozessinterner Cache für geladene Benutzer (Flask-Login user_loader)
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class UserCache:
+    """Begrenzter TTL-Cache für User-Objekte, Schlüssel (user_id, session_id).
+
+    Erspart pro Anfrage Datenbankzugriff und Entschlüsselung des API-Schlüssels.
+    Einträge werden bei Logout, Benutzerwechsel und Löschung explizit
+    invalidiert; die TTL begrenzt die Veraltung bei Änderungen aus anderen
+    Prozessen. ttl <= 0 deaktiviert den Cache.
+    """
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def _key(user_id, session_id):
+        return (str(user_id), session_id or '')
+
+    def get(self, user_id, session_id) -> Optional[object]:
+        """Liefert den gecachten Benutzer oder None"""
+        if not self.enabled:
+            return None
+        key = self._key(user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, session_id, user):
+        """Speichert einen geladenen Benutzer"""
+        if not self.enabled:
+            return
+        key = self._key(user_id, session_id)
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_session(self, user_id, session_id):
+        """Entfernt den Eintrag einer Sitzung (Logout, Benutzerwechsel)"""
+        with self._lock:
+            if self._entries.pop(self._key(user_id, session_id), None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id=None, username: Optional[str] = None) -> List[str]:
+        """Entfernt alle Sitzungen eines Benutzers (über ID oder Benutzername)"""
+        with self._lock:
+            keys = [
+                key for key, (user, _) in self._entries.items()
+                if (user_id is not None and key[0] == str(user_id))
+                or (username is not None and getattr(user, 'username', None) == username)
+            ]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return sorted({key[0] for key in keys})
+
+    def stats(self) -> Dict:
+        """Treffer- und Fehlzugriffszähler"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions
+            }
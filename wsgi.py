@@ -0,0 +1,9 @@
+# WSGI-Einstiegspunkt für den Produktionsbetrieb
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# gunicorn.conf.py startet in jedem Worker die Portfolio-Aktualisierung und den
+# Wartungs-Scheduler; Wartung führt per Leader-Lock nur ein Worker aus.
+from app import app, start_maintenance, start_worker_services
+
+__all__ = ['app', 'start_maintenance', 'start_worker_services']